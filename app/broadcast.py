@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from app.executor import current_snapshot, run_panel
+from app.telemetry import PANEL_BUILD_SECONDS, telemetry
+
+log = logging.getLogger(__name__)
+
+# Most panel payloads kept in the cache; the least recently used go first
+CACHE_ENTRIES = int(os.environ.get('APP_BROADCAST_CACHE_ENTRIES', 256))
+
+ViewKey = Tuple[str, Hashable]
+
+
+def _freeze(inputs: Dict[str, Any]) -> Hashable:
+    return tuple(sorted(inputs.items()))
+
+
+class PanelView:
+    """One client's subscription to a panel, identified by the inputs it currently reads"""
+
+    def __init__(self, hub: 'BroadcastHub', panel: str, build: Callable[..., Dict], apply: Callable[[Dict], Any]):
+        self.hub = hub
+        self.panel = panel
+        self.build = build
+        self.apply = apply
+        self.inputs: Dict[str, Any] = {}
+
+    @property
+    def key(self) -> ViewKey:
+        return (self.panel, _freeze(self.inputs))
+
+    async def refresh(self, **inputs: Any) -> None:
+        """Switch this view to ``inputs`` and apply the shared payload for them"""
+        self.inputs = inputs
+        self.apply(await self.hub.compute(self.panel, self.build, inputs))
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class BroadcastHub:
+    """Shares computed panel payloads between all clients with the same inputs.
+
+    Payloads are cached per (panel, inputs) for the current snapshot version,
+    and concurrent requests for the same view wait on a single computation.
+    The first lookup with a newer version drops the payloads of older ones,
+    and at most ``max_entries`` payloads are kept, least recently used first
+    out.
+    In broadcast mode a server-side tick recomputes each distinct view once
+    and pushes it to every subscribed client, so cost scales with the number
+    of distinct views rather than the number of connected screens.
+    """
+
+    def __init__(self, interval: float = 30.0, enabled: bool = False, max_entries: int = CACHE_ENTRIES):
+        self.interval = interval
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.computations = 0
+        self._views: List[PanelView] = []
+        self._tick_listeners: List[Callable[[], Any]] = []
+        self._cache: 'OrderedDict[ViewKey, Tuple[int, Dict]]' = OrderedDict()
+        self._version: Optional[int] = None
+        self._inflight: Dict[Tuple[ViewKey, int], asyncio.Future] = {}
+
+    def subscribe(self, panel: str, build: Callable[..., Dict], apply: Callable[[Dict], Any]) -> PanelView:
+        view = PanelView(self, panel, build, apply)
+        self._views.append(view)
+        return view
+
+    def unsubscribe(self, view: PanelView) -> None:
+        if view in self._views:
+            self._views.remove(view)
+
+    def add_tick_listener(self, listener: Callable[[], Any]) -> Callable[[], None]:
+        """Call ``listener`` after every broadcast tick; returns a function removing it"""
+        self._tick_listeners.append(listener)
+        return lambda: self._tick_listeners.remove(listener) if listener in self._tick_listeners else None
+
+    def clear(self) -> None:
+        """Drop cached payloads so the next compute() of every view rebuilds it"""
+        self._cache.clear()
+
+    @property
+    def distinct_views(self) -> int:
+        return len({view.key for view in self._views})
+
+    @property
+    def cached(self) -> int:
+        return len(self._cache)
+
+    def _lookup(self, key: ViewKey, version: int) -> Optional[Dict]:
+        if self._version is None or version > self._version:
+            # A newer snapshot makes every payload built from an older one stale
+            for stale in [key for key, (built, _) in self._cache.items() if built < version]:
+                del self._cache[stale]
+            self._version = version
+        cached = self._cache.get(key)
+        if cached is None or cached[0] != version:
+            return None
+        self._cache.move_to_end(key)
+        return cached[1]
+
+    def _store(self, key: ViewKey, version: int, payload: Dict) -> None:
+        self._cache[key] = (version, payload)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def compute(self, panel: str, build: Callable[..., Dict], inputs: Dict[str, Any]) -> Dict:
+        snapshot = await current_snapshot()
+        key = (panel, _freeze(inputs))
+        cached = self._lookup(key, snapshot.version)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get((key, snapshot.version))
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[(key, snapshot.version)] = future
+        try:
+            with telemetry.span(PANEL_BUILD_SECONDS, panel):
+                payload = await run_panel(build, snapshot, **inputs)
+            self.computations += 1
+            self._store(key, snapshot.version, payload)
+            future.set_result(payload)
+            return payload
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark as retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._inflight[(key, snapshot.version)]
+
+    async def tick(self) -> None:
+        """Recompute every distinct subscribed view once and push it to its subscribers"""
+        groups: Dict[ViewKey, List[PanelView]] = {}
+        for view in self._views:
+            groups.setdefault(view.key, []).append(view)
+        # Payloads nobody subscribes to any more are dropped
+        for key in [key for key in self._cache if key not in groups]:
+            del self._cache[key]
+
+        async def push(views: List[PanelView]) -> None:
+            first = views[0]
+            payload = await self.compute(first.panel, first.build, first.inputs)
+            for view in views:
+                try:
+                    view.apply(payload)
+                except Exception:
+                    log.exception('Failed to push %s to a subscriber', first.panel)
+
+        await asyncio.gather(*(push(views) for views in groups.values()))
+        for listener in list(self._tick_listeners):
+            listener()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception:
+                log.exception('Broadcast tick failed')
+
+
+broadcast_hub = BroadcastHub(
+    interval=float(os.environ.get('APP_BROADCAST_INTERVAL_SECONDS', 30)),
+    enabled=os.environ.get('APP_BROADCAST_MODE', '').lower() in ('1', 'true', 'yes'),
+)
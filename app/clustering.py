@@ -0,0 +1,152 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+# The finest grid splits the Web Mercator square into 2**MAX_LEVEL cells per side
+MAX_LEVEL = 16
+# Mapbox draws the world WORLD_PIXELS * 2**zoom pixels wide, so a level
+# (zoom + LEVEL_OFFSET) cell spans 64 pixels on screen
+WORLD_PIXELS = 512
+LEVEL_OFFSET = 3
+MAX_LATITUDE = 85.05112878
+# Upper bound on the clusters returned for any viewport
+MAX_MARKERS = int(os.environ.get('APP_MAP_MAX_MARKERS', 256))
+
+# Per-cell columns that are added up when cells merge
+SUMMED = ('count', 'latitude', 'longitude', 'categories')
+
+Clusters = Dict[str, np.ndarray]
+
+
+def project(latitude, longitude) -> Tuple[np.ndarray, np.ndarray]:
+    """Web Mercator coordinates in [0, 1), x growing east and y growing south"""
+    lat = np.radians(np.clip(np.asarray(latitude, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE))
+    x = (np.asarray(longitude, dtype=np.float64) + 180) / 360 % 1.0
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2
+    return x, y
+
+
+def _cell(coordinate, level: int) -> np.ndarray:
+    return np.clip((np.asarray(coordinate) * (1 << level)).astype(np.int64), 0, (1 << level) - 1)
+
+
+@dataclass(frozen=True)
+class Viewport:
+    """The grid window a map view covers: inclusive cell ranges at one level.
+
+    ``x`` wraps around the antimeridian when its start is greater than its end.
+    Views covering the same cells compare equal, so clients share their clusters.
+    """
+
+    level: int
+    x: Tuple[int, int]
+    y: Tuple[int, int]
+
+    @property
+    def cells(self) -> int:
+        x0, x1 = self.x
+        width = x1 - x0 + 1 if x0 <= x1 else (1 << self.level) - x0 + x1 + 1
+        return width * (self.y[1] - self.y[0] + 1)
+
+    @classmethod
+    def from_bounds(cls, west: float, south: float, east: float, north: float, zoom: float,
+                    max_markers: int = MAX_MARKERS) -> 'Viewport':
+        """Window of the given map bounds in degrees; ``east`` may exceed 180 past the antimeridian"""
+        (x_west, x_east), (y_north, y_south) = project([north, south], [west, east])
+        return cls._fit(x_west, x_east, y_north, y_south, east - west >= 360, zoom, max_markers)
+
+    @classmethod
+    def around(cls, latitude: float, longitude: float, zoom: float, width: int, height: int,
+               max_markers: int = MAX_MARKERS) -> 'Viewport':
+        """Window of a ``width`` x ``height`` pixel map centered on a point"""
+        (x,), (y,) = project([latitude], [longitude])
+        half_width = width / (WORLD_PIXELS * 2 ** zoom) / 2
+        half_height = height / (WORLD_PIXELS * 2 ** zoom) / 2
+        return cls._fit((x - half_width) % 1.0, (x + half_width) % 1.0, y - half_height, y + half_height,
+                        half_width >= 0.5, zoom, max_markers)
+
+    @classmethod
+    def _fit(cls, x_west: float, x_east: float, y_north: float, y_south: float, whole_world: bool,
+             zoom: float, max_markers: int) -> 'Viewport':
+        # Start at the level matching the zoom and coarsen until the window is small enough
+        level = int(np.clip(round(zoom) + LEVEL_OFFSET, 0, MAX_LEVEL))
+        while True:
+            x = (0, (1 << level) - 1) if whole_world else (int(_cell(x_west, level)), int(_cell(x_east, level)))
+            viewport = cls(level, x, (int(_cell(y_north, level)), int(_cell(y_south, level))))
+            if viewport.cells <= max_markers or level == 0:
+                return viewport
+            level -= 1
+
+
+def _merge(cells: Clusters, level: int) -> Clusters:
+    """Combine the cells falling into the same cell of ``level``, sorted by cell key"""
+    key = cells['x'] << level | cells['y']
+    order = np.argsort(key, kind='stable')
+    key = key[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]]) if len(key) else np.empty(0, dtype=np.int64)
+    if not len(starts):
+        return {**{name: values[:0] for name, values in cells.items()}, 'key': key}
+    merged = {name: np.add.reduceat(cells[name][order], starts) for name in SUMMED}
+    merged['row'] = np.minimum.reduceat(cells['row'][order], starts)
+    merged['x'] = cells['x'][order][starts]
+    merged['y'] = cells['y'][order][starts]
+    merged['key'] = key[starts]
+    return merged
+
+
+class ClusterIndex:
+    """Grid clusters of a set of points, precomputed for every level.
+
+    Each level keeps its occupied cells sorted by ``x << level | y`` with the
+    point count, coordinate sums and per-category counts of the cell, so a
+    viewport query is a binary search over the x range plus a mask on y and
+    returns at most one cluster per cell however many points there are.
+    Coarser levels are built by merging the cells of the level below.
+    """
+
+    def __init__(self, latitude, longitude, categories, labels: Sequence[str]):
+        self.labels = list(labels)
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        x, y = project(latitude, longitude)
+        self._points: Clusters = {
+            'count': np.ones(len(latitude), dtype=np.int64),
+            'latitude': latitude,
+            'longitude': longitude,
+            'categories': (np.asarray(categories)[:, None] == np.array(self.labels)[None, :]).astype(np.int64),
+            'row': np.arange(len(latitude)),
+            'x': _cell(x, MAX_LEVEL),
+            'y': _cell(y, MAX_LEVEL),
+        }
+        self.levels: List[Clusters] = [{}] * (MAX_LEVEL + 1)
+        cells = self._points
+        for level in range(MAX_LEVEL, -1, -1):
+            cells = self.levels[level] = _merge(cells, level)
+            cells = {**cells, 'x': cells['x'] >> 1, 'y': cells['y'] >> 1}
+
+    def query(self, viewport: Viewport) -> Clusters:
+        """Clusters of the occupied cells inside ``viewport``"""
+        level = viewport.level
+        cells = self.levels[level]
+        x0, x1 = viewport.x
+        spans = [(x0, x1)] if x0 <= x1 else [(x0, (1 << level) - 1), (0, x1)]
+        rows = np.concatenate([np.arange(*np.searchsorted(cells['key'], [start << level, (end + 1) << level]))
+                               for start, end in spans])
+        y = cells['y'][rows]
+        return self._clusters(cells, rows[(y >= viewport.y[0]) & (y <= viewport.y[1])])
+
+    def points(self, rows: np.ndarray) -> Clusters:
+        """The given points unclustered, as clusters of one"""
+        return self._clusters(self._points, rows)
+
+    @staticmethod
+    def _clusters(cells: Clusters, rows: np.ndarray) -> Clusters:
+        count = cells['count'][rows]
+        return {
+            'count': count,
+            'latitude': cells['latitude'][rows] / count,
+            'longitude': cells['longitude'][rows] / count,
+            'categories': cells['categories'][rows],
+            'row': cells['row'][rows],
+        }
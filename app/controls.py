@@ -1,36 +1,76 @@
-from nicegui import ui, app
+import os
+from nicegui import ui
 from datetime import datetime, timedelta
-from app.data_generator import DataGenerator
+from app.data_generator import get_snapshot
+from app.refresh import CoalescingUpdateQueue, RefreshScheduler
+from app.session import current_session
 
-def create():
+# Quiet period after the last slider movement before the dashboard recomputes
+DELAY_MULTIPLIER_DEBOUNCE = float(os.environ.get('APP_SLIDER_DEBOUNCE_SECONDS', 0.25))
+
+# Chart selections shown as removable chips; the factory has its own selector
+SELECTION_LABELS = {'selected_category': 'Delay cause', 'selected_part': 'Part'}
+
+async def toggle_selection(scheduler: RefreshScheduler, key: str, value):
+    """Select ``value`` of a cross-filter dimension, or clear the selection when it is already selected"""
+    session = current_session()
+    session[key] = None if session.get(key) == value else value
+    await scheduler.notify(key)
+
+def create(scheduler: RefreshScheduler):
     """Create interactive controls for filtering and simulation"""
+    session = current_session()
+    
+    async def refresh(*inputs):
+        # Only panels that read one of the changed inputs are recomputed
+        if inputs:
+            await scheduler.notify(*inputs)
+        else:
+            await scheduler.refresh_all()
+        timing_label.set_text(f'Last refresh: {scheduler.describe_last_run()}')
+    
+    async def update_delay_multiplier(value):
+        await refresh('delay_multiplier')
+    
+    # Dragging the slider fires on_change for every step; the dashboard is
+    # recomputed once, after the slider settles
+    multiplier_updates = CoalescingUpdateQueue(update_delay_multiplier, debounce=DELAY_MULTIPLIER_DEBOUNCE)
     
-    def update_delay_multiplier(value):
-        app.storage.user['delay_multiplier'] = value
-        # Update KPIs when delay multiplier changes
-        update_kpis = app.storage.user.get('update_kpis')
-        if update_kpis:
-            update_kpis()
-        
-        # Update charts
-        update_charts = app.storage.user.get('update_charts')
-        if update_charts:
-            update_charts()
+    def change_delay_multiplier(value):
+        # The session follows every step so the slider's binding keeps its position; only the refresh waits
+        if value == session.get('delay_multiplier'):
+            return
+        session['delay_multiplier'] = value
+        multiplier_updates.submit(value)
     
-    def update_factory_filter(value):
-        app.storage.user['selected_factory'] = value
-        # Update charts when factory filter changes
-        update_charts = app.storage.user.get('update_charts')
-        if update_charts:
-            update_charts()
+    async def update_factory_filter(value):
+        # Also fired when a chart click selects a factory and the selector follows it
+        if value == session.get('selected_factory'):
+            return
+        session['selected_factory'] = value
+        await refresh('selected_factory')
     
-    def update_time_range(start_date, end_date):
-        app.storage.user['start_date'] = start_date
-        app.storage.user['end_date'] = end_date
-        # Update charts when time range changes
-        update_charts = app.storage.user.get('update_charts')
-        if update_charts:
-            update_charts()
+    async def clear_selection(key, shown):
+        # A chip is hidden both when removed and when its selection is cleared elsewhere
+        if not shown and session.get(key) is not None:
+            session[key] = None
+            await refresh(key)
+    
+    async def update_time_range(start_date, end_date):
+        # Also fired when the pickers follow a range restored or changed elsewhere
+        if (start_date, end_date) == (session.get('start_date'), session.get('end_date')):
+            return
+        session['start_date'] = start_date
+        session['end_date'] = end_date
+        await refresh('start_date', 'end_date')
+    
+    # Every control binds to the session, so restored preferences are shown as they are applied
+    session.setdefault('delay_multiplier', 1.0)
+    session.setdefault('start_date', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
+    session.setdefault('end_date', datetime.now().strftime('%Y-%m-%d'))
+    session.setdefault('selected_factory', None)
+    for key in SELECTION_LABELS:
+        session.setdefault(key, None)
     
     with ui.card().classes('w-full mb-6'):
         with ui.card_section():
@@ -42,50 +82,53 @@ def create():
                     ui.label('Time Range').classes('text-sm font-medium mb-2')
                     with ui.row().classes('gap-2'):
                         start_date = ui.date(
-                            value=(datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'),
+                            value=session['start_date'],
                             on_change=lambda e: update_time_range(e.value, end_date.value)
-                        ).classes('flex-1')
+                        ).classes('flex-1').bind_value_from(session.values, 'start_date')
                         end_date = ui.date(
-                            value=datetime.now().strftime('%Y-%m-%d'),
+                            value=session['end_date'],
                             on_change=lambda e: update_time_range(start_date.value, e.value)
-                        ).classes('flex-1')
+                        ).classes('flex-1').bind_value_from(session.values, 'end_date')
                 
                 # Factory Selector
                 with ui.column().classes('flex-1'):
                     ui.label('Factory Filter').classes('text-sm font-medium mb-2')
-                    data_gen = DataGenerator()
-                    factory_options = [{'label': 'All Factories', 'value': None}] + [
-                        {'label': f.name, 'value': f.id} for f in data_gen.factories
-                    ]
-                    ui.select(
+                    data_gen = get_snapshot()
+                    factory_options = {None: 'All Factories', **{f.id: f.name for f in data_gen.factories}}
+                    factory_select = ui.select(
                         options=factory_options,
                         value=None,
                         on_change=lambda e: update_factory_filter(e.value)
-                    ).classes('w-full')
+                    ).classes('w-full').mark('factory-filter')
+                    # Follows factories selected by clicking the production chart
+                    factory_select.bind_value_from(session.values, 'selected_factory')
                 
                 # Delay Impact Multiplier
                 with ui.column().classes('flex-1'):
                     ui.label('Delay Impact Multiplier').classes('text-sm font-medium mb-2')
                     with ui.row().classes('items-center gap-2'):
                         multiplier_slider = ui.slider(
-                            min=0.5, max=3.0, step=0.1, value=1.0,
-                            on_change=lambda e: update_delay_multiplier(e.value)
-                        ).classes('flex-1')
-                        multiplier_label = ui.label('1.0x').classes('text-sm font-mono')
-                        
-                        def update_multiplier_label():
-                            multiplier_label.set_text(f'{multiplier_slider.value:.1f}x')
-                        
-                        multiplier_slider.on('update:model-value', update_multiplier_label)
+                            min=0.5, max=3.0, step=0.1, value=session['delay_multiplier'],
+                            on_change=lambda e: change_delay_multiplier(e.value)
+                        ).classes('flex-1').bind_value_from(session.values, 'delay_multiplier')
+                        ui.label().classes('text-sm font-mono') \
+                            .bind_text_from(multiplier_slider, 'value', backward=lambda value: f'{value:.1f}x')
                 
                 # Refresh Button
                 with ui.column().classes('flex-0'):
                     ui.button('Refresh Data', icon='refresh', 
-                             on_click=lambda: app.storage.user.get('update_charts', lambda: None)(),
+                             on_click=lambda: refresh(),
                              color='primary').classes('h-10')
-    
-    # Initialize default values
-    app.storage.user.setdefault('delay_multiplier', 1.0)
-    app.storage.user.setdefault('selected_factory', None)
-    app.storage.user.setdefault('start_date', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
-    app.storage.user.setdefault('end_date', datetime.now().strftime('%Y-%m-%d'))
\ No newline at end of file
+            
+            # Cross-filter selections made by clicking a bar or point in a chart
+            with ui.row().classes('gap-2 mt-2'):
+                for key, label in SELECTION_LABELS.items():
+                    ui.chip(icon='filter_alt', removable=True,
+                            on_value_change=lambda e, key=key: clear_selection(key, e.value)) \
+                        .bind_value_from(session.values, key, backward=lambda value: value is not None) \
+                        .bind_text_from(session.values, key, backward=lambda value, label=label:
+                                        f"{label}: {(value or '').replace('_', ' ').title()}") \
+                        .mark(key)
+            
+            # Per-panel cost of the most recent interaction
+            timing_label = ui.label('').classes('text-xs text-gray-500 mt-2')
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Any, Mapping, Optional, Sequence, Tuple, TypeGuard
+from numpy.typing import ArrayLike
+from app.rollups import bucket_numbers, bucket_starts
+from app.timeseries import Columns
+
+# Dimensions a click on a chart can select, mapped to the user storage key holding the selection
+SELECTIONS = {'factory': 'selected_factory', 'category': 'selected_category', 'part': 'selected_part'}
+
+# Per dimension: one member, a list of members, or None for no filter
+Filters = Mapping[str, Any]
+
+
+def is_filtered(filters: Optional[Filters]) -> TypeGuard[Filters]:
+    """Whether any dimension has a selection"""
+    return bool(filters) and any(selection is not None for selection in filters.values())
+
+
+class Dimension:
+    """The members of a categorical dimension, shared by every fact table that has it"""
+
+    def __init__(self, name: str, members: ArrayLike):
+        self.name = name
+        self.members = np.asarray(members)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def encode(self, values) -> np.ndarray:
+        """Categorical code of each value; -1 for values that are not members"""
+        return pd.Categorical(np.asarray(values), categories=self.members).codes
+
+
+class FactTable:
+    """Fact rows in time order with a categorical code column and a bitmap index per dimension.
+
+    Bit ``r`` of ``bitmaps[dimension][member]`` is set when row ``r`` belongs
+    to that member, so a selection is an OR of member bitmaps within a
+    dimension and an AND across dimensions over n/64 words. Time ranges are
+    a row range found by binary search, and aggregates are one ``bincount``
+    over the matching rows.
+    """
+
+    def __init__(self, columns: Columns, dimensions: Mapping[str, Tuple[Dimension, str]],
+                 measures: Sequence[str], time_key: Optional[str] = 'date'):
+        size = len(next(iter(columns.values()))) if columns else 0
+        order = np.argsort(columns[time_key], kind='stable') if time_key and size else np.arange(size)
+        self.size = size
+        self.dimensions = {name: dimension for name, (dimension, _) in dimensions.items()}
+        self.time_key = time_key
+        # Empty for tables without a time key, which ignore time ranges
+        self.times = (np.asarray(columns[time_key], dtype='datetime64[us]')[order] if time_key and size
+                      else np.empty(0, dtype='datetime64[us]'))
+        self.codes = {name: dimension.encode(np.asarray(columns[column])[order]) if size else np.empty(0, np.int8)
+                      for name, (dimension, column) in dimensions.items()}
+        self.measures = {measure: np.asarray(columns[measure], dtype=np.float64)[order] if size else np.empty(0)
+                         for measure in measures}
+        self.bitmaps = {name: self._bitmaps(codes, len(self.dimensions[name])) for name, codes in self.codes.items()}
+
+    def _bitmaps(self, codes: np.ndarray, members: int) -> np.ndarray:
+        bitmaps = np.zeros((members, (self.size + 63) // 64), dtype=np.uint64)
+        rows = np.flatnonzero(codes >= 0)
+        np.bitwise_or.at(bitmaps, (codes[rows], rows >> 6), np.left_shift(np.uint64(1), (rows & 63).astype(np.uint64)))
+        return bitmaps
+
+    def bounds(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Tuple[int, int]:
+        """Row range with ``start <= time < end``; tables without time ignore the range"""
+        if self.time_key is None:
+            return 0, self.size
+        lo = 0 if start is None else int(np.searchsorted(self.times, np.datetime64(start, 'us')))
+        hi = self.size if end is None else int(np.searchsorted(self.times, np.datetime64(end, 'us')))
+        return lo, max(lo, hi)
+
+    def select(self, filters: Filters, start: Optional[datetime] = None,
+               end: Optional[datetime] = None) -> np.ndarray:
+        """Rows in the time range matching every filter on a dimension of this table"""
+        lo, hi = self.bounds(start, end)
+        words = slice(lo >> 6, (hi + 63) >> 6)
+        mask = None
+        for name, selection in filters.items():
+            if selection is None or name not in self.bitmaps:
+                continue
+            members = self.dimensions[name].encode(np.atleast_1d(selection))
+            members = members[members >= 0]
+            bitmap = np.bitwise_or.reduce(self.bitmaps[name][members, words], axis=0)
+            mask = bitmap if mask is None else mask & bitmap
+        if mask is None:
+            return np.arange(lo, hi)
+        # Bit b of word w is row 64 * w + b in little-endian byte and bit order
+        bits = np.unpackbits(mask.astype('<u8').view(np.uint8), bitorder='little')
+        offset = (lo >> 6) << 6
+        return lo + np.flatnonzero(bits[lo - offset:hi - offset])
+
+    def totals(self, filters: Filters, by: str, start: Optional[datetime] = None,
+               end: Optional[datetime] = None) -> Columns:
+        """Record count and measure totals per member of ``by`` over the matching rows"""
+        rows = self.select(filters, start, end)
+        codes = self.codes[by][rows]
+        dimension = self.dimensions[by]
+        columns: Columns = {by: dimension.members, 'count': np.bincount(codes, minlength=len(dimension))}
+        columns.update({measure: np.bincount(codes, weights=values[rows], minlength=len(dimension))
+                        for measure, values in self.measures.items()})
+        return columns
+
+    def series(self, filters: Filters, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               resolution: str = 'day') -> Columns:
+        """Record count and measure totals per time bucket over the matching rows, empty buckets included"""
+        rows = self.select(filters, start, end)
+        lo, hi = self.bounds(start, end)
+        if lo == hi:
+            return {'date': np.empty(0, dtype='datetime64[us]'), 'count': np.empty(0),
+                    **{measure: np.empty(0) for measure in self.measures}}
+        first, last = bucket_numbers(self.times[[lo, hi - 1]], resolution)
+        buckets = bucket_numbers(self.times[rows], resolution) - first
+        span = int(last - first) + 1
+        columns: Columns = {'date': bucket_starts(np.arange(first, last + 1), resolution),
+                            'count': np.bincount(buckets, minlength=span).astype(np.float64)}
+        columns.update({measure: np.bincount(buckets, weights=values[rows], minlength=span)
+                        for measure, values in self.measures.items()})
+        return columns
+
+
+class Cube:
+    """Fact tables over conformed dimensions: factory x date x delay category x part.
+
+    Every table has the factory dimension, so a selection on a dimension a
+    table lacks reaches it through the factories: the factories whose rows
+    in a bridge table (the first table with both dimensions) match the
+    selection over the same time range.
+    """
+
+    def __init__(self, dimensions: Mapping[str, Dimension], tables: Mapping[str, FactTable]):
+        self.dimensions = dict(dimensions)
+        self.tables = dict(tables)
+        self.bridges = {name: next(table for table, facts in self.tables.items()
+                                   if name in facts.dimensions and 'factory' in facts.dimensions)
+                        for name in self.dimensions if name != 'factory'}
+
+    def __getitem__(self, table: str) -> FactTable:
+        return self.tables[table]
+
+    def factories(self, filters: Filters, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> Optional[np.ndarray]:
+        """Factories reached by every selection, or None when nothing is selected"""
+        reached = None
+        for name, selection in filters.items():
+            if selection is None:
+                continue
+            if name == 'factory':
+                members = np.atleast_1d(selection)
+            else:
+                totals = self.tables[self.bridges[name]].totals({name: selection}, 'factory', start, end)
+                members = totals['factory'][totals['count'] > 0]
+            reached = members if reached is None else np.intersect1d(reached, members)
+        return reached
+
+    def resolve(self, filters: Filters, table: str, start: Optional[datetime] = None,
+                end: Optional[datetime] = None) -> Filters:
+        """``filters`` for one table, with selections on dimensions it lacks turned into a factory filter"""
+        dimensions = self.tables[table].dimensions
+        if all(selection is None for name, selection in filters.items() if name not in dimensions):
+            return filters
+        resolved = {name: selection for name, selection in filters.items() if name in dimensions}
+        resolved['factory'] = self.factories(
+            {name: selection for name, selection in filters.items() if name not in dimensions or name == 'factory'},
+            start, end)
+        return resolved
+
+
+def build_cube(factory_ids: ArrayLike, categories: Sequence[str], production: Columns, delays: Columns,
+               inventory: Columns) -> Cube:
+    """Cube over the production and delay history and an inventory snapshot"""
+    factory = Dimension('factory', factory_ids)
+    category = Dimension('category', categories)
+    part = Dimension('part', np.unique(inventory['part_name']) if inventory else [])
+    return Cube({'factory': factory, 'category': category, 'part': part}, {
+        'production': FactTable(production, {'factory': (factory, 'factory_id')}, ['cars_produced']),
+        'delays': FactTable(delays, {'factory': (factory, 'factory_id'), 'category': (category, 'category')},
+                            ['duration_hours', 'financial_impact']),
+        'inventory': FactTable(inventory, {'factory': (factory, 'factory_id'), 'part': (part, 'part_name')},
+                               ['current_stock', 'target_stock'], time_key=None),
+    })
@@ -1,36 +1,86 @@
-from nicegui import ui
-from app import header, kpi_overview, controls, factory_operations, logistics, financial
+import importlib
+from fastapi.responses import PlainTextResponse
+from nicegui import ui, app, background_tasks
+from app.refresh import RefreshScheduler
+from app.session import current_session
+from app.telemetry import PAGE_BUILD_SECONDS, telemetry
+from app.warmup import warm_up
+
+# Collapsible dashboard sections: (panel name, title, icon); each panel's module is app.<panel name>
+SECTIONS = [
+    ('factory_operations', 'Factory Operations & Production', 'factory'),
+    ('logistics', 'Logistics & Supply Chain', 'local_shipping'),
+    ('financial', 'Financial Impact & Performance', 'attach_money'),
+]
+
+def lazy_section(name, title, icon, scheduler: RefreshScheduler):
+    """Create an expansion whose content is only built once it is first opened"""
+    # Panel modules pull in plotly and pandas, so they are imported by the warm-up, not with this module
+    build = importlib.import_module(f'app.{name}').create
+    session = current_session()
+    open_sections = session.setdefault('open_sections', [section[0] for section in SECTIONS])
+    opened = name in open_sections
+    placeholder = None
+    
+    async def toggle(e):
+        nonlocal placeholder
+        # Remember which sections this user keeps open for the next visit
+        session['open_sections'] = (
+            [s for s in session['open_sections'] if s != name] + ([name] if e.value else [])
+        )
+        if e.value and placeholder is not None:
+            placeholder.delete()
+            placeholder = None
+            with expansion:
+                build(scheduler)
+            await scheduler.refresh(name)
+    
+    with ui.expansion(title, icon=icon, value=opened, on_value_change=toggle).classes('w-full mb-4') as expansion:
+        if opened:
+            build(scheduler)
+        else:
+            # Lightweight stand-in until the section is first opened
+            placeholder = ui.skeleton().classes('w-full h-32')
 
 def create():
     """Create the main dashboard page"""
     
     @ui.page('/')
-    def dashboard():
+    async def dashboard():
+        # A cold server answers at once; the page is built when the warm-up finishes
+        await warm_up.wait()
+        build_dashboard()
+    
+    @telemetry.timed(PAGE_BUILD_SECONDS)
+    def build_dashboard():
+        from app import header, kpi_overview, controls
+        
         # Set page title and styling
         ui.page_title('Global Automotive Operations Dashboard')
         
         # Create header
         header.create()
         
+        # Panels register here with the inputs they read
+        scheduler = current_session().scheduler = RefreshScheduler()
+        
         # Main content area
         with ui.column().classes('p-6 max-w-full'):
             # KPI Overview
-            kpi_overview.create()
+            kpi_overview.create(scheduler)
             
             # Controls
-            controls.create()
-            
-            # Factory Operations Section
-            with ui.expansion('Factory Operations & Production', icon='factory').classes('w-full mb-4').props('default-opened'):
-                factory_operations.create()
-            
-            # Logistics Section
-            with ui.expansion('Logistics & Supply Chain', icon='local_shipping').classes('w-full mb-4').props('default-opened'):
-                logistics.create()
+            controls.create(scheduler)
             
-            # Financial Section
-            with ui.expansion('Financial Impact & Performance', icon='attach_money').classes('w-full mb-4').props('default-opened'):
-                financial.create()
+            # Factory Operations, Logistics and Financial sections; collapsed
+            # sections are not built or computed until they are opened
+            for name, title, icon in SECTIONS:
+                lazy_section(name, title, icon, scheduler)
+        
+        # Return the skeleton right away; every panel fills itself in from
+        # its own task, so first paint does not wait for any computation
+        for name in scheduler.panel_names:
+            background_tasks.create(scheduler.refresh(name), name=f'load {name}')
         
         # Add some custom CSS for better styling
         ui.add_head_html('''
@@ -38,4 +88,9 @@ def create():
                 .nicegui-content { max-width: 100% !important; }
                 .q-expansion-item__content { padding: 16px !important; }
             </style>
-        ''')
\ No newline at end of file
+        ''')
+    
+    @app.get('/metrics')
+    def metrics():
+        """Panel, page and data timings plus chart payload sizes in the Prometheus text format"""
+        return PlainTextResponse(telemetry.render(), media_type='text/plain; version=0.0.4')
@@ -1,184 +1,393 @@
+import os
 import random
+import threading
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Dict, Optional, Sequence, Tuple
+from app.cube import Cube, Filters, build_cube, is_filtered
+from app.kpis import KPIEngine
 from app.models import (
     Factory, AssemblyLine, InventoryItem, QualityMetric, DelayRecord,
     ProductionData, FinancialData, ProductLine, KPIData,
     FactoryStatus, DelayCategory
 )
+from app.registry import AssemblyLineRegistry, FactoryRegistry
+from app.rollups import RollupSet
+from app.telemetry import GETTER_SECONDS, telemetry
+from app.timeseries import Columns, TimeSeriesStore, records_to_columns, to_records
+
+# Days of production, delay and financial history kept in the time-indexed stores
+HISTORY_DAYS = int(os.environ.get('APP_HISTORY_DAYS', 365))
+# Seed for reproducible datasets; unset means fresh random data on every build
+DATA_SEED = int(os.environ['APP_DATA_SEED']) if os.environ.get('APP_DATA_SEED') else None
+# Factories generated per shard; shards are the unit of parallel generation and seeding
+SHARD_SIZE = 64
+
+FACTORY_DATA = [
+    {"name": "Detroit Assembly", "location": "Detroit, MI", "lat": 42.3314, "lng": -83.0458},
+    {"name": "Munich Production", "location": "Munich, Germany", "lat": 48.1351, "lng": 11.5820},
+    {"name": "Tokyo Manufacturing", "location": "Tokyo, Japan", "lat": 35.6762, "lng": 139.6503},
+    {"name": "São Paulo Plant", "location": "São Paulo, Brazil", "lat": -23.5505, "lng": -46.6333},
+    {"name": "Shanghai Factory", "location": "Shanghai, China", "lat": 31.2304, "lng": 121.4737},
+    {"name": "Mumbai Assembly", "location": "Mumbai, India", "lat": 19.0760, "lng": 72.8777},
+    {"name": "Mexico City Plant", "location": "Mexico City, Mexico", "lat": 19.4326, "lng": -99.1332},
+    {"name": "Seoul Production", "location": "Seoul, South Korea", "lat": 37.5665, "lng": 126.9780},
+    {"name": "Birmingham Factory", "location": "Birmingham, UK", "lat": 52.4862, "lng": -1.8904},
+    {"name": "Barcelona Assembly", "location": "Barcelona, Spain", "lat": 41.3851, "lng": 2.1734},
+]
+
+
+@dataclass(frozen=True)
+class ScaleConfig:
+    """Size of the synthetic dataset.
+
+    The defaults reproduce the ten-plant demo network; larger values are
+    used to reproduce production-sized loads for capacity testing.
+    """
+    factories: int = len(FACTORY_DATA)
+    min_lines_per_factory: int = 2
+    max_lines_per_factory: int = 4
+    delay_rate: float = 0.25  # mean delays per factory per day
+    workers: int = 1  # processes generating factory shards
+
+    @classmethod
+    def from_env(cls) -> 'ScaleConfig':
+        lines = os.environ.get('APP_SCALE_LINES_PER_FACTORY', '2-4').split('-')
+        return cls(
+            factories=int(os.environ.get('APP_SCALE_FACTORIES', len(FACTORY_DATA))),
+            min_lines_per_factory=int(lines[0]),
+            max_lines_per_factory=int(lines[-1]),
+            delay_rate=float(os.environ.get('APP_SCALE_DELAY_RATE', 0.25)),
+            workers=int(os.environ.get('APP_SCALE_WORKERS', 1)),
+        )
+
+
+SCALE = ScaleConfig.from_env()
+
+# Money columns of the financial history, all linear in the delay multiplier
+FINANCIAL_COLUMNS = ('revenue_lost', 'cost_expedited_shipping', 'cost_idle_labor', 'cost_penalties')
+
+
+def _generate_shard(factories: Columns, dates: np.ndarray, delay_rate: float,
+                    seed: np.random.SeedSequence) -> Tuple[Columns, Columns]:
+    """Production and delay history for one shard of factories.
+
+    Module-level so it can run in a worker process; the shard's own seed
+    makes its output independent of how shards are spread over workers.
+    """
+    rng = np.random.default_rng(seed)
+    days, count = len(dates), len(factories['id'])
+    daily_production = np.repeat(factories['current_production'], days)
+    variation = daily_production * 0.2
+    produced = daily_production + rng.uniform(-variation, variation)
+    production = {
+        'factory_name': np.repeat(factories['name'], days),
+        'factory_id': np.repeat(factories['id'], days),
+        'date': np.tile(dates, count),
+        'cars_produced': np.maximum(0, produced.astype(np.int64)),
+        'target_production': np.repeat(factories['production_capacity'], days)
+    }
+    
+    # Delays per factory and day, then one row per delay
+    delays_per_day = rng.poisson(delay_rate, (count, days)).ravel()
+    rows = np.repeat(np.arange(count * days), delays_per_day)
+    total = len(rows)
+    categories = np.array([category.value for category in DelayCategory])
+    duration = rng.integers(1, 25, total)  # hours
+    delays = {
+        'date': np.tile(dates, count)[rows],
+        'factory_id': np.repeat(factories['id'], days)[rows],
+        'factory_name': np.repeat(factories['name'], days)[rows],
+        'category': categories[rng.integers(0, len(categories), total)],
+        'duration_hours': duration,
+        'financial_impact': duration * rng.uniform(50000, 200000, total)  # cost per hour
+    }
+    return production, delays
+
+
+def _concat(shards: List[Columns]) -> Columns:
+    return {key: np.concatenate([shard[key] for shard in shards]) for key in shards[0]}
+
 
 class DataGenerator:
-    def __init__(self):
-        self.factories = self._generate_factories()
-        self.assembly_lines = self._generate_assembly_lines()
-        self.start_date = datetime.now() - timedelta(days=30)
-        self.end_date = datetime.now()
-        
-    def _generate_factories(self) -> List[Factory]:
-        factory_data = [
-            {"name": "Detroit Assembly", "location": "Detroit, MI", "lat": 42.3314, "lng": -83.0458},
-            {"name": "Munich Production", "location": "Munich, Germany", "lat": 48.1351, "lng": 11.5820},
-            {"name": "Tokyo Manufacturing", "location": "Tokyo, Japan", "lat": 35.6762, "lng": 139.6503},
-            {"name": "São Paulo Plant", "location": "São Paulo, Brazil", "lat": -23.5505, "lng": -46.6333},
-            {"name": "Shanghai Factory", "location": "Shanghai, China", "lat": 31.2304, "lng": 121.4737},
-            {"name": "Mumbai Assembly", "location": "Mumbai, India", "lat": 19.0760, "lng": 72.8777},
-            {"name": "Mexico City Plant", "location": "Mexico City, Mexico", "lat": 19.4326, "lng": -99.1332},
-            {"name": "Seoul Production", "location": "Seoul, South Korea", "lat": 37.5665, "lng": 126.9780},
-            {"name": "Birmingham Factory", "location": "Birmingham, UK", "lat": 52.4862, "lng": -1.8904},
-            {"name": "Barcelona Assembly", "location": "Barcelona, Spain", "lat": 41.3851, "lng": 2.1734},
-        ]
+    def __init__(self, history_days: int = HISTORY_DAYS, seed: Optional[int] = DATA_SEED,
+                 scale: ScaleConfig = SCALE, end_date: Optional[datetime] = None):
+        self._set_random(seed, scale)
+        self.factory_registry = FactoryRegistry(self._generate_factories())
+        self.line_registry = AssemblyLineRegistry(self._generate_assembly_lines(), self.factory_registry)
+        self._set_window(end_date or datetime.now(), history_days)
+        production, delays = self._generate_factory_history()
+        self._set_history(TimeSeriesStore(production), TimeSeriesStore(delays),
+                          TimeSeriesStore(self._generate_financial_history(), partition_key=None))
+    
+    def _set_random(self, seed: Optional[int], scale: ScaleConfig) -> None:
+        self.scale = scale
+        self.seed = seed
+        # One seed drives every random draw, so seeded runs reproduce the same data
+        self._seed_sequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self._seed_sequence)
+        self.random = random.Random(seed)
+    
+    def _set_window(self, end_date: datetime, history_days: int) -> None:
+        # Default query window is the last 30 days of the stored history
+        self.end_date = end_date
+        self.start_date = self.end_date - timedelta(days=30)
+        self.history_days = max(history_days, 30)
+        self.history_start = self.end_date - timedelta(days=self.history_days)
+    
+    def _set_history(self, production: TimeSeriesStore, delays: TimeSeriesStore,
+                     financial: TimeSeriesStore) -> None:
+        self.production_store = production
+        self.delay_store = delays
+        self.financial_store = financial
+        self.build_rollups()
         
-        factories = []
-        for i, data in enumerate(factory_data):
-            capacity = random.randint(800, 1500)
-            current = int(capacity * random.uniform(0.7, 0.95))
-            factories.append(Factory(
-                id=i+1,
-                name=data["name"],
-                location=data["location"],
-                latitude=data["lat"],
-                longitude=data["lng"],
-                production_capacity=capacity,
-                current_production=current,
-                efficiency=random.uniform(0.82, 0.95),
-                status=random.choices([FactoryStatus.RUNNING, FactoryStatus.DELAYED, FactoryStatus.MAINTENANCE], 
-                                    weights=[0.8, 0.15, 0.05])[0]
-            ))
-        return factories
+    @property
+    def factories(self) -> List[Factory]:
+        return self.factory_registry.models()
+    
+    @property
+    def assembly_lines(self) -> List[AssemblyLine]:
+        return self.line_registry.models()
+    
+    def _generate_factories(self) -> Dict[str, list]:
+        statuses = [FactoryStatus.RUNNING.value, FactoryStatus.DELAYED.value, FactoryStatus.MAINTENANCE.value]
+        columns = {field: [] for field in FactoryRegistry.dtypes}
+        for i in range(self.scale.factories):
+            data = FACTORY_DATA[i % len(FACTORY_DATA)]
+            name, lat, lng = data["name"], data["lat"], data["lng"]
+            if i >= len(FACTORY_DATA):
+                # Additional plants are spread around the same regions
+                name = f"{name} {i // len(FACTORY_DATA) + 1}"
+                lat = max(-85.0, min(85.0, lat + self.random.uniform(-3, 3)))
+                lng = (lng + self.random.uniform(-3, 3) + 180) % 360 - 180
+            capacity = self.random.randint(800, 1500)
+            current = int(capacity * self.random.uniform(0.7, 0.95))
+            columns['id'].append(i + 1)
+            columns['name'].append(name)
+            columns['location'].append(data["location"])
+            columns['latitude'].append(lat)
+            columns['longitude'].append(lng)
+            columns['production_capacity'].append(capacity)
+            columns['current_production'].append(current)
+            columns['efficiency'].append(self.random.uniform(0.82, 0.95))
+            columns['status'].append(self.random.choices(statuses, weights=[0.8, 0.15, 0.05])[0])
+        return columns
     
-    def _generate_assembly_lines(self) -> List[AssemblyLine]:
-        lines = []
-        line_id = 1
-        for factory in self.factories:
-            num_lines = random.randint(2, 4)
+    def _generate_assembly_lines(self) -> Dict[str, list]:
+        statuses = [FactoryStatus.RUNNING.value, FactoryStatus.DELAYED.value, FactoryStatus.MAINTENANCE.value]
+        columns = {field: [] for field in AssemblyLineRegistry.dtypes}
+        for factory_id in self.factory_registry['id'].tolist():
+            num_lines = self.random.randint(self.scale.min_lines_per_factory, self.scale.max_lines_per_factory)
             for i in range(num_lines):
-                target = random.randint(15, 30)
-                current = int(target * random.uniform(0.8, 1.0))
-                lines.append(AssemblyLine(
-                    id=line_id,
-                    factory_id=factory.id,
-                    name=f"Line {chr(65+i)}",
-                    status=random.choices([FactoryStatus.RUNNING, FactoryStatus.DELAYED, FactoryStatus.MAINTENANCE], 
-                                        weights=[0.85, 0.12, 0.03])[0],
-                    output_rate=current,
-                    target_rate=target
-                ))
-                line_id += 1
-        return lines
+                target = self.random.randint(15, 30)
+                current = int(target * self.random.uniform(0.8, 1.0))
+                columns['id'].append(len(columns['id']) + 1)
+                columns['factory_id'].append(factory_id)
+                columns['name'].append(f"Line {chr(65+i)}" if i < 26 else f"Line {i+1}")
+                columns['status'].append(self.random.choices(statuses, weights=[0.85, 0.12, 0.03])[0])
+                columns['output_rate'].append(current)
+                columns['target_rate'].append(target)
+        return columns
     
+    @telemetry.timed(GETTER_SECONDS)
     def get_kpi_data(self, delay_multiplier: float = 1.0) -> KPIData:
-        total_cars = sum(f.current_production for f in self.factories) * 30  # Monthly production
-        on_time_rate = max(0.7, 0.95 - (delay_multiplier - 1.0) * 0.2)
-        lost_revenue = 15000000 * delay_multiplier
-        avg_efficiency = sum(f.efficiency for f in self.factories) / len(self.factories)
-        
-        return KPIData(
-            total_cars_produced=int(total_cars),
-            total_factories=len(self.factories),
-            on_time_delivery_rate=on_time_rate,
-            lost_revenue=lost_revenue,
-            production_efficiency=avg_efficiency
-        )
+        """KPIs of this dataset on its own; the dashboard reads the snapshot service's long-lived engine"""
+        return KPIEngine.from_data(self.factory_registry, self.kpi_delays()).read(delay_multiplier)
     
-    def get_production_data(self, factory_id: Optional[int] = None) -> List[Dict]:
-        data = []
-        factories = [f for f in self.factories if f.id == factory_id] if factory_id else self.factories
-        
-        for factory in factories:
-            daily_production = factory.current_production
-            variation = daily_production * 0.2
-            for i in range(30):
-                date = self.start_date + timedelta(days=i)
-                produced = max(0, int(daily_production + random.uniform(-variation, variation)))
-                data.append({
-                    'factory_name': factory.name,
-                    'factory_id': factory.id,
-                    'date': date,
-                    'cars_produced': produced,
-                    'target_production': factory.production_capacity
-                })
-        return data
+    def kpi_delays(self) -> Columns:
+        """Delay records of the default window, the baseline the KPI delay figures are calibrated to"""
+        return self.delay_store.query(self.start_date, self.end_date)
+    
+    def _history_dates(self) -> np.ndarray:
+        start = np.datetime64(self.history_start, 'us')
+        return start + np.arange(self.history_days) * np.timedelta64(1, 'D')
+    
+    def _generate_factory_history(self) -> Tuple[Columns, Columns]:
+        """Production and delay history, generated in shards of SHARD_SIZE factories"""
+        dates = self._history_dates()
+        fields = ('id', 'name', 'current_production', 'production_capacity')
+        shards = [{field: self.factory_registry[field][lo:lo + SHARD_SIZE] for field in fields}
+                  for lo in range(0, len(self.factory_registry), SHARD_SIZE)]
+        seeds = self._seed_sequence.spawn(len(shards))
+        args = (shards, [dates] * len(shards), [self.scale.delay_rate] * len(shards), seeds)
+        if self.scale.workers > 1 and len(shards) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.scale.workers, len(shards))) as pool:
+                results = list(pool.map(_generate_shard, *args))
+        else:
+            results = list(map(_generate_shard, *args))
+        return _concat([r[0] for r in results]), _concat([r[1] for r in results])
+    
+    def _generate_financial_history(self) -> Columns:
+        # Stored at a 1.0x delay multiplier; getters scale on read
+        dates = self._history_dates()
+        base_lost_revenue = 500000
+        daily_lost = base_lost_revenue * self.rng.uniform(0.8, 1.2, len(dates))
+        return {
+            'date': dates,
+            'revenue_lost': daily_lost,
+            'cost_expedited_shipping': daily_lost * 0.3,
+            'cost_idle_labor': daily_lost * 0.4,
+            'cost_penalties': daily_lost * 0.3
+        }
+    
+    def build_rollups(self) -> None:
+        """Prefix-sum rollups of the stored history, which panels read from"""
+        self.production_rollup = RollupSet.from_columns(
+            self.production_store.query(), 'factory_id', ['cars_produced'])
+        self.delay_rollup = RollupSet.from_columns(
+            self.delay_store.query(), 'category', ['duration_hours', 'financial_impact'])
+        self.financial_rollup = RollupSet.from_columns(
+            self.financial_store.query(), None, FINANCIAL_COLUMNS)
+    
+    def resolve_window(self, start_date: Optional[datetime], end_date: Optional[datetime]):
+        """Fill in the default 30-day window for missing range bounds"""
+        return start_date or self.start_date, end_date or self.end_date
+    
+    @telemetry.timed(GETTER_SECONDS)
+    def get_production_data(self, factory_id: Optional[int] = None, start_date: Optional[datetime] = None,
+                            end_date: Optional[datetime] = None) -> List[Dict]:
+        return to_records(self._production_columns(factory_id, start_date, end_date))
+    
+    @telemetry.timed(GETTER_SECONDS)
+    def get_production_columns(self, factory_id: Optional[int] = None, start_date: Optional[datetime] = None,
+                               end_date: Optional[datetime] = None) -> Columns:
+        return self._production_columns(factory_id, start_date, end_date)
+    
+    # The record, column and frame getters share these untimed queries, so each call is observed once
+    def _production_columns(self, factory_id: Optional[int], start_date: Optional[datetime],
+                            end_date: Optional[datetime]) -> Columns:
+        start, end = self.resolve_window(start_date, end_date)
+        return self.production_store.query(start, end, factory_id or None)
+    
+    @telemetry.timed(GETTER_SECONDS)
+    def get_production_frame(self, factory_id: Optional[int] = None, start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None) -> pd.DataFrame:
+        return pd.DataFrame(self._production_columns(factory_id, start_date, end_date))
+    
+    @telemetry.timed(GETTER_SECONDS)
+    def get_production_totals(self, factory_id: Optional[int] = None, start_date: Optional[datetime] = None,
+                              end_date: Optional[datetime] = None) -> Columns:
+        """Cars produced per factory with production in the window, from the daily rollup"""
+        start, end = self.resolve_window(start_date, end_date)
+        totals = self.production_rollup.totals(start, end)
+        keep = totals['count'] > 0
+        if factory_id:
+            keep &= totals['key'] == factory_id
+        factory_ids = totals['key'][keep]
+        return {
+            'factory_id': factory_ids,
+            'factory_name': self.factory_registry['name'][self.factory_registry.row_of(factory_ids)],
+            'cars_produced': totals['cars_produced'][keep].astype(np.int64),
+        }
     
+    @telemetry.timed(GETTER_SECONDS)
     def get_inventory_data(self, factory_id: Optional[int] = None) -> List[InventoryItem]:
         parts = ["Engines", "Transmissions", "Chassis", "Electronics", "Tires", "Batteries"]
         inventory = []
-        factories = [f for f in self.factories if f.id == factory_id] if factory_id else self.factories
+        factory_ids = self.factory_registry['id'][self.factory_registry.select(factory_id)].tolist()
         
-        for factory in factories:
+        for site_id in factory_ids:
             for part in parts:
-                target = random.randint(500, 1500)
-                current = int(target * random.uniform(0.6, 1.2))
+                target = self.random.randint(500, 1500)
+                current = int(target * self.random.uniform(0.6, 1.2))
                 inventory.append(InventoryItem(
                     part_name=part,
                     current_stock=current,
                     target_stock=target,
                     reorder_point=int(target * 0.3),
-                    factory_id=factory.id
+                    factory_id=site_id
                 ))
         return inventory
     
+    @telemetry.timed(GETTER_SECONDS)
     def get_quality_metrics(self, factory_id: Optional[int] = None) -> List[QualityMetric]:
         metrics = []
-        factories = [f for f in self.factories if f.id == factory_id] if factory_id else self.factories
+        factory_ids = self.factory_registry['id'][self.factory_registry.select(factory_id)].tolist()
         
-        for factory in factories:
-            total_checks = random.randint(800, 1200)
-            pass_rate = random.uniform(0.92, 0.98)
+        for site_id in factory_ids:
+            total_checks = self.random.randint(800, 1200)
+            pass_rate = self.random.uniform(0.92, 0.98)
             passed = int(total_checks * pass_rate)
             failed = total_checks - passed
             
             metrics.append(QualityMetric(
-                factory_id=factory.id,
+                factory_id=site_id,
                 passed=passed,
                 failed=failed,
                 total=total_checks
             ))
         return metrics
     
-    def get_delay_data(self, days: int = 30) -> List[Dict]:
-        data = []
-        categories = list(DelayCategory)
-        
-        for i in range(days):
-            date = self.start_date + timedelta(days=i)
-            # Generate 0-5 delays per day
-            num_delays = random.randint(0, 5)
-            
-            for _ in range(num_delays):
-                factory = random.choice(self.factories)
-                category = random.choice(categories)
-                duration = random.randint(1, 24)  # hours
-                impact = duration * random.uniform(50000, 200000)  # cost per hour
-                
-                data.append({
-                    'date': date,
-                    'factory_id': factory.id,
-                    'factory_name': factory.name,
-                    'category': category.value,
-                    'duration_hours': duration,
-                    'financial_impact': impact
-                })
-        return data
-    
-    def get_financial_data(self, delay_multiplier: float = 1.0) -> List[Dict]:
-        data = []
-        base_lost_revenue = 500000
-        
-        for i in range(30):
-            date = self.start_date + timedelta(days=i)
-            daily_lost = base_lost_revenue * delay_multiplier * random.uniform(0.8, 1.2)
-            
-            data.append({
-                'date': date,
-                'revenue_lost': daily_lost,
-                'cost_expedited_shipping': daily_lost * 0.3,
-                'cost_idle_labor': daily_lost * 0.4,
-                'cost_penalties': daily_lost * 0.3
-            })
-        return data
+    @telemetry.timed(GETTER_SECONDS)
+    def get_delay_data(self, days: int = 30, start_date: Optional[datetime] = None,
+                       end_date: Optional[datetime] = None) -> List[Dict]:
+        return to_records(self._delay_columns(days, start_date, end_date))
+    
+    @telemetry.timed(GETTER_SECONDS)
+    def get_delay_columns(self, days: int = 30, start_date: Optional[datetime] = None,
+                          end_date: Optional[datetime] = None) -> Columns:
+        return self._delay_columns(days, start_date, end_date)
+    
+    def _delay_columns(self, days: int, start_date: Optional[datetime], end_date: Optional[datetime]) -> Columns:
+        # Without an explicit range, return `days` days from the default window start
+        start = start_date or self.start_date
+        end = end_date or (start + timedelta(days=days))
+        return self.delay_store.query(start, end)
+    
+    @telemetry.timed(GETTER_SECONDS)
+    def get_delay_frame(self, days: int = 30, start_date: Optional[datetime] = None,
+                        end_date: Optional[datetime] = None) -> pd.DataFrame:
+        return pd.DataFrame(self._delay_columns(days, start_date, end_date))
+    
+    @telemetry.timed(GETTER_SECONDS)
+    def get_delay_series(self, days: int = 30, start_date: Optional[datetime] = None,
+                         end_date: Optional[datetime] = None, max_buckets: Optional[int] = None) -> Columns:
+        """Delay count, hours and impact per bucket, at the finest resolution within ``max_buckets``"""
+        start = start_date or self.start_date
+        end = end_date or (start + timedelta(days=days))
+        return self.delay_rollup.series(start, end, max_buckets=max_buckets)
+    
+    @telemetry.timed(GETTER_SECONDS)
+    def get_financial_data(self, delay_multiplier: float = 1.0, start_date: Optional[datetime] = None,
+                           end_date: Optional[datetime] = None) -> List[Dict]:
+        return to_records(self._financial_columns(delay_multiplier, start_date, end_date))
+    
+    @telemetry.timed(GETTER_SECONDS)
+    def get_financial_columns(self, delay_multiplier: float = 1.0, start_date: Optional[datetime] = None,
+                              end_date: Optional[datetime] = None) -> Columns:
+        return self._financial_columns(delay_multiplier, start_date, end_date)
+    
+    def _financial_columns(self, delay_multiplier: float, start_date: Optional[datetime],
+                           end_date: Optional[datetime]) -> Columns:
+        start, end = self.resolve_window(start_date, end_date)
+        return scale_financial_columns(self.financial_store.query(start, end), delay_multiplier)
+    
+    @telemetry.timed(GETTER_SECONDS)
+    def get_financial_frame(self, delay_multiplier: float = 1.0, start_date: Optional[datetime] = None,
+                            end_date: Optional[datetime] = None) -> pd.DataFrame:
+        return pd.DataFrame(self._financial_columns(delay_multiplier, start_date, end_date))
     
+    @telemetry.timed(GETTER_SECONDS)
+    def get_financial_totals(self, delay_multiplier: float = 1.0, start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None) -> Dict[str, float]:
+        """Days covered and lost revenue and cost totals over the window, from the daily rollup"""
+        start, end = self.resolve_window(start_date, end_date)
+        return scale_financial_columns(self.financial_rollup.total(start, end), delay_multiplier)
+    
+    @telemetry.timed(GETTER_SECONDS)
+    def get_financial_series(self, delay_multiplier: float = 1.0, start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None, max_buckets: Optional[int] = None) -> Columns:
+        """Lost revenue and costs per bucket, at the finest resolution within ``max_buckets``"""
+        start, end = self.resolve_window(start_date, end_date)
+        return scale_financial_columns(self.financial_rollup.series(start, end, max_buckets=max_buckets),
+                                       delay_multiplier)
+    
+    @telemetry.timed(GETTER_SECONDS)
     def get_product_lines(self) -> List[ProductLine]:
         products = [
             {"name": "Sedan", "profit_margin": 0.15, "units_sold": 450000, "revenue": 13500000000},
@@ -190,13 +399,316 @@ class DataGenerator:
         
         return [ProductLine(**product) for product in products]
     
+    @telemetry.timed(GETTER_SECONDS)
     def get_bottleneck_data(self) -> List[Dict]:
         categories = {
-            "Supplier Issues": random.randint(25, 35),
-            "Transport Breakdown": random.randint(15, 25),
-            "Customs Delays": random.randint(10, 20),
-            "Weather": random.randint(5, 15),
-            "Equipment Failure": random.randint(20, 30)
+            "Supplier Issues": self.random.randint(25, 35),
+            "Transport Breakdown": self.random.randint(15, 25),
+            "Customs Delays": self.random.randint(10, 20),
+            "Weather": self.random.randint(5, 15),
+            "Equipment Failure": self.random.randint(20, 30)
         }
         
-        return [{"category": k, "incidents": v} for k, v in categories.items()]
\ No newline at end of file
+        return [{"category": k, "incidents": v} for k, v in categories.items()]
+
+def scale_financial_record(record: Dict, delay_multiplier: float) -> Dict:
+    """Financial losses are linear in the delay multiplier"""
+    if delay_multiplier == 1.0:
+        return dict(record)
+    return {
+        'date': record['date'],
+        'revenue_lost': record['revenue_lost'] * delay_multiplier,
+        'cost_expedited_shipping': record['cost_expedited_shipping'] * delay_multiplier,
+        'cost_idle_labor': record['cost_idle_labor'] * delay_multiplier,
+        'cost_penalties': record['cost_penalties'] * delay_multiplier
+    }
+
+
+def scale_financial_columns(columns: Dict, delay_multiplier: float) -> Dict:
+    """Column-wise scale_financial_record; also scales rollup totals, leaving their counts"""
+    if delay_multiplier == 1.0:
+        return columns
+    return {key: values * delay_multiplier if key in FINANCIAL_COLUMNS else values for key, values in columns.items()}
+
+
+class DataSnapshot:
+    """Read-only, versioned view of one generated dataset.
+
+    All random getters of the underlying generator are evaluated once at
+    construction and time series are read from the generator's time-indexed
+    stores, so every client and panel reading the same snapshot sees the
+    same numbers and a read is a lookup rather than a regeneration.
+    Returned sequences are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, generator: DataGenerator, version: int):
+        self.version = version
+        self.created_at = datetime.now()
+        self.built_at = time.monotonic()
+        self.start_date = generator.start_date
+        self.end_date = generator.end_date
+        self.factories = tuple(generator.factories)
+        self.assembly_lines = tuple(generator.assembly_lines)
+        self.factory_registry = generator.factory_registry
+        self.line_registry = generator.line_registry
+        self._generator = generator
+
+        self._inventory = tuple(generator.get_inventory_data())
+        self._quality = tuple(generator.get_quality_metrics())
+        self._product_lines = tuple(generator.get_product_lines())
+        self._bottlenecks = tuple(generator.get_bottleneck_data())
+
+        self._inventory_by_factory = self._group_by_factory(self._inventory, lambda i: i.factory_id)
+        self._quality_by_factory = self._group_by_factory(self._quality, lambda q: q.factory_id)
+        self.cube: Cube = build_cube(
+            self.factory_registry['id'], [category.value for category in DelayCategory],
+            generator.production_store.query(), generator.delay_store.query(),
+            records_to_columns([item.model_dump() for item in self._inventory]))
+
+    @staticmethod
+    def _group_by_factory(records: Sequence, key: Callable) -> Dict[int, tuple]:
+        grouped: Dict[int, list] = {}
+        for record in records:
+            grouped.setdefault(key(record), []).append(record)
+        return {factory_id: tuple(items) for factory_id, items in grouped.items()}
+
+    def get_kpi_data(self, delay_multiplier: float = 1.0) -> KPIData:
+        return self._generator.get_kpi_data(delay_multiplier)
+
+    def kpi_delays(self) -> Columns:
+        return self._generator.kpi_delays()
+
+    def get_production_data(self, factory_id: Optional[int] = None, start_date: Optional[datetime] = None,
+                            end_date: Optional[datetime] = None) -> Sequence[Dict]:
+        return self._generator.get_production_data(factory_id, start_date, end_date)
+
+    def get_production_frame(self, factory_id: Optional[int] = None, start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None) -> pd.DataFrame:
+        return self._generator.get_production_frame(factory_id, start_date, end_date)
+
+    def get_production_totals(self, factory_id: Optional[int] = None, start_date: Optional[datetime] = None,
+                              end_date: Optional[datetime] = None, filters: Optional[Filters] = None) -> Columns:
+        """Cars produced per factory from the rollup, or from the cube's production facts when cross-filtered"""
+        if not is_filtered(filters):
+            return self._generator.get_production_totals(factory_id, start_date, end_date)
+        start, end = self.resolve_window(start_date, end_date)
+        filters = self.cube.resolve({**filters, 'factory': factory_id or None}, 'production', start, end)
+        totals = self.cube['production'].totals(filters, 'factory', start, end)
+        keep = totals['count'] > 0
+        factory_ids = totals['factory'][keep]
+        return {
+            'factory_id': factory_ids,
+            'factory_name': self.factory_registry['name'][self.factory_registry.row_of(factory_ids)],
+            'cars_produced': totals['cars_produced'][keep].astype(np.int64),
+        }
+
+    def get_factory_selection(self, filters: Filters, start_date: Optional[datetime] = None,
+                              end_date: Optional[datetime] = None) -> Optional[np.ndarray]:
+        """Ids of the factories every selection reaches over the window, or None when nothing is selected"""
+        start, end = self.resolve_window(start_date, end_date)
+        return self.cube.factories(filters, start, end)
+
+    def get_inventory_data(self, factory_id: Optional[int] = None) -> Sequence[InventoryItem]:
+        if factory_id:
+            return self._inventory_by_factory.get(factory_id, ())
+        return self._inventory
+
+    def get_quality_metrics(self, factory_id: Optional[int] = None) -> Sequence[QualityMetric]:
+        if factory_id:
+            return self._quality_by_factory.get(factory_id, ())
+        return self._quality
+
+    def get_delay_data(self, days: int = 30, start_date: Optional[datetime] = None,
+                       end_date: Optional[datetime] = None) -> Sequence[Dict]:
+        return self._generator.get_delay_data(days, start_date, end_date)
+
+    def get_delay_frame(self, days: int = 30, start_date: Optional[datetime] = None,
+                        end_date: Optional[datetime] = None) -> pd.DataFrame:
+        return self._generator.get_delay_frame(days, start_date, end_date)
+
+    def resolve_window(self, start_date: Optional[datetime],
+                       end_date: Optional[datetime]) -> Tuple[datetime, datetime]:
+        return self._generator.resolve_window(start_date, end_date)
+
+    def delay_window(self, days: int = 30, start_date: Optional[datetime] = None,
+                     end_date: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+        """Window of the delay getters: ``days`` from the start when the end is missing"""
+        start = start_date or self.start_date
+        return start, end_date or (start + timedelta(days=days))
+
+    def delay_resolution(self, days: int = 30, start_date: Optional[datetime] = None,
+                         end_date: Optional[datetime] = None, max_buckets: Optional[int] = None) -> str:
+        """Bucket size of the delay trend get_delay_series returns for the window"""
+        return self._generator.delay_rollup.resolution_for(*self.delay_window(days, start_date, end_date),
+                                                           max_buckets)
+
+    def get_delay_series(self, days: int = 30, start_date: Optional[datetime] = None,
+                         end_date: Optional[datetime] = None, max_buckets: Optional[int] = None,
+                         filters: Optional[Filters] = None) -> Columns:
+        """Delay trend from the rollup, or from the cube's delay facts when cross-filtered"""
+        if not is_filtered(filters):
+            return self._generator.get_delay_series(days, start_date, end_date, max_buckets)
+        start, end = self.delay_window(days, start_date, end_date)
+        resolution = self.delay_resolution(days, start, end, max_buckets)
+        return self.cube['delays'].series(self.cube.resolve(filters, 'delays', start, end), start, end, resolution)
+
+    def get_delay_causes(self, filters: Filters, days: int = 30, start_date: Optional[datetime] = None,
+                         end_date: Optional[datetime] = None) -> Columns:
+        """Delay count, hours and impact per delay category over the window, from the cube"""
+        start, end = self.delay_window(days, start_date, end_date)
+        return self.cube['delays'].totals(self.cube.resolve(filters, 'delays', start, end), 'category', start, end)
+
+    def get_inventory_totals(self, filters: Filters, start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None) -> Columns:
+        """Current and target stock per part, from the cube; the window only scopes delay selections"""
+        start, end = self.resolve_window(start_date, end_date)
+        return self.cube['inventory'].totals(self.cube.resolve(filters, 'inventory', start, end), 'part')
+
+    def get_financial_data(self, delay_multiplier: float = 1.0, start_date: Optional[datetime] = None,
+                           end_date: Optional[datetime] = None) -> Sequence[Dict]:
+        return self._generator.get_financial_data(delay_multiplier, start_date, end_date)
+
+    def get_financial_frame(self, delay_multiplier: float = 1.0, start_date: Optional[datetime] = None,
+                            end_date: Optional[datetime] = None) -> pd.DataFrame:
+        return self._generator.get_financial_frame(delay_multiplier, start_date, end_date)
+
+    def financial_resolution(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                             max_buckets: Optional[int] = None) -> str:
+        """Bucket size of the lost revenue trend get_financial_series returns for the window"""
+        return self._generator.financial_rollup.resolution_for(*self.resolve_window(start_date, end_date),
+                                                               max_buckets)
+
+    def get_financial_totals(self, delay_multiplier: float = 1.0, start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None,
+                             filters: Optional[Filters] = None) -> Dict[str, float]:
+        """Range totals from the rollup, or the daily cross-filtered series summed when filtered"""
+        if not is_filtered(filters):
+            return self._generator.get_financial_totals(delay_multiplier, start_date, end_date)
+        series = self.get_financial_series(delay_multiplier, start_date, end_date, filters=filters)
+        return {key: float(values.sum()) for key, values in series.items() if key != 'date'}
+
+    def get_financial_series(self, delay_multiplier: float = 1.0, start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None, max_buckets: Optional[int] = None,
+                             filters: Optional[Filters] = None) -> Columns:
+        """Lost revenue and costs per bucket, at the finest resolution within ``max_buckets``.
+
+        Financial facts have no dimensions, so a cross-filtered series is
+        allocated to the selection: each bucket keeps the share of its
+        losses that the selected delays hold of that bucket's delay impact.
+        """
+        series = self._generator.get_financial_series(delay_multiplier, start_date, end_date, max_buckets)
+        if not is_filtered(filters) or not len(series['date']):
+            return series
+        start, end = self.resolve_window(start_date, end_date)
+        resolution = self._generator.financial_rollup.resolution_for(start, end, max_buckets)
+        delays = self.cube['delays']
+        selected = delays.series(self.cube.resolve(filters, 'delays', start, end), start, end, resolution)
+        overall = delays.series({}, start, end, resolution)
+        impact = np.divide(selected['financial_impact'], overall['financial_impact'],
+                           out=np.zeros(len(overall['date'])), where=overall['financial_impact'] > 0)
+        # Buckets without delay facts get no share
+        share = np.zeros(len(series['date']))
+        index = np.searchsorted(overall['date'], series['date'])
+        matched = index < len(overall['date'])
+        matched[matched] &= overall['date'][index[matched]] == series['date'][matched]
+        share[matched] = impact[index[matched]]
+        scaled = {key: values * share if key in FINANCIAL_COLUMNS else values for key, values in series.items()}
+        # Buckets the selection has no share of count as empty, so a selection matching nothing plots nothing
+        scaled['count'] = np.where(share > 0, series['count'], 0)
+        return scaled
+
+    def get_product_lines(self) -> Sequence[ProductLine]:
+        return self._product_lines
+
+    def get_bottleneck_data(self) -> Sequence[Dict]:
+        return self._bottlenecks
+
+
+class SnapshotService:
+    """Process-wide holder of the current DataSnapshot.
+
+    The dataset is rebuilt at most once per refresh interval; every caller in
+    between receives the same snapshot instance. Without a generator factory
+    the service builds nothing itself and serves whatever a loader last
+    passed to publish(). Every new snapshot is applied to ``kpis``, the
+    running KPI aggregates the dashboard reads.
+    """
+
+    def __init__(self, refresh_interval: float = 30.0,
+                 generator_factory: Optional[Callable[[], DataGenerator]] = DataGenerator):
+        self.refresh_interval = refresh_interval
+        self._generator_factory = generator_factory
+        self._snapshot: Optional[DataSnapshot] = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._published = threading.Condition(self._lock)
+        self.kpis = KPIEngine()
+
+    def use_external_source(self) -> None:
+        """Stop building snapshots locally; a loader publishes them instead"""
+        with self._lock:
+            self._generator_factory = None
+
+    def _is_fresh(self, snapshot: Optional[DataSnapshot]) -> bool:
+        if snapshot is None:
+            return False
+        if self._generator_factory is None:
+            # Published snapshots stay current until their loader replaces them
+            return True
+        return time.monotonic() - snapshot.built_at < self.refresh_interval
+
+    def is_stale(self) -> bool:
+        """Whether the next get() will have to build or wait for a new snapshot"""
+        return not self._is_fresh(self._snapshot)
+
+    def get(self, timeout: float = 60.0) -> DataSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and self._is_fresh(snapshot):
+            return snapshot
+        with self._lock:
+            # Another thread may have rebuilt while we waited for the lock
+            snapshot = self._snapshot
+            if snapshot is None or not self._is_fresh(snapshot):
+                if self._generator_factory is None:
+                    snapshot = self._published.wait_for(lambda: self._snapshot, timeout)
+                    if snapshot is None:
+                        raise RuntimeError('No data snapshot has been published yet')
+                else:
+                    self._version += 1
+                    snapshot = DataSnapshot(self._generator_factory(), self._version)
+                    self._replace(snapshot)
+            return snapshot
+
+    def publish(self, source: DataGenerator) -> DataSnapshot:
+        """Make a snapshot of an externally loaded dataset the current one"""
+        with self._lock:
+            self._version += 1
+            snapshot = DataSnapshot(source, self._version)
+            self._replace(snapshot)
+            self._published.notify_all()
+            return snapshot
+
+    def adopt(self, snapshot: DataSnapshot) -> None:
+        """Make a snapshot built by another process the current one, keeping its version"""
+        with self._lock:
+            self._version = snapshot.version
+            self._replace(snapshot)
+            self._published.notify_all()
+
+    def _replace(self, snapshot: DataSnapshot) -> None:
+        self.kpis.sync(snapshot.factory_registry, snapshot.kpi_delays(), snapshot.version)
+        self._snapshot = snapshot
+
+    def invalidate(self) -> None:
+        """Force the next get() to build a new snapshot"""
+        with self._lock:
+            if self._generator_factory is not None:
+                self._snapshot = None
+
+
+snapshot_service = SnapshotService(refresh_interval=float(os.environ.get('APP_SNAPSHOT_REFRESH_SECONDS', 30)))
+
+
+def get_snapshot() -> DataSnapshot:
+    """Return the shared snapshot, rebuilding it if the refresh interval elapsed"""
+    return snapshot_service.get()
@@ -0,0 +1,104 @@
+import math
+import os
+import numpy as np
+import pandas as pd
+
+# Points drawn per pixel of chart width; one is enough for a line to look unchanged
+POINTS_PER_PIXEL = float(os.environ.get('APP_CHART_POINTS_PER_PIXEL', 1.0))
+# Widths are rounded up to a multiple of this, so clients with similar charts share payloads
+WIDTH_STEP = 200
+DEFAULT_CHART_WIDTH = 800
+MIN_POINTS = 100
+# LTTB inputs longer than this multiple of the target are first reduced with min/max buckets
+PRESELECT_RATIO = 4
+
+
+def chart_points(width: float) -> int:
+    """Target point count for a chart ``width`` pixels wide"""
+    width = max(math.ceil(width / WIDTH_STEP), 1) * WIDTH_STEP
+    return max(int(width * POINTS_PER_PIXEL), MIN_POINTS)
+
+
+DEFAULT_POINTS = chart_points(DEFAULT_CHART_WIDTH)
+
+
+def _numeric(values) -> np.ndarray:
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+
+def minmax_indices(y, points: int) -> np.ndarray:
+    """Indices of the first and last point and of the minimum and maximum of equal buckets.
+
+    Every local extreme survives, so spikes stay visible at any zoom. Returns
+    at most ``points`` indices in order.
+    """
+    y = _numeric(y)
+    n = len(y)
+    if n <= points:
+        return np.arange(n)
+    buckets = max((points - 2) // 2, 1)
+    size = math.ceil(n / buckets)
+    buckets = math.ceil(n / size)
+    # The last bucket is padded by repeating the final point
+    grid = np.minimum(np.arange(buckets * size), n - 1).reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lows = np.minimum(offsets + np.argmin(y[grid], axis=1), n - 1)
+    highs = np.minimum(offsets + np.argmax(y[grid], axis=1), n - 1)
+    return np.unique(np.concatenate(([0, n - 1], lows, highs)))
+
+
+def lttb_indices(x, y, points: int) -> np.ndarray:
+    """Indices picked by Largest-Triangle-Three-Buckets, always including the first and last point.
+
+    Each bucket keeps the point spanning the largest triangle with the point
+    kept from the previous bucket and the mean of the next one. Inputs much
+    longer than ``points`` are reduced with ``minmax_indices`` first.
+    """
+    x, y = _numeric(x), _numeric(y)
+    n = len(y)
+    if n <= points or points < 3:
+        return np.arange(n) if n <= points else np.array([0, n - 1])
+    if n > PRESELECT_RATIO * points:
+        candidates = minmax_indices(y, PRESELECT_RATIO * points)
+        return candidates[lttb_indices(x[candidates], y[candidates], points)]
+
+    # points - 2 buckets between the fixed first and last point, padded into a
+    # grid by repeating each bucket's first point
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    starts, sizes = edges[:-1], np.diff(edges)
+    columns = np.arange(sizes.max())
+    grid = starts[:, None] + np.where(columns < sizes[:, None], columns, 0)
+    grid_x, grid_y = x[grid], y[grid]
+    mean_x = np.add.reduceat(x[1:n - 1], starts - 1) / sizes
+    mean_y = np.add.reduceat(y[1:n - 1], starts - 1) / sizes
+    # The third vertex for each bucket is the mean of the next bucket, or the last point
+    next_x, next_y = np.append(mean_x[1:], x[-1]), np.append(mean_y[1:], y[-1])
+
+    # Only the dependency on the previous pick is sequential; each step is one vector expression
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket in range(points - 2):
+        # Twice the triangle area, up to sign, expanded so the bucket is touched once
+        ax, ay = x[a], y[a]
+        cx, cy = next_x[bucket], next_y[bucket]
+        area = np.abs(grid_y[bucket] * (ax - cx) + grid_x[bucket] * (cy - ay) + (cx * ay - ax * cy))
+        a = grid[bucket, area.argmax()]
+        selected[bucket + 1] = a
+    return selected
+
+
+def downsample(frame: pd.DataFrame, x: str, y: str, points: int, method: str = 'lttb') -> pd.DataFrame:
+    """Rows of ``frame`` (sorted by ``x``) reduced to at most ``points`` for plotting ``y`` over ``x``"""
+    if len(frame) <= points:
+        return frame
+    if method == 'lttb':
+        rows = lttb_indices(frame[x].to_numpy(), frame[y].to_numpy(), points)
+    elif method == 'minmax':
+        rows = minmax_indices(frame[y].to_numpy(), points)
+    else:
+        raise ValueError(f'Unknown downsampling method "{method}", expected "lttb" or "minmax"')
+    return frame.iloc[rows]
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+from app import shared_snapshot
+from app.data_generator import DataSnapshot, get_snapshot, snapshot_service
+
+R = TypeVar('R')
+
+# Snapshot a process pool worker has attached to, with its version
+_attached: Optional[Tuple[int, DataSnapshot]] = None
+
+
+def _run_attached(path: str, version: int, fn: Callable[..., R], args: Tuple, kwargs: Dict[str, Any]) -> R:
+    """Run ``fn`` on snapshot ``version`` in a pool worker, mapping its shared file the first time"""
+    global _attached
+    if _attached is None or _attached[0] != version:
+        _attached = (version, shared_snapshot.attach(path))
+    return fn(_attached[1], *args, **kwargs)
+
+
+class PanelExecutor:
+    """Runs panel computations (pandas aggregation, figure building) off the event loop.
+
+    ``kind`` selects a thread pool or a process pool. Functions submitted to
+    a process pool must be module-level and receive all their data as
+    picklable arguments. Panel builds in a process pool get the snapshot as
+    a path to its shared file instead: each worker maps a version once and
+    only the panel inputs are pickled per refresh. The file is the one the
+    multi-worker producer published, or one the executor writes itself to a
+    private directory. ``max_concurrent`` caps how many refreshes run at
+    once across all clients of the process, so a burst of page loads cannot
+    occupy every core.
+    """
+
+    def __init__(self, kind: str = 'thread', max_workers: Optional[int] = None, max_concurrent: int = 4):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f'Unknown panel executor kind "{kind}", expected "thread" or "process"')
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_concurrent = max_concurrent
+        self._pool: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._publisher: Optional[shared_snapshot.SnapshotPublisher] = None
+        self._files: Dict[int, asyncio.Future] = {}
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == 'process':
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='panel')
+        return self._pool
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def run(self, fn: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), partial(fn, *args, **kwargs))
+
+    async def run_panel(self, fn: Callable[..., R], snapshot: DataSnapshot, *args: Any, **kwargs: Any) -> R:
+        """Run ``fn(snapshot, *args, **kwargs)``; a process pool reads the snapshot from its shared file"""
+        if self.kind == 'thread':
+            return await self.run(fn, snapshot, *args, **kwargs)
+        path = await self._snapshot_path(snapshot)
+        return await self.run(_run_attached, path, snapshot.version, fn, args, kwargs)
+
+    async def _snapshot_path(self, snapshot: DataSnapshot) -> str:
+        name = shared_snapshot.snapshot_file(snapshot.version)
+        if shared_snapshot.DIRECTORY:
+            path = os.path.join(shared_snapshot.DIRECTORY, name)
+            if os.path.exists(path):
+                return path
+        # Write each version once, however many refreshes ask for it at the same time
+        written = self._files.get(snapshot.version)
+        if written is None:
+            written = asyncio.ensure_future(asyncio.to_thread(self._write, snapshot))
+            self._files = {snapshot.version: written}
+        try:
+            return await asyncio.shield(written)
+        except Exception:
+            self._files.pop(snapshot.version, None)
+            raise
+
+    def _write(self, snapshot: DataSnapshot) -> str:
+        if self._publisher is None:
+            shm = '/dev/shm' if os.path.isdir('/dev/shm') else None
+            self._publisher = shared_snapshot.SnapshotPublisher(tempfile.mkdtemp(prefix='panels-', dir=shm))
+        name = self._publisher.publish(snapshot)
+        return os.path.join(self._publisher.directory, name)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._publisher is not None:
+            # Workers still mapping a file keep their mapping after it is removed
+            shutil.rmtree(self._publisher.directory, ignore_errors=True)
+            self._publisher = None
+            self._files = {}
+
+
+panel_executor = PanelExecutor(
+    kind=os.environ.get('APP_PANEL_EXECUTOR', 'thread'),
+    max_workers=int(os.environ['APP_PANEL_WORKERS']) if os.environ.get('APP_PANEL_WORKERS') else None,
+    max_concurrent=int(os.environ.get('APP_MAX_CONCURRENT_REFRESHES', 4)),
+)
+
+
+async def run_panel(fn: Callable[..., R], snapshot: DataSnapshot, *args: Any, **kwargs: Any) -> R:
+    """Run a panel build function on ``snapshot`` in the shared panel executor"""
+    return await panel_executor.run_panel(fn, snapshot, *args, **kwargs)
+
+
+async def current_snapshot() -> DataSnapshot:
+    """Return the shared snapshot without blocking the event loop on a rebuild"""
+    if not snapshot_service.is_stale():
+        return get_snapshot()
+    return await asyncio.to_thread(get_snapshot)
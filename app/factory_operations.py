@@ -1,164 +1,287 @@
-from nicegui import ui, app
+from nicegui import ui
 import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
-from app.data_generator import DataGenerator
+from typing import Dict, Optional
+from app.data_generator import DataSnapshot
+from app.broadcast import broadcast_hub
+from app.controls import toggle_selection
+from app.executor import current_snapshot
+from app.figures import FigureUpdater, empty_figure
+from app.ingestion import LIVE_REFRESH_SECONDS, ingestion, live_line_columns
+from app.models import FactoryStatus
+from app.refresh import RefreshScheduler
+from app.session import current_session
+from app.timeseries import Columns, range_title, to_range
 
-def create():
-    """Create factory operations and production insights"""
+ROWS_PER_PAGE = 8
+ROWS_PER_PAGE_OPTIONS = (8, 25, 50, 100)
+
+# Efficiency filters of the assembly line table: key -> (label, [low, high) in percent)
+EFFICIENCY_BANDS = {
+    'low': ('Below 80%', (0.0, 80.0)),
+    'medium': ('80-95%', (80.0, 95.0)),
+    'high': ('95% and above', (95.0, float('inf'))),
+}
+
+def query_assembly_lines(data_gen: DataSnapshot, selected_factory: Optional[int] = None,
+                         status: Optional[str] = None, efficiency_band: Optional[str] = None,
+                         page: int = 1, rows_per_page: int = 8, sort_by: Optional[str] = None,
+                         descending: bool = False, live: Optional[Columns] = None) -> Dict:
+    """Return one page of assembly line table rows and the number of matching lines.
     
-    def update_factory_operations():
-        data_gen = DataGenerator()
-        selected_factory = app.storage.user.get('selected_factory')
-        
-        # Production Volume by Factory
-        production_data = data_gen.get_production_data(selected_factory)
-        df_production = pd.DataFrame(production_data)
-        
-        if not df_production.empty:
-            # Group by factory and sum production
-            factory_production = df_production.groupby('factory_name')['cars_produced'].sum().reset_index()
-            
-            fig_production = go.Figure()
-            fig_production.add_trace(go.Bar(
-                x=factory_production['factory_name'],
-                y=factory_production['cars_produced'],
-                name='Cars Produced',
-                marker_color='#3B82F6'
-            ))
-            
-            fig_production.update_layout(
-                title='Monthly Production by Factory',
-                xaxis_title='Factory',
-                yaxis_title='Cars Produced',
-                height=400,
-                margin=dict(l=0, r=0, t=40, b=0)
-            )
-            
-            production_chart.update_figure(fig_production)
-        
-        # Assembly Line Status
-        assembly_lines = data_gen.assembly_lines
-        if selected_factory:
-            assembly_lines = [line for line in assembly_lines if line.factory_id == selected_factory]
-        
-        # Update assembly line table
-        assembly_data = []
-        for line in assembly_lines[:8]:  # Show first 8 lines
-            factory_name = next(f.name for f in data_gen.factories if f.id == line.factory_id)
-            efficiency = (line.output_rate / line.target_rate) * 100
-            assembly_data.append({
-                'factory': factory_name,
-                'line': line.name,
-                'status': line.status.value.title(),
-                'output_rate': f"{line.output_rate} cars/hour",
-                'target_rate': f"{line.target_rate} cars/hour",
-                'efficiency': f"{efficiency:.1f}%"
-            })
-        
-        assembly_table.update_rows(assembly_data)
+    ``live`` holds the streamed output rates of every line, which replace the static ones.
+    """
+    lines = data_gen.line_registry
+    band = EFFICIENCY_BANDS[efficiency_band][1] if efficiency_band in EFFICIENCY_BANDS else None
+    rows, total = lines.query(selected_factory, status, band, sort_by, descending,
+                              offset=(max(page, 1) - 1) * rows_per_page, limit=rows_per_page, live=live)
+    columns = {**lines.columns, **live} if live else lines.columns
+    
+    def rates(column):
+        if column not in columns:
+            return ['—'] * len(rows)
+        return [f"{rate:.0f} cars/hour" for rate in columns[column][rows].tolist()]
+    
+    return {
+        'total': total,
+        'rows': [{
+            'id': line_id,
+            'factory': factory_name,
+            'line': name,
+            'status': line_status.title(),
+            'output_rate': output,
+            'rate_1m': rate_1m,
+            'rate_1h': rate_1h,
+            'target_rate': f"{target} cars/hour",
+            'efficiency': f"{efficiency:.1f}%"
+        } for line_id, factory_name, name, line_status, output, rate_1m, rate_1h, target, efficiency in zip(
+            lines['id'][rows].tolist(), lines['factory_name'][rows].tolist(), lines['name'][rows].tolist(),
+            lines['status'][rows].tolist(), rates('output_rate'), rates('rate_1m'), rates('rate_1h'),
+            lines['target_rate'][rows].tolist(), columns['efficiency'][rows].tolist())],
+    }
+
+def build_factory_operations(data_gen: DataSnapshot, selected_factory: Optional[int] = None,
+                             start_date: Optional[str] = None, end_date: Optional[str] = None,
+                             selected_part: Optional[str] = None, selected_category: Optional[str] = None) -> Dict:
+    """Compute figures and table rows for the factory operations section.
+    
+    Runs in the panel executor and returns a ready-to-send payload.
+    """
+    payload = {}
+    
+    # Production Volume by Factory over the selected time range
+    start, end = to_range(start_date, end_date)
+    window = range_title(*data_gen.resolve_window(start, end))
+    # A part or delay cause narrows every chart to the factories it reaches
+    selections = {'part': selected_part, 'category': selected_category}
+    # Per-factory totals come from the production rollup, whatever the length of the range
+    factory_production = pd.DataFrame(data_gen.get_production_totals(selected_factory, start, end,
+                                                                      filters=selections))
+    
+    if not factory_production.empty:
+        factory_production = factory_production.sort_values('factory_name', kind='stable')
         
-        # Parts Inventory Levels
-        inventory_data = data_gen.get_inventory_data(selected_factory)
-        df_inventory = pd.DataFrame([{
-            'part_name': item.part_name,
-            'current_stock': item.current_stock,
-            'target_stock': item.target_stock,
-            'factory_id': item.factory_id
-        } for item in inventory_data])
+        fig_production = go.Figure()
+        fig_production.add_trace(go.Bar(
+            x=factory_production['factory_name'].tolist(),
+            y=factory_production['cars_produced'],
+            customdata=factory_production['factory_id'].tolist(),
+            name='Cars Produced',
+            marker_color='#3B82F6'
+        ))
         
-        if not df_inventory.empty:
-            # Group by part name and sum stocks
-            inventory_summary = df_inventory.groupby('part_name').agg({
-                'current_stock': 'sum',
-                'target_stock': 'sum'
-            }).reset_index()
-            
-            fig_inventory = go.Figure()
-            fig_inventory.add_trace(go.Scatter(
-                x=inventory_summary['part_name'],
-                y=inventory_summary['current_stock'],
-                mode='lines+markers',
-                name='Current Stock',
-                line=dict(color='#10B981')
-            ))
-            fig_inventory.add_trace(go.Scatter(
-                x=inventory_summary['part_name'],
-                y=inventory_summary['target_stock'],
-                mode='lines+markers',
-                name='Target Stock',
-                line=dict(color='#F59E0B', dash='dash')
-            ))
-            
-            fig_inventory.update_layout(
-                title='Parts Inventory Levels',
-                xaxis_title='Part Type',
-                yaxis_title='Stock Level',
-                height=400,
-                margin=dict(l=0, r=0, t=40, b=0)
-            )
-            
-            inventory_chart.update_figure(fig_inventory)
+        fig_production.update_layout(
+            title=f'Production by Factory, {window}',
+            xaxis_title='Factory',
+            yaxis_title='Cars Produced',
+            height=400,
+            margin=dict(l=0, r=0, t=40, b=0)
+        )
         
-        # Quality Control Metrics
-        quality_data = data_gen.get_quality_metrics(selected_factory)
-        total_passed = sum(q.passed for q in quality_data)
-        total_failed = sum(q.failed for q in quality_data)
+        payload['production'] = fig_production.to_plotly_json()
+    else:
+        # An empty figure replaces the previous selection's bars rather than leaving them up
+        payload['production'] = empty_figure(f'Production by Factory, {window}')
+    
+    # Parts Inventory Levels at the selected factories, summed per part by the cube; the
+    # selected part is highlighted rather than filtered out
+    inventory_summary = pd.DataFrame(data_gen.get_inventory_totals(
+        {'factory': selected_factory or None, 'category': selected_category}, start, end))
+    inventory_summary = inventory_summary[inventory_summary['count'] > 0]
+    
+    if not inventory_summary.empty:
+        parts = inventory_summary['part'].tolist()
+        # The selected part is drawn larger so it stands out on both lines
+        marker_size = [14 if part == selected_part else 6 for part in parts]
         
-        fig_quality = go.Figure(data=[go.Pie(
-            labels=['Passed', 'Failed'],
-            values=[total_passed, total_failed],
-            marker_colors=['#10B981', '#EF4444']
-        )])
+        fig_inventory = go.Figure()
+        fig_inventory.add_trace(go.Scatter(
+            x=parts,
+            y=inventory_summary['current_stock'],
+            mode='lines+markers',
+            name='Current Stock',
+            customdata=parts,
+            line=dict(color='#10B981'),
+            marker=dict(size=marker_size)
+        ))
+        fig_inventory.add_trace(go.Scatter(
+            x=parts,
+            y=inventory_summary['target_stock'],
+            mode='lines+markers',
+            name='Target Stock',
+            customdata=parts,
+            line=dict(color='#F59E0B', dash='dash'),
+            marker=dict(size=marker_size)
+        ))
         
-        fig_quality.update_layout(
-            title='Quality Control Pass/Fail Rate',
+        fig_inventory.update_layout(
+            title='Parts Inventory Levels',
+            xaxis_title='Part Type',
+            yaxis_title='Stock Level',
             height=400,
             margin=dict(l=0, r=0, t=40, b=0)
         )
         
-        quality_chart.update_figure(fig_quality)
+        payload['inventory'] = fig_inventory.to_plotly_json()
+    else:
+        payload['inventory'] = empty_figure(f'Parts Inventory Levels, {window}')
+    
+    # Quality Control Metrics
+    quality_data = data_gen.get_quality_metrics(selected_factory)
+    reached = data_gen.get_factory_selection(selections, start, end)
+    if reached is not None:
+        reached = set(reached.tolist())
+        quality_data = [q for q in quality_data if q.factory_id in reached]
+    total_passed = sum(q.passed for q in quality_data)
+    total_failed = sum(q.failed for q in quality_data)
+    
+    fig_quality = go.Figure(data=[go.Pie(
+        labels=['Passed', 'Failed'],
+        values=[total_passed, total_failed],
+        marker_colors=['#10B981', '#EF4444']
+    )])
+    
+    fig_quality.update_layout(
+        title='Quality Control Pass/Fail Rate',
+        height=400,
+        margin=dict(l=0, r=0, t=40, b=0)
+    )
+    
+    payload['quality'] = fig_quality.to_plotly_json()
+    return payload
+
+def create(scheduler: RefreshScheduler):
+    """Create factory operations and production insights"""
+    session = current_session()
+    
+    def apply_payload(payload):
+        production_chart.update(payload['production'])
+        inventory_chart.update(payload['inventory'])
+        quality_chart.update(payload['quality'])
+    
+    async def load_assembly_page():
+        """Fetch only the requested page of the assembly line table from the server-side query"""
+        data_gen = await current_snapshot()
+        pagination = assembly_table.pagination
+        result = query_assembly_lines(
+            data_gen,
+            selected_factory=session.get('selected_factory'),
+            status=status_filter.value,
+            efficiency_band=efficiency_filter.value,
+            page=pagination.get('page', 1),
+            rows_per_page=pagination.get('rowsPerPage') or ROWS_PER_PAGE,
+            sort_by=pagination.get('sortBy'),
+            descending=pagination.get('descending', False),
+            live=live_line_columns(data_gen.line_registry)
+        )
+        assembly_table.rows = result['rows']
+        assembly_table.pagination = {**pagination, 'rowsNumber': result['total']}
+        assembly_table.props(remove='loading')
+    
+    async def request_page(e):
+        assembly_table.pagination = e.args['pagination']
+        await load_assembly_page()
+    
+    async def change_table_filter():
+        assembly_table.pagination = {**assembly_table.pagination, 'page': 1}
+        await load_assembly_page()
+    
+    async def select_factory(e):
+        # Clicking a factory's bar filters every panel to it; clicking it again clears the filter
+        await toggle_selection(scheduler, 'selected_factory', e.args['points'][0]['customdata'])
+    
+    async def select_part(e):
+        await toggle_selection(scheduler, 'selected_part', e.args['points'][0]['customdata'])
+    
+    async def update_factory_operations():
+        await view.refresh(
+            selected_factory=session.get('selected_factory'),
+            start_date=session.get('start_date'),
+            end_date=session.get('end_date'),
+            selected_part=session.get('selected_part'),
+            selected_category=session.get('selected_category')
+        )
+        # The factory filter may have changed, so start again from the first page
+        await change_table_filter()
     
     with ui.row().classes('w-full gap-4 mb-6'):
         # Left column - Production chart and assembly line status
         with ui.column().classes('flex-1'):
             with ui.card().classes('mb-4'):
                 with ui.card_section():
-                    production_chart = ui.plotly({}).classes('w-full')
+                    production_chart = FigureUpdater(ui.plotly({}).classes('w-full'))
+                    production_chart.chart.on('plotly_click', select_factory)
             
             with ui.card():
                 with ui.card_section():
                     ui.label('Assembly Line Status').classes('text-lg font-semibold mb-4')
+                    with ui.row().classes('w-full gap-4'):
+                        status_filter = ui.select(
+                            {None: 'All statuses', **{status.value: status.value.title() for status in FactoryStatus}},
+                            value=None, label='Status', on_change=change_table_filter
+                        ).classes('w-40')
+                        efficiency_filter = ui.select(
+                            {None: 'All efficiencies', **{key: label for key, (label, _) in EFFICIENCY_BANDS.items()}},
+                            value=None, label='Efficiency', on_change=change_table_filter
+                        ).classes('w-40')
+                    # Rows are paged, sorted and filtered on the server; the client
+                    # only ever holds the page it shows
                     assembly_table = ui.table(
                         columns=[
-                            {'name': 'factory', 'label': 'Factory', 'field': 'factory'},
-                            {'name': 'line', 'label': 'Line', 'field': 'line'},
-                            {'name': 'status', 'label': 'Status', 'field': 'status'},
-                            {'name': 'output_rate', 'label': 'Output Rate', 'field': 'output_rate'},
-                            {'name': 'target_rate', 'label': 'Target Rate', 'field': 'target_rate'},
-                            {'name': 'efficiency', 'label': 'Efficiency', 'field': 'efficiency'},
+                            {'name': 'factory', 'label': 'Factory', 'field': 'factory', 'sortable': True},
+                            {'name': 'line', 'label': 'Line', 'field': 'line', 'sortable': True},
+                            {'name': 'status', 'label': 'Status', 'field': 'status', 'sortable': True},
+                            {'name': 'output_rate', 'label': 'Output Rate', 'field': 'output_rate', 'sortable': True},
+                            {'name': 'rate_1m', 'label': 'Last Minute', 'field': 'rate_1m', 'sortable': True},
+                            {'name': 'rate_1h', 'label': 'Last Hour', 'field': 'rate_1h', 'sortable': True},
+                            {'name': 'target_rate', 'label': 'Target Rate', 'field': 'target_rate', 'sortable': True},
+                            {'name': 'efficiency', 'label': 'Efficiency', 'field': 'efficiency', 'sortable': True},
                         ],
                         rows=[],
-                        row_key='line'
-                    ).classes('w-full')
+                        row_key='id',
+                        pagination={'page': 1, 'rowsPerPage': ROWS_PER_PAGE, 'sortBy': None, 'descending': False,
+                                    'rowsNumber': 0}
+                    ).classes('w-full').props(f'loading :rows-per-page-options="{list(ROWS_PER_PAGE_OPTIONS)}"')
+                    assembly_table.on('request', request_page, args=['pagination'])
+                    # Output rates stream in, so the visible page is re-read while the dashboard is open
+                    if ingestion.enabled:
+                        ui.timer(LIVE_REFRESH_SECONDS, load_assembly_page)
         
         # Right column - Inventory and quality charts
         with ui.column().classes('flex-1'):
             with ui.card().classes('mb-4'):
                 with ui.card_section():
-                    inventory_chart = ui.plotly({}).classes('w-full')
+                    inventory_chart = FigureUpdater(ui.plotly({}).classes('w-full'))
+                    inventory_chart.chart.on('plotly_click', select_part)
             
             with ui.card():
                 with ui.card_section():
-                    quality_chart = ui.plotly({}).classes('w-full')
+                    quality_chart = FigureUpdater(ui.plotly({}).classes('w-full'))
     
-    # Initialize factory operations
-    update_factory_operations()
+    # Clients viewing the same factory and range share one computed payload
+    view = broadcast_hub.subscribe('factory_operations', build_factory_operations, apply_payload)
+    ui.context.client.on_disconnect(view.close)
     
-    # Store update function for use by controls
-    if 'update_charts' not in app.storage.user:
-        app.storage.user['update_charts'] = update_factory_operations
-    else:
-        # Chain multiple update functions
-        existing_update = app.storage.user['update_charts']
-        app.storage.user['update_charts'] = lambda: (existing_update(), update_factory_operations())
\ No newline at end of file
+    # Recompute only when an input this section reads changes
+    scheduler.register('factory_operations', update_factory_operations,
+                       inputs={'selected_factory', 'selected_part', 'selected_category', 'start_date', 'end_date'})
\ No newline at end of file
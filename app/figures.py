@@ -0,0 +1,185 @@
+import base64
+import json
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional
+from nicegui import ui
+from plotly.utils import PlotlyJSONEncoder
+from app.telemetry import FIGURE_UPDATE_BYTES, telemetry
+
+# Trace keys that hold the per-point data Plotly.extendTraces can append to
+EXTENDABLE_KEYS = ('x', 'y', 'lat', 'lon', 'text', 'customdata')
+
+
+def _flatten(value: Dict, prefix: str = '') -> Dict[str, Any]:
+    """Flatten nested dicts into Plotly's dotted attribute paths (``marker.color``)"""
+    flat = {}
+    for key, item in value.items():
+        path = f'{prefix}{key}'
+        # Plotly encodes numpy arrays as {'dtype', 'bdata'} typed-array specs,
+        # which are values rather than nested attributes
+        if isinstance(item, dict) and item and 'bdata' not in item:
+            flat.update(_flatten(item, f'{path}.'))
+        else:
+            flat[path] = item
+    return flat
+
+
+def _same(a: Any, b: Any) -> bool:
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        a, b = np.asarray(a), np.asarray(b)
+        return a.shape == b.shape and bool(np.array_equal(a, b))
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+def _as_array(value: Any) -> Optional[np.ndarray]:
+    if isinstance(value, dict) and 'bdata' in value:
+        array = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+        return array.reshape(value['shape']) if 'shape' in value else array
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return np.asarray(value)
+    return None
+
+
+def _appended(old: Any, new: Any) -> Optional[np.ndarray]:
+    """The points added to the end of ``old`` to get ``new``, if that is all that changed"""
+    old_array, new_array = _as_array(old), _as_array(new)
+    if old_array is None or new_array is None or old_array.ndim != 1 or new_array.ndim != 1:
+        return None
+    if not 0 < len(old_array) < len(new_array) or not _same(old_array, new_array[:len(old_array)]):
+        return None
+    return new_array[len(old_array):]
+
+
+def _changed(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    changes = {key: value for key, value in new.items() if key not in old or not _same(old[key], value)}
+    # Attributes that disappeared are reset to their Plotly default
+    changes.update({key: None for key in old if key not in new})
+    return changes
+
+
+def empty_figure(title: str, height: int = 400) -> Dict:
+    """Figure for a chart with nothing to plot: ``title`` over a centered 'No data' note"""
+    hidden = {'visible': False}
+    return {
+        'data': [],
+        'layout': {
+            'title': {'text': title},
+            'annotations': [{'text': 'No data for the selected range', 'showarrow': False,
+                             'xref': 'paper', 'yref': 'paper', 'x': 0.5, 'y': 0.5, 'font': {'size': 16}}],
+            'xaxis': hidden,
+            'yaxis': hidden,
+            'height': height,
+            'margin': {'l': 0, 'r': 0, 't': 40, 'b': 0},
+        },
+    }
+
+
+def diff_figures(old: Optional[Dict], new: Dict) -> Optional[Dict[str, Any]]:
+    """Compute the Plotly calls that turn the ``old`` figure into ``new``.
+
+    Returns ``None`` when a full redraw is required (first render or a change
+    in the number or type of traces). Otherwise returns a dict with
+    ``extend`` (trace index -> appended points), ``restyle`` (trace index ->
+    changed attributes) and ``relayout`` (changed layout attributes).
+    """
+    if old is None:
+        return None
+    old_traces, new_traces = old.get('data', []), new.get('data', [])
+    if len(old_traces) != len(new_traces):
+        return None
+    if any(o.get('type') != n.get('type') for o, n in zip(old_traces, new_traces)):
+        return None
+    if old.get('config') != new.get('config'):
+        return None
+
+    extend: Dict[int, Dict[str, Any]] = {}
+    restyle: Dict[int, Dict[str, Any]] = {}
+    for index, (old_trace, new_trace) in enumerate(zip(old_traces, new_traces)):
+        changes = _changed(_flatten(old_trace), _flatten(new_trace))
+        # Pure appends to the data arrays become an extendTraces call
+        appended = {key: points for key in EXTENDABLE_KEYS if key in changes
+                    and (points := _appended(old_trace.get(key), changes[key])) is not None}
+        if appended and len({len(points) for points in appended.values()}) == 1:
+            extend[index] = appended
+            changes = {key: value for key, value in changes.items() if key not in appended}
+        if changes:
+            restyle[index] = changes
+
+    relayout = _changed(_flatten(old.get('layout', {})), _flatten(new.get('layout', {})))
+    return {'extend': extend, 'restyle': restyle, 'relayout': relayout}
+
+
+def _to_json(value: Any) -> str:
+    return json.dumps(value, cls=PlotlyJSONEncoder)
+
+
+def patch_script(element_id: int, patch: Dict[str, Any]) -> str:
+    """Render a diff from ``diff_figures`` as Plotly.js calls on one chart"""
+    target = f'getHtmlElement({element_id})'
+    calls: List[str] = []
+    for index, points in patch['extend'].items():
+        update = {key: [values] for key, values in points.items()}
+        calls.append(f'Plotly.extendTraces({target}, {_to_json(update)}, [{index}]);')
+    for index, changes in patch['restyle'].items():
+        # restyle expects one value per target trace, so each value is wrapped
+        update = {key: [value] for key, value in changes.items()}
+        calls.append(f'Plotly.restyle({target}, {_to_json(update)}, [{index}]);')
+    if patch['relayout']:
+        calls.append(f'Plotly.relayout({target}, {_to_json(patch["relayout"])});')
+    return '\n'.join(calls)
+
+
+class FigureUpdater:
+    """Sends a chart only the parts of its figure that changed since the last update.
+
+    Keeps the last figure pushed to this client's chart and translates the
+    difference into ``Plotly.restyle``/``relayout``/``extendTraces`` calls,
+    falling back to a full ``update_figure`` when the trace structure changes.
+    A spinner is shown next to the chart until its first figure arrives.
+    ``on_width`` is called with the chart's width in pixels when it is first
+    laid out and whenever it is resized.
+    """
+
+    def __init__(self, chart: ui.plotly, on_width: Optional[Callable[[int], Any]] = None):
+        self.chart = chart
+        self.spinner = ui.spinner(size='lg').classes('self-center')
+        if on_width is not None:
+            # Quasar reports the size of the enclosing element on mount and on every resize
+            observer = ui.element('q-resize-observer').props('debounce=250')
+            observer.on('resize', lambda e: on_width(int(e.args['width'])))
+        self.last: Optional[Dict] = None
+        self.full_updates = 0
+        self.patch_updates = 0
+        self.last_bytes = 0
+
+    def update(self, figure: Dict) -> int:
+        """Push ``figure`` to the chart; returns the number of bytes sent"""
+        patch = diff_figures(self.last, figure)
+        self.last = figure
+        if patch is None:
+            if self.spinner.visible:
+                self.spinner.set_visibility(False)
+            self.chart.update_figure(figure)
+            self.full_updates += 1
+            self.last_bytes = len(_to_json(figure))
+            self._record('full')
+            return self.last_bytes
+
+        # Keep the server-side figure current for the next full update, without
+        # calling update() and so resending the whole figure
+        self.chart.figure = figure
+        script = patch_script(self.chart.id, patch)
+        if script:
+            self.chart.client.run_javascript(script)
+        self.patch_updates += 1
+        self.last_bytes = len(script)
+        self._record('patch')
+        return self.last_bytes
+
+    def _record(self, kind: str) -> None:
+        if telemetry.enabled:
+            FIGURE_UPDATE_BYTES.observe(self.last_bytes, kind)
+            telemetry.add_client_bytes(self.chart.client, self.last_bytes)
@@ -1,123 +1,175 @@
-from nicegui import ui, app
+from nicegui import ui
 import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
-from app.data_generator import DataGenerator
+from typing import Dict, Optional
+from app.data_generator import DataSnapshot
+from app.broadcast import broadcast_hub
+from app.downsampling import DEFAULT_POINTS, PRESELECT_RATIO, chart_points, downsample
+from app.figures import FigureUpdater, empty_figure
+from app.refresh import RefreshScheduler
+from app.rollups import RESOLUTION_TITLES
+from app.session import current_session
+from app.timeseries import range_title, to_range
 
-def create():
-    """Create financial impact and performance visualization"""
+def build_financial(data_gen: DataSnapshot, delay_multiplier: float = 1.0,
+                    start_date: Optional[str] = None, end_date: Optional[str] = None,
+                    max_points: int = DEFAULT_POINTS, selected_category: Optional[str] = None,
+                    selected_part: Optional[str] = None) -> Dict:
+    """Compute figures and summary rows for the financial section.
     
-    def update_financial():
-        data_gen = DataGenerator()
-        delay_multiplier = app.storage.user.get('delay_multiplier', 1.0)
-        
-        # Lost Revenue Over Time
-        financial_data = data_gen.get_financial_data(delay_multiplier)
-        df_financial = pd.DataFrame(financial_data)
-        
-        if not df_financial.empty:
-            fig_revenue = go.Figure()
-            fig_revenue.add_trace(go.Scatter(
-                x=df_financial['date'],
-                y=df_financial['revenue_lost'],
-                mode='lines+markers',
-                name='Lost Revenue',
-                line=dict(color='#EF4444'),
-                fill='tonexty'
-            ))
-            
-            fig_revenue.update_layout(
-                title='Lost Revenue Due to Delays Over Time',
-                xaxis_title='Date',
-                yaxis_title='Lost Revenue ($)',
-                height=400,
-                margin=dict(l=0, r=0, t=40, b=0)
-            )
-            
-            revenue_chart.update_figure(fig_revenue)
-            
-            # Cost Breakdown
-            cost_categories = ['Expedited Shipping', 'Idle Labor', 'Penalties']
-            cost_values = [
-                df_financial['cost_expedited_shipping'].sum(),
-                df_financial['cost_idle_labor'].sum(),
-                df_financial['cost_penalties'].sum()
-            ]
-            
-            fig_costs = go.Figure()
-            fig_costs.add_trace(go.Bar(
-                x=cost_categories,
-                y=cost_values,
-                marker_color=['#3B82F6', '#F59E0B', '#EF4444']
-            ))
-            
-            fig_costs.update_layout(
-                title='Cost Breakdown by Category (Monthly)',
-                xaxis_title='Cost Category',
-                yaxis_title='Cost ($)',
-                height=400,
-                margin=dict(l=0, r=0, t=40, b=0)
-            )
-            
-            cost_chart.update_figure(fig_costs)
-        else:
-            cost_values = [0, 0, 0]
-        
-        # Profit Margin by Product Line
-        product_lines = data_gen.get_product_lines()
-        df_products = pd.DataFrame([{
-            'name': p.name,
-            'profit_margin': p.profit_margin * 100,
-            'revenue': p.revenue / 1000000  # Convert to millions
-        } for p in product_lines])
+    Runs in the panel executor and returns a ready-to-send payload.
+    """
+    payload = {}
+    
+    # Lost Revenue over the selected time range
+    start, end = to_range(start_date, end_date)
+    window = range_title(*data_gen.resolve_window(start, end))
+    resolution = RESOLUTION_TITLES[data_gen.financial_resolution(start, end, PRESELECT_RATIO * max_points)]
+    # Range totals and the trend both come from the financial rollup; a delay cause or part
+    # selection keeps the share of the losses its delays caused
+    filters = {'category': selected_category, 'part': selected_part}
+    totals = data_gen.get_financial_totals(delay_multiplier, start, end, filters=filters)
+    
+    if totals['count']:
+        # Long ranges are reduced to what the chart width can show
+        df_financial = pd.DataFrame(data_gen.get_financial_series(
+            delay_multiplier, start, end, max_buckets=PRESELECT_RATIO * max_points, filters=filters))
+        df_revenue = downsample(df_financial.loc[df_financial['count'] > 0], 'date', 'revenue_lost', max_points)
         
-        fig_profit = go.Figure()
-        fig_profit.add_trace(go.Bar(
-            x=df_products['name'],
-            y=df_products['profit_margin'],
-            marker_color='#10B981'
+        fig_revenue = go.Figure()
+        fig_revenue.add_trace(go.Scatter(
+            x=df_revenue['date'],
+            y=df_revenue['revenue_lost'],
+            mode='lines+markers',
+            name='Lost Revenue',
+            line=dict(color='#EF4444'),
+            fill='tonexty'
         ))
         
-        fig_profit.update_layout(
-            title='Profit Margin by Product Line',
-            xaxis_title='Product Line',
-            yaxis_title='Profit Margin (%)',
+        fig_revenue.update_layout(
+            title=f'{resolution} Lost Revenue Due to Delays, {window}',
+            xaxis_title='Date',
+            yaxis_title='Lost Revenue ($)',
             height=400,
             margin=dict(l=0, r=0, t=40, b=0)
         )
         
-        profit_chart.update_figure(fig_profit)
-        
-        # Financial Summary Table
-        total_revenue = sum(p.revenue for p in product_lines)
-        total_lost = df_financial['revenue_lost'].sum() if not df_financial.empty else 0
-        total_costs = sum(cost_values)
+        payload['revenue'] = fig_revenue.to_plotly_json()
         
-        summary_data = [
-            {'metric': 'Total Revenue', 'value': f"${total_revenue/1000000:.1f}M"},
-            {'metric': 'Lost Revenue', 'value': f"${total_lost/1000000:.1f}M"},
-            {'metric': 'Total Delay Costs', 'value': f"${total_costs/1000000:.1f}M"},
-            {'metric': 'Net Impact', 'value': f"${(total_lost + total_costs)/1000000:.1f}M"},
+        # Cost Breakdown
+        cost_categories = ['Expedited Shipping', 'Idle Labor', 'Penalties']
+        cost_values = [
+            totals['cost_expedited_shipping'],
+            totals['cost_idle_labor'],
+            totals['cost_penalties']
         ]
         
-        summary_table.update_rows(summary_data)
+        fig_costs = go.Figure()
+        fig_costs.add_trace(go.Bar(
+            x=cost_categories,
+            y=cost_values,
+            marker_color=['#3B82F6', '#F59E0B', '#EF4444']
+        ))
+        
+        fig_costs.update_layout(
+            title=f'Cost Breakdown by Category, {window}',
+            xaxis_title='Cost Category',
+            yaxis_title='Cost ($)',
+            height=400,
+            margin=dict(l=0, r=0, t=40, b=0)
+        )
+        
+        payload['costs'] = fig_costs.to_plotly_json()
+    else:
+        # Empty figures replace the previous selection's charts rather than leaving them up
+        payload['revenue'] = empty_figure(f'{resolution} Lost Revenue Due to Delays, {window}')
+        payload['costs'] = empty_figure(f'Cost Breakdown by Category, {window}')
+        cost_values = [0, 0, 0]
+    
+    # Profit Margin by Product Line
+    product_lines = data_gen.get_product_lines()
+    df_products = pd.DataFrame([{
+        'name': p.name,
+        'profit_margin': p.profit_margin * 100,
+        'revenue': p.revenue / 1000000  # Convert to millions
+    } for p in product_lines])
+    
+    fig_profit = go.Figure()
+    fig_profit.add_trace(go.Bar(
+        x=df_products['name'],
+        y=df_products['profit_margin'],
+        marker_color='#10B981'
+    ))
+    
+    fig_profit.update_layout(
+        title='Profit Margin by Product Line',
+        xaxis_title='Product Line',
+        yaxis_title='Profit Margin (%)',
+        height=400,
+        margin=dict(l=0, r=0, t=40, b=0)
+    )
+    
+    payload['profit'] = fig_profit.to_plotly_json()
+    
+    # Financial Summary Table
+    total_revenue = sum(p.revenue for p in product_lines)
+    total_lost = totals['revenue_lost']
+    total_costs = sum(cost_values)
+    
+    payload['summary_rows'] = [
+        {'metric': 'Total Revenue', 'value': f"${total_revenue/1000000:.1f}M"},
+        {'metric': 'Lost Revenue', 'value': f"${total_lost/1000000:.1f}M"},
+        {'metric': 'Total Delay Costs', 'value': f"${total_costs/1000000:.1f}M"},
+        {'metric': 'Net Impact', 'value': f"${(total_lost + total_costs)/1000000:.1f}M"},
+    ]
+    return payload
+
+def create(scheduler: RefreshScheduler):
+    """Create financial impact and performance visualization"""
+    session = current_session()
+    
+    max_points = DEFAULT_POINTS
+    
+    async def resize_revenue_chart(width):
+        nonlocal max_points
+        points = chart_points(width)
+        if points != max_points:
+            max_points = points
+            await update_financial()
+    
+    def apply_payload(payload):
+        revenue_chart.update(payload['revenue'])
+        cost_chart.update(payload['costs'])
+        profit_chart.update(payload['profit'])
+        summary_table.update_rows(payload['summary_rows'])
+        summary_table.props(remove='loading')
+    
+    async def update_financial():
+        await view.refresh(
+            delay_multiplier=session.get('delay_multiplier', 1.0),
+            start_date=session.get('start_date'),
+            end_date=session.get('end_date'),
+            max_points=max_points,
+            selected_category=session.get('selected_category'),
+            selected_part=session.get('selected_part')
+        )
     
     with ui.row().classes('w-full gap-4 mb-6'):
         # Left column - Revenue and costs
         with ui.column().classes('flex-1'):
             with ui.card().classes('mb-4'):
                 with ui.card_section():
-                    revenue_chart = ui.plotly({}).classes('w-full')
+                    revenue_chart = FigureUpdater(ui.plotly({}).classes('w-full'), on_width=resize_revenue_chart)
             
             with ui.card():
                 with ui.card_section():
-                    cost_chart = ui.plotly({}).classes('w-full')
+                    cost_chart = FigureUpdater(ui.plotly({}).classes('w-full'))
         
         # Right column - Profit margins and summary
         with ui.column().classes('flex-1'):
             with ui.card().classes('mb-4'):
                 with ui.card_section():
-                    profit_chart = ui.plotly({}).classes('w-full')
+                    profit_chart = FigureUpdater(ui.plotly({}).classes('w-full'))
             
             with ui.card():
                 with ui.card_section():
@@ -129,14 +181,12 @@ def create():
                         ],
                         rows=[],
                         row_key='metric'
-                    ).classes('w-full')
+                    ).classes('w-full').props('loading')
     
-    # Initialize financial
-    update_financial()
+    # Clients with the same multiplier, range and selection share one computed payload
+    view = broadcast_hub.subscribe('financial', build_financial, apply_payload)
+    ui.context.client.on_disconnect(view.close)
     
-    # Add to update chain
-    if 'update_charts' not in app.storage.user:
-        app.storage.user['update_charts'] = update_financial
-    else:
-        existing_update = app.storage.user['update_charts']
-        app.storage.user['update_charts'] = lambda: (existing_update(), update_financial())
\ No newline at end of file
+    # Recompute only when an input this section reads changes
+    scheduler.register('financial', update_financial,
+                       inputs={'delay_multiplier', 'start_date', 'end_date', 'selected_category', 'selected_part'})
\ No newline at end of file
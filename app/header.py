@@ -1,4 +1,5 @@
 from nicegui import ui
+from app.broadcast import broadcast_hub
 
 def create():
     """Create the application header with title and logo placeholder"""
@@ -17,4 +18,9 @@ def create():
                 time_label.set_text(f'Last Updated: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
             
             update_time()
-            ui.timer(30.0, update_time)  # Update every 30 seconds
\ No newline at end of file
+            if broadcast_hub.enabled:
+                # Follow the shared server tick instead of a timer per client
+                remove_listener = broadcast_hub.add_tick_listener(update_time)
+                ui.context.client.on_disconnect(remove_listener)
+            else:
+                ui.timer(30.0, update_time)  # Update every 30 seconds
\ No newline at end of file
@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+import numpy as np
+from app.registry import AssemblyLineRegistry
+from app.timeseries import Columns
+
+if TYPE_CHECKING:
+    from app.kpis import KPIEngine
+
+log = logging.getLogger(__name__)
+
+# Rolling windows kept for every line, in seconds
+WINDOWS = {'1m': 60, '15m': 900, '1h': 3600}
+# Window the table's Output Rate and the efficiency figures are read from
+RATE_WINDOW = '15m'
+# Where line events come from: "simulator", "file:<path>", "unix:<path>", "tcp:<host>:<port>" or "off" (default)
+SOURCE = os.environ.get('APP_INGEST_SOURCE', 'off')
+# Seconds between the simulator's batches of events
+SIMULATOR_INTERVAL = float(os.environ.get('APP_INGEST_SIMULATOR_SECONDS', 2))
+# Seconds between refreshes of the live figures on every open dashboard
+LIVE_REFRESH_SECONDS = float(os.environ.get('APP_LIVE_REFRESH_SECONDS', 5))
+# Seconds between polls of a tailed file that has no new data
+TAIL_INTERVAL = 0.5
+READ_CHUNK = 1 << 16
+
+Events = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class LineWindows:
+    """Rolling per-line output counts over several windows, held in fixed-size NumPy ring buffers.
+
+    Counts go into one-second slots of a ring as long as the longest window,
+    one row per line id. Each window keeps a running sum per line: an event
+    adds to its slot and to the sums of the windows containing it, and moving
+    the clock forward subtracts the slots leaving each window, so the cost
+    per event is O(1) whatever the window lengths and a rate is one division.
+    Events older than the longest window, or from before the windows started,
+    are dropped, and a window has no rate until it has been running for its
+    whole length.
+    """
+
+    def __init__(self, windows: Mapping[str, int] = WINDOWS, lines: int = 0):
+        self.names = list(windows)
+        self.spans = np.array(list(windows.values()), dtype=np.int64)
+        self.size = int(self.spans.max())
+        self.counts = np.zeros((lines, self.size))
+        self.sums = np.zeros((lines, len(self.spans)))
+        self.now: Optional[int] = None  # newest slot, in seconds since the epoch
+        self.started: Optional[int] = None
+        self.events = 0
+
+    @property
+    def live(self) -> bool:
+        return self.started is not None
+
+    @property
+    def uptime(self) -> int:
+        """Seconds covered by the windows, from the slot they started in up to the clock"""
+        if self.now is None or self.started is None:
+            return 0
+        return self.now - self.started + 1
+
+    def _reserve(self, lines: int) -> None:
+        if lines > len(self.counts):
+            # Grow to twice the rows so new line ids reallocate a logarithmic number of times
+            rows = max(lines, 2 * len(self.counts))
+            self.counts = np.vstack([self.counts, np.zeros((rows - len(self.counts), self.size))])
+            self.sums = np.vstack([self.sums, np.zeros((rows - len(self.sums), len(self.spans)))])
+
+    def advance(self, now: float) -> int:
+        """Move the clock to ``now`` (epoch seconds), retiring the slots that leave each window; returns the clock"""
+        slot = int(now)
+        if self.now is None:
+            self.now = self.started = slot
+            return slot
+        steps = slot - self.now
+        if steps <= 0:
+            return self.now
+        if steps >= self.size:
+            self.counts[:] = 0
+            self.sums[:] = 0
+        else:
+            for i, span in enumerate(self.spans.tolist()):
+                # Slots after the old clock hold nothing yet, so only older ones can leave
+                leaving = np.arange(self.now - span + 1, min(slot - span, self.now) + 1) % self.size
+                self.sums[:, i] -= self.counts[:, leaving].sum(axis=1)
+            # The slots leaving the longest window are the ones the new seconds reuse
+            self.counts[:, np.arange(self.now + 1, slot + 1) % self.size] = 0
+        self.now = slot
+        return slot
+
+    def add(self, line_ids: np.ndarray, timestamps: np.ndarray, counts: np.ndarray) -> None:
+        """Count ``counts[i]`` cars from line ``line_ids[i]`` at ``timestamps[i]`` (epoch seconds)"""
+        if not len(line_ids):
+            return
+        line_ids = np.asarray(line_ids, dtype=np.int64)
+        slots = np.asarray(timestamps, dtype=np.float64).astype(np.int64)
+        counts = np.asarray(counts, dtype=np.float64)
+        now = self.advance(slots.max())
+        self._reserve(int(line_ids.max()) + 1)
+        age = now - slots
+        kept = (age < min(self.size, self.uptime)) & (line_ids >= 0)
+        line_ids, slots, counts, age = line_ids[kept], slots[kept], counts[kept], age[kept]
+        np.add.at(self.counts, (line_ids, slots % self.size), counts)
+        np.add.at(self.sums, line_ids, counts[:, None] * (age[:, None] < self.spans[None, :]))
+        self.events += len(line_ids)
+
+    def rates(self, line_ids: np.ndarray, window: str, now: Optional[float] = None) -> Optional[np.ndarray]:
+        """Cars per hour of each line over ``window``; None until the window has been running for its length"""
+        self.advance(time.time() if now is None else now)
+        column = self.names.index(window)
+        seconds = int(self.spans[column])
+        if self.uptime < seconds:
+            return None
+        line_ids = np.asarray(line_ids, dtype=np.int64)
+        known = (line_ids >= 0) & (line_ids < len(self.sums))
+        totals = np.zeros(len(line_ids))
+        totals[known] = self.sums[line_ids[known], column]
+        return totals / seconds * 3600
+
+    def state(self) -> Dict[str, Any]:
+        """Clock and running sums, all another process needs to read the same rates"""
+        return {'now': self.now, 'started': self.started, 'events': self.events, 'sums': self.sums}
+
+    def restore(self, state: Mapping[str, Any]) -> None:
+        """Take over a ``state`` published by the windows that ingest; the sums stay as of that state's clock"""
+        self.sums = np.array(state['sums'], dtype=np.float64)
+        self.counts = np.zeros((len(self.sums), self.size))
+        self.now, self.started, self.events = state['now'], state['started'], state['events']
+
+
+def live_line_columns(lines: AssemblyLineRegistry, windows: Optional['LineWindows'] = None,
+                      now: Optional[float] = None) -> Optional[Columns]:
+    """Live output rates (cars/hour) of every line in registry order, for the windows that have filled.
+
+    Output rate and efficiency are included once the ``RATE_WINDOW`` has
+    filled; None while no window has.
+    """
+    windows = windows or line_windows
+    if not windows.live:
+        return None
+    columns = {}
+    for name in windows.names:
+        rates = windows.rates(lines['id'], name, now)
+        if rates is not None:
+            columns[f'rate_{name}'] = rates
+    if f'rate_{RATE_WINDOW}' in columns:
+        columns['output_rate'] = columns[f'rate_{RATE_WINDOW}']
+        columns['efficiency'] = columns['output_rate'] / lines['target_rate'] * 100
+    return columns or None
+
+
+def report_output(engine: 'KPIEngine', lines: AssemblyLineRegistry, windows: Optional['LineWindows'] = None,
+                  now: Optional[float] = None) -> None:
+    """Send each factory's live output and its lines' target to ``engine`` as output events"""
+    live = live_line_columns(lines, windows, now)
+    if live is None or 'output_rate' not in live:
+        return
+    factories, rows = np.unique(lines['factory_id'], return_inverse=True)
+    outputs = np.bincount(rows, weights=live['output_rate'], minlength=len(factories))
+    targets = np.bincount(rows, weights=lines['target_rate'], minlength=len(factories))
+    for factory_id, output, target in zip(factories.tolist(), outputs.tolist(), targets.tolist()):
+        engine.report_output(factory_id, output, target)
+
+
+async def feed_kpis(engine: 'KPIEngine', lines: Callable[[], Awaitable[AssemblyLineRegistry]],
+                    windows: Optional['LineWindows'] = None, interval: float = LIVE_REFRESH_SECONDS) -> None:
+    """Report the live output to ``engine`` every ``interval`` seconds, once per process for all dashboards"""
+    while True:
+        try:
+            report_output(engine, await lines(), windows)
+        except Exception:
+            log.exception('Failed to report the live line output')
+        await asyncio.sleep(interval)
+
+
+def parse_events(data: bytes) -> Events:
+    """Line ids, timestamps and counts of newline-separated ``<epoch seconds> <line id> <count>`` events"""
+    try:
+        fields = np.array(data.split(), dtype=np.float64).reshape(-1, 3)
+    except ValueError:
+        # Fall back to line by line, skipping malformed events
+        rows = []
+        for line in data.splitlines():
+            try:
+                timestamp, line_id, count = line.split()
+                rows.append((float(timestamp), float(line_id), float(count)))
+            except ValueError:
+                log.warning('Skipping malformed line event %r', line[:80])
+        fields = np.array(rows, dtype=np.float64).reshape(-1, 3)
+    return fields[:, 1].astype(np.int64), fields[:, 0], fields[:, 2]
+
+
+def format_events(line_ids: np.ndarray, timestamps: np.ndarray, counts: np.ndarray) -> bytes:
+    """Encode events in the wire format read by ``parse_events``"""
+    return ''.join(f'{timestamp:.3f} {line_id} {count}\n' for timestamp, line_id, count in
+                   zip(np.asarray(timestamps).tolist(), np.asarray(line_ids).tolist(),
+                       np.asarray(counts).tolist())).encode()
+
+
+async def consume(reader: asyncio.StreamReader, windows: LineWindows) -> None:
+    """Feed every complete event read from ``reader`` into ``windows`` until end of stream"""
+    tail = b''
+    while chunk := await reader.read(READ_CHUNK):
+        data = tail + chunk
+        end = data.rfind(b'\n') + 1
+        tail = data[end:]
+        if end:
+            windows.add(*parse_events(data[:end]))
+    if tail.strip():
+        windows.add(*parse_events(tail))
+
+
+async def tail_file(path: str, reader: asyncio.StreamReader, interval: float = TAIL_INTERVAL) -> None:
+    """Feed data appended to ``path`` after it was opened into ``reader``, like ``tail -f``"""
+    # Every file operation runs in a worker thread, so a slow disk or network mount never blocks the loop
+    file = await asyncio.to_thread(open, path, 'rb')
+    try:
+        await asyncio.to_thread(file.seek, 0, os.SEEK_END)
+        while True:
+            chunk = await asyncio.to_thread(file.read, READ_CHUNK)
+            if chunk:
+                reader.feed_data(chunk)
+            else:
+                await asyncio.sleep(interval)
+    finally:
+        await asyncio.to_thread(file.close)
+
+
+async def simulate(reader: asyncio.StreamReader, lines: Callable[[], Awaitable[AssemblyLineRegistry]],
+                   interval: float = SIMULATOR_INTERVAL, seed: Optional[int] = None) -> None:
+    """Stand-in source: every ``interval`` seconds, Poisson line counts around each line's output rate"""
+    rng = np.random.default_rng(seed)
+    while True:
+        registry = await lines()
+        counts = rng.poisson(registry['output_rate'] * interval / 3600)
+        emitted = counts > 0
+        timestamps = time.time() - rng.uniform(0, interval, int(emitted.sum()))
+        reader.feed_data(format_events(registry['id'][emitted], timestamps, counts[emitted]))
+        await asyncio.sleep(interval)
+
+
+class IngestionService:
+    """Runs the configured event source into the shared line windows"""
+
+    def __init__(self, source: str = SOURCE, windows: Optional[LineWindows] = None):
+        self.source = source
+        self.windows = windows or line_windows
+
+    @property
+    def enabled(self) -> bool:
+        return self.source not in ('', 'off')
+
+    async def run(self, lines: Callable[[], Awaitable[AssemblyLineRegistry]]) -> None:
+        kind, _, target = self.source.partition(':')
+        if kind not in ('simulator', 'file', 'unix', 'tcp'):
+            raise ValueError(f'Unknown ingestion source "{self.source}", '
+                             'expected simulator, file:<path>, unix:<path>, tcp:<host>:<port> or off')
+        # The windows start now; events stamped earlier are not counted
+        self.windows.advance(time.time())
+        if kind in ('unix', 'tcp'):
+            async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+                try:
+                    await consume(reader, self.windows)
+                finally:
+                    writer.close()
+            if kind == 'unix':
+                server = await asyncio.start_unix_server(handle, target)
+            else:
+                host, _, port = target.rpartition(':')
+                server = await asyncio.start_server(handle, host or '127.0.0.1', int(port))
+            async with server:
+                await server.serve_forever()
+            return
+        reader = asyncio.StreamReader()
+        feed = tail_file(target, reader) if kind == 'file' else simulate(reader, lines)
+        await asyncio.gather(feed, consume(reader, self.windows))
+
+
+line_windows = LineWindows()
+ingestion = IngestionService()
@@ -1,8 +1,13 @@
-from nicegui import ui, app
-from app.data_generator import DataGenerator
+from nicegui import ui
+from app.data_generator import snapshot_service
+from app.executor import current_snapshot
+from app.ingestion import LIVE_REFRESH_SECONDS, ingestion
+from app.refresh import RefreshScheduler
+from app.session import current_session
 
-def create():
+def create(scheduler: RefreshScheduler):
     """Create KPI overview cards"""
+    session = current_session()
     
     def format_number(value):
         if value >= 1000000:
@@ -21,65 +26,68 @@ def create():
     def format_percentage(value):
         return f"{value*100:.1f}%"
     
-    def update_kpis():
-        data_gen = DataGenerator()
-        delay_multiplier = app.storage.user.get('delay_multiplier', 1.0)
-        kpi_data = data_gen.get_kpi_data(delay_multiplier)
-        
-        # Update KPI values
-        app.storage.user['kpi_data'] = {
-            'total_cars': format_number(kpi_data.total_cars_produced),
-            'total_factories': kpi_data.total_factories,
-            'on_time_delivery': format_percentage(kpi_data.on_time_delivery_rate),
-            'lost_revenue': format_currency(kpi_data.lost_revenue),
-            'production_efficiency': format_percentage(kpi_data.production_efficiency)
-        }
+    async def update_kpis():
+        # Makes sure a stale snapshot is replaced, which applies it to the engine
+        await current_snapshot()
+        delay_multiplier = session.get('delay_multiplier', 1.0)
+        # The engine keeps the running totals, including the live output of the lines
+        kpi_data = snapshot_service.kpis.read(delay_multiplier)
         
         # Update UI elements
-        total_cars_label.set_text(app.storage.user['kpi_data']['total_cars'])
-        total_factories_label.set_text(str(app.storage.user['kpi_data']['total_factories']))
-        on_time_delivery_label.set_text(app.storage.user['kpi_data']['on_time_delivery'])
-        lost_revenue_label.set_text(app.storage.user['kpi_data']['lost_revenue'])
-        production_efficiency_label.set_text(app.storage.user['kpi_data']['production_efficiency'])
+        total_cars_label.set_text(format_number(kpi_data.total_cars_produced))
+        total_factories_label.set_text(str(kpi_data.total_factories))
+        factory_statuses_label.set_text(' · '.join(f'{count} {status}' for status, count in
+                                                   sorted(kpi_data.factory_statuses.items())))
+        on_time_delivery_label.set_text(format_percentage(kpi_data.on_time_delivery_rate))
+        lost_revenue_label.set_text(format_currency(kpi_data.lost_revenue))
+        production_efficiency_label.set_text(format_percentage(kpi_data.production_efficiency))
+        live_output_label.set_text('' if kpi_data.live_output is None else
+                                   f'Live: {format_number(kpi_data.live_output)} cars/hour')
+        
+        # Clear the loading state of every card
+        for label in (total_cars_label, total_factories_label, on_time_delivery_label,
+                      lost_revenue_label, production_efficiency_label):
+            label.classes(remove='animate-pulse')
     
     with ui.row().classes('w-full gap-4 mb-6'):
         # Total Cars Produced
         with ui.card().classes('flex-1 bg-green-50'):
             with ui.card_section():
                 ui.label('Total Cars Produced').classes('text-sm text-gray-600 mb-2')
-                total_cars_label = ui.label('0').classes('text-3xl font-bold text-green-600')
+                total_cars_label = ui.label('…').classes('text-3xl font-bold text-green-600 animate-pulse')
                 ui.label('Monthly Production').classes('text-xs text-gray-500')
+                live_output_label = ui.label('').classes('text-xs text-green-700')
         
         # Total Factories
         with ui.card().classes('flex-1 bg-blue-50'):
             with ui.card_section():
                 ui.label('Total Factories').classes('text-sm text-gray-600 mb-2')
-                total_factories_label = ui.label('0').classes('text-3xl font-bold text-blue-600')
+                total_factories_label = ui.label('…').classes('text-3xl font-bold text-blue-600 animate-pulse')
                 ui.label('Global Operations').classes('text-xs text-gray-500')
+                factory_statuses_label = ui.label('').classes('text-xs text-blue-700')
         
         # On-Time Deliveries
         with ui.card().classes('flex-1 bg-yellow-50'):
             with ui.card_section():
                 ui.label('On-Time Deliveries').classes('text-sm text-gray-600 mb-2')
-                on_time_delivery_label = ui.label('0%').classes('text-3xl font-bold text-yellow-600')
+                on_time_delivery_label = ui.label('…').classes('text-3xl font-bold text-yellow-600 animate-pulse')
                 ui.label('Delivery Performance').classes('text-xs text-gray-500')
         
         # Lost Revenue
         with ui.card().classes('flex-1 bg-red-50'):
             with ui.card_section():
                 ui.label('Lost Revenue (Delays)').classes('text-sm text-gray-600 mb-2')
-                lost_revenue_label = ui.label('$0').classes('text-3xl font-bold text-red-600')
+                lost_revenue_label = ui.label('…').classes('text-3xl font-bold text-red-600 animate-pulse')
                 ui.label('Due to Delays').classes('text-xs text-gray-500')
         
         # Production Efficiency
         with ui.card().classes('flex-1 bg-purple-50'):
             with ui.card_section():
                 ui.label('Production Efficiency').classes('text-sm text-gray-600 mb-2')
-                production_efficiency_label = ui.label('0%').classes('text-3xl font-bold text-purple-600')
+                production_efficiency_label = ui.label('…').classes('text-3xl font-bold text-purple-600 animate-pulse')
                 ui.label('Overall Performance').classes('text-xs text-gray-500')
     
-    # Initialize KPIs
-    update_kpis()
-    
-    # Store update function for use by controls
-    app.storage.user['update_kpis'] = update_kpis
\ No newline at end of file
+    # Recompute KPIs only when an input they read changes, and as line output streams in
+    scheduler.register('kpis', update_kpis, inputs={'delay_multiplier'})
+    if ingestion.enabled:
+        ui.timer(LIVE_REFRESH_SECONDS, update_kpis)
\ No newline at end of file
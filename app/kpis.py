@@ -0,0 +1,209 @@
+import threading
+from collections import Counter
+from typing import Dict, Optional, Tuple
+import numpy as np
+from app.models import KPIData
+from app.registry import FactoryRegistry
+from app.timeseries import Columns
+
+# Days of production the "Total Cars Produced" card reports
+PRODUCTION_DAYS = 30
+# On-time delivery rate at the baseline delay level, its floor, and the drop per unit of extra delay pressure
+ON_TIME_BASELINE = 0.95
+ON_TIME_FLOOR = 0.7
+ON_TIME_SLOPE = 0.2
+# Monthly revenue lost to delays at the baseline delay level
+LOST_REVENUE_BASELINE = 15000000
+
+# Figures one factory contributes: daily production, efficiency, efficiency weight and status
+FactoryFigures = Tuple[float, float, float, str]
+# Live output of one factory's lines: cars per hour and their target cars per hour
+FactoryOutput = Tuple[float, float]
+
+
+class RunningMean:
+    """Weighted mean kept as a running sum of weighted values and of weights"""
+
+    def __init__(self):
+        self.total = 0.0
+        self.weight = 0.0
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        self.total += value * weight
+        self.weight += weight
+
+    def remove(self, value: float, weight: float = 1.0) -> None:
+        self.total -= value * weight
+        self.weight -= weight
+
+    @property
+    def value(self) -> float:
+        return self.total / self.weight if self.weight > 0 else 0.0
+
+
+class KPIEngine:
+    """Running aggregates behind the KPI cards, updated in O(1) per event.
+
+    Each factory's last reported figures are kept so that a correction
+    retracts the old contribution before applying the new one, and a
+    retraction removes it; delay events carry their own values, so
+    retracting or correcting one subtracts what was added. Delay pressure is
+    the what-if multiplier times the delay hours (or impact) relative to the
+    baseline the engine was built with, so the cards read the same as the
+    plain multiplier model until delays change. Output events carry the live
+    line output of a factory; once any has arrived, efficiency is the live
+    output against the lines' targets. Reading ``KPIData`` is a handful of
+    arithmetic operations, independent of the number of factories.
+
+    One engine lives as long as the process: each new dataset is applied by
+    ``sync`` as events for what changed. Every event and ``read`` hold the
+    engine's lock, as datasets arrive on worker threads; it is reentrant so
+    ``sync`` can apply its events under it.
+    """
+
+    def __init__(self):
+        self.factories: Dict[int, FactoryFigures] = {}
+        self.outputs: Dict[int, FactoryOutput] = {}
+        self.production = 0.0  # cars per day over all factories
+        self.efficiency = RunningMean()
+        self.output = RunningMean()  # live efficiency weighted by target; its total is cars per hour
+        self.statuses: Counter = Counter()
+        self.delays = 0
+        self.delay_hours = 0.0
+        self.delay_impact = 0.0
+        self.baseline_hours: Optional[float] = None
+        self.baseline_impact: Optional[float] = None
+        self.version: Optional[int] = None  # of the dataset last synced
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_data(cls, factories: FactoryRegistry, delays: Columns) -> 'KPIEngine':
+        """Engine over the registry's factories and a window of delay records, taken as the baseline"""
+        engine = cls()
+        engine.sync(factories, delays)
+        return engine
+
+    def sync(self, factories: FactoryRegistry, delays: Columns, version: Optional[int] = None) -> None:
+        """Apply a new dataset as events for what changed, taking its window of delays as the baseline.
+
+        Factories with new figures are corrected, factories that only changed
+        status get a status event, and factories the dataset no longer has
+        are retracted. Live output reports are kept.
+        """
+        with self._lock:
+            columns = (factories[field].tolist() for field in ('id', 'current_production', 'efficiency', 'status'))
+            seen = set()
+            for factory_id, production, efficiency, status in zip(*columns):
+                seen.add(factory_id)
+                previous = self.factories.get(factory_id)
+                if previous is None or previous[:2] != (float(production), float(efficiency)):
+                    self.report_factory(factory_id, production, efficiency, status)
+                elif previous[3] != status:
+                    self.set_status(factory_id, status)
+            for factory_id in self.factories.keys() - seen:
+                self.retract_factory(factory_id)
+            self.delays = len(delays['duration_hours']) if delays else 0
+            self.delay_hours = float(np.sum(delays['duration_hours'])) if delays else 0.0
+            self.delay_impact = float(np.sum(delays['financial_impact'])) if delays else 0.0
+            self.set_baseline()
+            self.version = version
+
+    def set_baseline(self) -> None:
+        """Take the current delay totals as the level the multiplier model is calibrated to"""
+        with self._lock:
+            self.baseline_hours = self.delay_hours
+            self.baseline_impact = self.delay_impact
+
+    def _apply(self, figures: FactoryFigures, sign: int) -> None:
+        production, efficiency, weight, status = figures
+        self.production += sign * production
+        if sign > 0:
+            self.efficiency.add(efficiency, weight)
+        else:
+            self.efficiency.remove(efficiency, weight)
+        self.statuses[status] += sign
+
+    def report_factory(self, factory_id: int, production: float, efficiency: float,
+                       status: Optional[str] = None, weight: float = 1.0) -> None:
+        """Production event: the factory's daily production and efficiency, replacing any earlier report"""
+        with self._lock:
+            previous = self.factories.get(factory_id)
+            if previous is not None:
+                self._apply(previous, -1)
+                status = status or previous[3]
+            figures = (float(production), float(efficiency), float(weight), status or 'running')
+            self.factories[factory_id] = figures
+            self._apply(figures, 1)
+
+    def set_status(self, factory_id: int, status: str) -> None:
+        """Status event: move a known factory to ``status``"""
+        with self._lock:
+            production, efficiency, weight, previous = self.factories[factory_id]
+            self.statuses[previous] -= 1
+            self.statuses[status] += 1
+            self.factories[factory_id] = (production, efficiency, weight, status)
+
+    def retract_factory(self, factory_id: int) -> None:
+        """Remove everything a factory contributes, e.g. after a report sent in error"""
+        with self._lock:
+            figures = self.factories.pop(factory_id, None)
+            if figures is not None:
+                self._apply(figures, -1)
+            self._retract_output(factory_id)
+
+    def _retract_output(self, factory_id: int) -> None:
+        previous = self.outputs.pop(factory_id, None)
+        if previous is not None:
+            output, target = previous
+            self.output.remove(output / target, target)
+
+    def report_output(self, factory_id: int, output_rate: float, target_rate: float) -> None:
+        """Output event: a factory's live cars per hour against its lines' target, replacing any earlier one"""
+        with self._lock:
+            if self.outputs.get(factory_id) == (output_rate, target_rate):
+                return
+            self._retract_output(factory_id)
+            if target_rate > 0:
+                self.outputs[factory_id] = (float(output_rate), float(target_rate))
+                self.output.add(output_rate / target_rate, target_rate)
+
+    def add_delay(self, duration_hours: float, financial_impact: float) -> None:
+        """Delay event"""
+        with self._lock:
+            self.delays += 1
+            self.delay_hours += duration_hours
+            self.delay_impact += financial_impact
+
+    def retract_delay(self, duration_hours: float, financial_impact: float) -> None:
+        """Undo an earlier ``add_delay`` with the same values"""
+        with self._lock:
+            self.delays -= 1
+            self.delay_hours -= duration_hours
+            self.delay_impact -= financial_impact
+
+    def correct_delay(self, old: Tuple[float, float], new: Tuple[float, float]) -> None:
+        """Replace an earlier delay's (duration_hours, financial_impact) with corrected values"""
+        # One lock hold, so a read never sees the delay retracted but not yet re-added
+        with self._lock:
+            self.retract_delay(*old)
+            self.add_delay(*new)
+
+    @staticmethod
+    def _ratio(value: float, baseline: Optional[float]) -> float:
+        return value / baseline if baseline else 1.0
+
+    def read(self, delay_multiplier: float = 1.0) -> KPIData:
+        """The KPI values at a what-if delay multiplier, with the live output once any has been reported"""
+        with self._lock:
+            pressure = delay_multiplier * self._ratio(self.delay_hours, self.baseline_hours)
+            live = bool(self.outputs)
+            return KPIData(
+                total_cars_produced=round(self.production) * PRODUCTION_DAYS,
+                total_factories=len(self.factories),
+                on_time_delivery_rate=max(ON_TIME_FLOOR, ON_TIME_BASELINE - (pressure - 1.0) * ON_TIME_SLOPE),
+                lost_revenue=LOST_REVENUE_BASELINE * delay_multiplier * self._ratio(self.delay_impact,
+                                                                                   self.baseline_impact),
+                production_efficiency=self.output.value if live else self.efficiency.value,
+                live_output=self.output.total if live else None,
+                factory_statuses={status: count for status, count in self.statuses.items() if count > 0}
+            )
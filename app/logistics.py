@@ -1,139 +1,265 @@
-from nicegui import ui, app
+import asyncio
+from nicegui import ui
 import plotly.graph_objects as go
-import plotly.express as px
+import numpy as np
 import pandas as pd
-from app.data_generator import DataGenerator
+from typing import Dict, Optional
+from app.data_generator import DataSnapshot
+from app.broadcast import broadcast_hub
+from app.clustering import Viewport
+from app.controls import toggle_selection
+from app.downsampling import DEFAULT_POINTS, PRESELECT_RATIO, chart_points, downsample
+from app.figures import FigureUpdater, empty_figure
+from app.refresh import RefreshScheduler
+from app.session import current_session
+from app.rollups import RESOLUTION_TITLES
+from app.timeseries import range_title, to_range
 
-def create():
-    """Create logistics and supply chain visualization"""
+# Marker color of each factory status; clusters take the color of their most common status
+STATUS_COLORS = {'running': '#10B981', 'delayed': '#F59E0B', 'maintenance': '#EF4444'}
+# Bars of the cross-filter selection stand out; the others are dimmed while a selection is active
+SELECTED_COLOR = '#DC2626'
+UNSELECTED_COLOR = '#FCD34D'
+MAP_CENTER = {'lat': 30, 'lon': 0}
+MAP_ZOOM = 1
+MAP_HEIGHT = 500
+# Width assumed for a map that reports its center and zoom but not its bounds
+MAP_WIDTH = 800
+# Until a client reports its bounds, its map shows every site
+DEFAULT_VIEWPORT = Viewport.from_bounds(-180, -90, 180, 90, MAP_ZOOM)
+
+def map_viewport(camera: Dict, relayout: Dict) -> Optional[Viewport]:
+    """Apply a ``plotly_relayout`` event to ``camera`` and return the viewport it shows.
     
-    def update_logistics():
-        data_gen = DataGenerator()
-        selected_factory = app.storage.user.get('selected_factory')
-        
-        # Factory locations map
-        factories = data_gen.factories
+    Returns ``None`` for relayouts that do not move the map.
+    """
+    if 'mapbox.center' not in relayout and 'mapbox.zoom' not in relayout:
+        return None
+    center = relayout.get('mapbox.center') or {}
+    camera.update({key: center[key] for key in ('lat', 'lon') if key in center})
+    camera['zoom'] = relayout.get('mapbox.zoom', camera['zoom'])
+    corners = (relayout.get('mapbox._derived') or {}).get('coordinates')
+    if corners:
+        lons, lats = [corner[0] for corner in corners], [corner[1] for corner in corners]
+        return Viewport.from_bounds(min(lons), min(lats), max(lons), max(lats), camera['zoom'])
+    return Viewport.around(camera['lat'], camera['lon'], camera['zoom'], MAP_WIDTH, MAP_HEIGHT)
+
+def build_factory_map(data_gen: DataSnapshot, selected_factory: Optional[int] = None,
+                      viewport: Viewport = DEFAULT_VIEWPORT, start_date: Optional[str] = None,
+                      end_date: Optional[str] = None, selected_part: Optional[str] = None,
+                      selected_category: Optional[str] = None) -> Dict:
+    """Compute the factory locations map for one viewport.
+    
+    Sites are clustered on the grid level matching the zoom, so the figure
+    holds at most one marker per grid cell in view however many sites exist.
+    A part or delay cause selection shows only the sites it reaches.
+    """
+    factories = data_gen.factory_registry
+    index = factories.clusters
+    start, end = to_range(start_date, end_date)
+    reached = data_gen.get_factory_selection(
+        {'factory': selected_factory or None, 'part': selected_part, 'category': selected_category}, start, end)
+    if reached is None:
+        clusters = index.query(viewport)
+    else:
+        rows = np.sort(factories.row_of(reached))
+        rows = rows[rows >= 0]
         if selected_factory:
-            factories = [f for f in factories if f.id == selected_factory]
-        
-        # Create map with factory locations
-        fig_map = go.Figure()
-        
-        # Add factory markers
-        factory_names = [f.name for f in factories]
-        factory_lats = [f.latitude for f in factories]
-        factory_lons = [f.longitude for f in factories]
-        factory_status = [f.status.value for f in factories]
-        
-        # Color code by status
-        colors = []
-        for status in factory_status:
-            if status == 'running':
-                colors.append('#10B981')  # Green
-            elif status == 'delayed':
-                colors.append('#F59E0B')  # Yellow
-            else:
-                colors.append('#EF4444')  # Red
-        
-        fig_map.add_trace(go.Scattermapbox(
-            lat=factory_lats,
-            lon=factory_lons,
-            mode='markers',
-            marker=dict(
-                size=12,
-                color=colors
-            ),
-            text=factory_names,
-            hovertemplate='<b>%{text}</b><br>Status: %{customdata}<extra></extra>',
-            customdata=factory_status,
-            name='Factories'
-        ))
-        
-        fig_map.update_layout(
-            title='Global Factory Locations',
-            mapbox=dict(
-                style="open-street-map",
-                center=dict(lat=30, lon=0),
-                zoom=1
-            ),
-            height=500,
-            margin=dict(l=0, r=0, t=40, b=0)
-        )
-        
-        factory_map.update_figure(fig_map)
-        
-        # Parts Delay Analysis
-        delay_data = data_gen.get_delay_data(30)
-        df_delays = pd.DataFrame(delay_data)
-        
-        if not df_delays.empty:
-            # Group by date and sum financial impact
-            daily_delays = df_delays.groupby('date')['financial_impact'].sum().reset_index()
-            
-            fig_delay_trend = go.Figure()
-            fig_delay_trend.add_trace(go.Scatter(
-                x=daily_delays['date'],
-                y=daily_delays['financial_impact'],
-                mode='lines+markers',
-                name='Daily Impact',
-                line=dict(color='#EF4444')
-            ))
-            
-            fig_delay_trend.update_layout(
-                title='Daily Delay Impact Over Time',
-                xaxis_title='Date',
-                yaxis_title='Financial Impact ($)',
-                height=400,
-                margin=dict(l=0, r=0, t=40, b=0)
-            )
-            
-            delay_trend_chart.update_figure(fig_delay_trend)
-        
-        # Bottleneck Analysis
-        bottleneck_data = data_gen.get_bottleneck_data()
-        df_bottlenecks = pd.DataFrame(bottleneck_data)
+            clusters = index.points(rows)
+        else:
+            clusters = factories.clusters_of(rows).query(viewport)
+            clusters['row'] = rows[clusters['row']]
+    
+    count = clusters['count']
+    status_counts = clusters['categories']
+    labels = np.where(count == 1, factories['name'][clusters['row']],
+                      np.char.add(count.astype(str), ' sites'))
+    colors = np.array([STATUS_COLORS[label] for label in index.labels])[status_counts.argmax(axis=1)]
+    hover = '<br>'.join(f'{label.title()}: %{{customdata[{i}]}}' for i, label in enumerate(index.labels))
+    
+    fig_map = go.Figure()
+    fig_map.add_trace(go.Scattermapbox(
+        lat=clusters['latitude'],
+        lon=clusters['longitude'],
+        mode='markers',
+        marker=dict(
+            size=np.minimum(12 + 4 * np.log2(count), 40),
+            color=colors.tolist()
+        ),
+        text=labels.tolist(),
+        hovertemplate=f'<b>%{{text}}</b><br>{hover}<extra></extra>',
+        customdata=status_counts.tolist(),
+        name='Factories'
+    ))
+    
+    fig_map.update_layout(
+        title='Global Factory Locations',
+        mapbox=dict(
+            style="open-street-map",
+            center=MAP_CENTER,
+            zoom=MAP_ZOOM
+        ),
+        # Keep the user's pan and zoom when new clusters arrive
+        uirevision='factory-map',
+        height=MAP_HEIGHT,
+        margin=dict(l=0, r=0, t=40, b=0)
+    )
+    
+    return {'map': fig_map.to_plotly_json()}
+
+def build_logistics(data_gen: DataSnapshot, selected_factory: Optional[int] = None,
+                    start_date: Optional[str] = None, end_date: Optional[str] = None,
+                    max_points: int = DEFAULT_POINTS, selected_category: Optional[str] = None,
+                    selected_part: Optional[str] = None) -> Dict:
+    """Compute figures for the logistics section.
+    
+    Runs in the panel executor and returns a ready-to-send payload.
+    """
+    payload = {}
+    
+    # Parts Delay Analysis over the selected time range
+    start, end = to_range(start_date, end_date)
+    # Impact per day (or coarser bucket on long ranges) of the delays matching the selected factory, cause and part
+    daily_delays = pd.DataFrame(data_gen.get_delay_series(
+        30, start, end, max_buckets=PRESELECT_RATIO * max_points,
+        filters={'factory': selected_factory or None, 'category': selected_category, 'part': selected_part}))
+    daily_delays = daily_delays.loc[daily_delays['count'] > 0]
+    resolution = RESOLUTION_TITLES[data_gen.delay_resolution(30, start, end, PRESELECT_RATIO * max_points)]
+    title = f'{resolution} Delay Impact, {range_title(*data_gen.delay_window(30, start, end))}'
+    
+    if not daily_delays.empty:
+        # Min/max buckets keep every large delay event visible on long ranges
+        daily_delays = downsample(daily_delays, 'date', 'financial_impact', max_points, method='minmax')
         
-        fig_bottlenecks = go.Figure()
-        fig_bottlenecks.add_trace(go.Bar(
-            x=df_bottlenecks['incidents'],
-            y=df_bottlenecks['category'],
-            orientation='h',
-            marker_color='#F59E0B'
+        fig_delay_trend = go.Figure()
+        fig_delay_trend.add_trace(go.Scatter(
+            x=daily_delays['date'],
+            y=daily_delays['financial_impact'],
+            mode='lines+markers',
+            name=f'{resolution} Impact',
+            line=dict(color='#EF4444')
         ))
         
-        fig_bottlenecks.update_layout(
-            title='Most Common Delay Causes',
-            xaxis_title='Number of Incidents',
-            yaxis_title='Category',
+        fig_delay_trend.update_layout(
+            title=title,
+            xaxis_title='Date',
+            yaxis_title='Financial Impact ($)',
             height=400,
             margin=dict(l=0, r=0, t=40, b=0)
         )
         
-        bottleneck_chart.update_figure(fig_bottlenecks)
+        payload['delay_trend'] = fig_delay_trend.to_plotly_json()
+    else:
+        # An empty figure replaces the previous selection's trend rather than leaving it up
+        payload['delay_trend'] = empty_figure(title)
+    
+    # Bottleneck Analysis: delays per cause at the selected factories; the
+    # selected cause is highlighted rather than filtered out
+    causes = data_gen.get_delay_causes({'factory': selected_factory or None, 'part': selected_part}, 30, start, end)
+    colors = np.where(causes['category'] == selected_category, SELECTED_COLOR,
+                      '#F59E0B' if selected_category is None else UNSELECTED_COLOR)
+    
+    fig_bottlenecks = go.Figure()
+    fig_bottlenecks.add_trace(go.Bar(
+        x=causes['count'].tolist(),
+        y=[category.replace('_', ' ').title() for category in causes['category'].tolist()],
+        orientation='h',
+        customdata=causes['category'].tolist(),
+        marker_color=colors.tolist()
+    ))
+    
+    fig_bottlenecks.update_layout(
+        title='Most Common Delay Causes',
+        xaxis_title='Number of Incidents',
+        yaxis_title='Category',
+        height=400,
+        margin=dict(l=0, r=0, t=40, b=0)
+    )
+    
+    payload['bottlenecks'] = fig_bottlenecks.to_plotly_json()
+    return payload
+
+def create(scheduler: RefreshScheduler):
+    """Create logistics and supply chain visualization"""
+    session = current_session()
+    
+    viewport = DEFAULT_VIEWPORT
+    max_points = DEFAULT_POINTS
+    camera = {**MAP_CENTER, 'zoom': MAP_ZOOM}
+    
+    def apply_payload(payload):
+        delay_trend_chart.update(payload['delay_trend'])
+        bottleneck_chart.update(payload['bottlenecks'])
+    
+    async def update_map():
+        await map_view.refresh(
+            selected_factory=session.get('selected_factory'),
+            viewport=viewport,
+            start_date=session.get('start_date'),
+            end_date=session.get('end_date'),
+            selected_part=session.get('selected_part'),
+            selected_category=session.get('selected_category')
+        )
+    
+    async def update_charts():
+        await view.refresh(
+            selected_factory=session.get('selected_factory'),
+            start_date=session.get('start_date'),
+            end_date=session.get('end_date'),
+            max_points=max_points,
+            selected_category=session.get('selected_category'),
+            selected_part=session.get('selected_part')
+        )
+    
+    async def update_logistics():
+        await asyncio.gather(update_charts(), update_map())
+    
+    async def resize_delay_chart(width):
+        nonlocal max_points
+        points = chart_points(width)
+        if points != max_points:
+            max_points = points
+            await update_charts()
+    
+    async def select_category(e):
+        # Clicking a cause filters every panel to it; clicking it again clears the filter
+        await toggle_selection(scheduler, 'selected_category', e.args['points'][0]['customdata'])
+    
+    async def change_viewport(e):
+        # Only a pan or zoom that brings other grid cells into view needs new clusters
+        nonlocal viewport
+        moved = map_viewport(camera, e.args)
+        if moved is not None and moved != viewport:
+            viewport = moved
+            await update_map()
     
     with ui.row().classes('w-full gap-4 mb-6'):
         # Left column - Map
         with ui.column().classes('flex-1'):
             with ui.card():
                 with ui.card_section():
-                    factory_map = ui.plotly({}).classes('w-full')
+                    factory_map = FigureUpdater(ui.plotly({}).classes('w-full'))
+                    factory_map.chart.on('plotly_relayout', change_viewport)
         
         # Right column - Delay analysis
         with ui.column().classes('flex-1'):
             with ui.card().classes('mb-4'):
                 with ui.card_section():
-                    delay_trend_chart = ui.plotly({}).classes('w-full')
+                    delay_trend_chart = FigureUpdater(ui.plotly({}).classes('w-full'), on_width=resize_delay_chart)
             
             with ui.card():
                 with ui.card_section():
-                    bottleneck_chart = ui.plotly({}).classes('w-full')
+                    bottleneck_chart = FigureUpdater(ui.plotly({}).classes('w-full'))
+                    bottleneck_chart.chart.on('plotly_click', select_category)
     
-    # Initialize logistics
-    update_logistics()
+    # Clients viewing the same factory and range share one computed payload
+    view = broadcast_hub.subscribe('logistics', build_logistics, apply_payload)
+    ui.context.client.on_disconnect(view.close)
+    # Clients looking at the same grid cells share one set of clusters
+    map_view = broadcast_hub.subscribe('logistics_map', build_factory_map,
+                                       lambda payload: factory_map.update(payload['map']))
+    ui.context.client.on_disconnect(map_view.close)
     
-    # Add to update chain
-    if 'update_charts' not in app.storage.user:
-        app.storage.user['update_charts'] = update_logistics
-    else:
-        existing_update = app.storage.user['update_charts']
-        app.storage.user['update_charts'] = lambda: (existing_update(), update_logistics())
\ No newline at end of file
+    # Recompute only when an input this section reads changes
+    scheduler.register('logistics', update_logistics,
+                       inputs={'selected_factory', 'selected_category', 'selected_part', 'start_date', 'end_date'})
\ No newline at end of file
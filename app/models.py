@@ -78,4 +78,6 @@ class KPIData(BaseModel):
     total_factories: int
     on_time_delivery_rate: float
     lost_revenue: float
-    production_efficiency: float
\ No newline at end of file
+    production_efficiency: float
+    live_output: Optional[float] = None
+    factory_statuses: Dict[str, int] = {}
\ No newline at end of file
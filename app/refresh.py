@@ -0,0 +1,143 @@
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional
+from app.telemetry import PANEL_UPDATE_SECONDS, telemetry
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class PanelTiming:
+    calls: int = 0
+    last: float = 0.0  # seconds
+    total: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+
+@dataclass
+class Panel:
+    name: str
+    update: Callable[[], Any]  # plain function or coroutine function
+    inputs: FrozenSet[str] = field(default_factory=frozenset)
+
+
+class RefreshScheduler:
+    """Per-page refresh graph mapping dashboard inputs to the panels that read them.
+
+    Each panel declares the inputs it depends on (e.g. ``delay_multiplier``,
+    ``selected_factory``, ``start_date``/``end_date``); notifying a change
+    recomputes only the dependent panels and records how long each one took.
+    """
+
+    def __init__(self):
+        self._panels: Dict[str, Panel] = {}
+        self.timings: Dict[str, PanelTiming] = {}
+        self.last_run: Dict[str, float] = {}
+
+    def register(self, name: str, update: Callable[[], Any], inputs: Iterable[str] = ()) -> None:
+        self._panels[name] = Panel(name, update, frozenset(inputs))
+        self.timings.setdefault(name, PanelTiming())
+
+    @property
+    def panel_names(self) -> List[str]:
+        return list(self._panels)
+
+    def dependents(self, *inputs: str) -> List[str]:
+        changed = set(inputs)
+        return [name for name, panel in self._panels.items() if panel.inputs & changed]
+
+    async def notify(self, *inputs: str) -> Dict[str, float]:
+        """Recompute the panels that read any of the changed inputs"""
+        return await self._run(self.dependents(*inputs))
+
+    async def refresh_all(self) -> Dict[str, float]:
+        return await self._run(list(self._panels))
+
+    async def refresh(self, *names: str) -> Dict[str, float]:
+        """Recompute the named panels regardless of their inputs"""
+        return await self._run([name for name in names if name in self._panels])
+
+    async def _run(self, names: List[str]) -> Dict[str, float]:
+        # Panels are independent, so they refresh concurrently
+        elapsed = await asyncio.gather(*(self._run_panel(name) for name in names))
+        self.last_run = dict(zip(names, elapsed))
+        return self.last_run
+
+    async def _run_panel(self, name: str) -> float:
+        start = time.perf_counter()
+        result = self._panels[name].update()
+        if inspect.isawaitable(result):
+            await result
+        elapsed = time.perf_counter() - start
+        timing = self.timings[name]
+        timing.calls += 1
+        timing.last = elapsed
+        timing.total += elapsed
+        if telemetry.enabled:
+            PANEL_UPDATE_SECONDS.observe(elapsed, name)
+        return elapsed
+
+    def describe_last_run(self) -> str:
+        if not self.last_run:
+            return 'No panels refreshed'
+        return ', '.join(f'{name} {seconds * 1000:.1f} ms' for name, seconds in self.last_run.items())
+
+
+class CoalescingUpdateQueue:
+    """Debounced, latest-value-wins queue in front of an expensive update.
+
+    ``submit`` only records the newest value and restarts the debounce
+    window; the handler runs once the window passes without new values.
+    At most one handler call is in flight, and values submitted meanwhile
+    replace the single pending value instead of queuing behind it.
+    """
+
+    def __init__(self, handler: Callable[[Any], Any], debounce: float = 0.25):
+        self.handler = handler
+        self.debounce = debounce
+        self.submitted = 0
+        self.applied = 0
+        self._pending: Any = None
+        self._has_pending = False
+        self._deadline = 0.0
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def busy(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def submit(self, value: Any) -> None:
+        loop = asyncio.get_running_loop()
+        self.submitted += 1
+        self._pending = value
+        self._has_pending = True
+        self._deadline = loop.time() + self.debounce
+        if not self.busy:
+            self._worker = loop.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._has_pending:
+            # Wait until the window passes without a newer submission
+            while (remaining := self._deadline - loop.time()) > 0:
+                await asyncio.sleep(remaining)
+            value = self._pending
+            self._has_pending = False
+            try:
+                result = self.handler(value)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                log.exception('Coalesced update failed')
+            self.applied += 1
+
+    async def flush(self) -> None:
+        """Wait until every submitted value has been applied"""
+        while (worker := self._worker) is not None and not worker.done():
+            await asyncio.shield(worker)
@@ -0,0 +1,197 @@
+import functools
+import numpy as np
+from typing import Dict, Generic, Hashable, List, Mapping, Optional, Self, Sequence, Tuple, Type, TypeVar
+from numpy.typing import ArrayLike
+from pydantic import BaseModel
+from app.clustering import ClusterIndex
+from app.models import AssemblyLine, Factory, FactoryStatus
+from app.timeseries import Columns
+
+EMPTY_ROWS = np.empty(0, dtype=np.int64)
+
+ModelT = TypeVar('ModelT', bound=BaseModel)
+
+
+def region_of(longitude: np.ndarray) -> np.ndarray:
+    """Coarse sales region of each longitude: Americas, EMEA or APAC"""
+    return np.select([longitude < -30, longitude < 60], ['Americas', 'EMEA'], 'APAC')
+
+
+def _group(values: np.ndarray) -> Dict[Hashable, np.ndarray]:
+    """Row numbers per distinct value, each in row order"""
+    order = np.argsort(values, kind='stable')
+    keys, starts = np.unique(values[order], return_index=True)
+    return {key: rows for key, rows in zip(keys.tolist(), np.split(order, starts[1:]))}
+
+
+class ColumnRegistry(Generic[ModelT]):
+    """Model attributes stored as one typed NumPy column per field.
+
+    Rows are addressed by position; ``row_of`` maps ids to rows through a
+    dense lookup array, so single and vectorized id lookups are O(1) per id.
+    Pydantic models are only built by ``models()`` for callers that need them.
+    """
+
+    model: Type[ModelT]
+    dtypes: Dict[str, type]
+
+    def __init__(self, columns: Mapping[str, ArrayLike]):
+        self.columns: Columns = {}
+        for field, dtype in self.dtypes.items():
+            values = np.asarray(columns[field], dtype=dtype)
+            values.flags.writeable = False
+            self.columns[field] = values
+        ids = self.columns['id']
+        self._row_of_id = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int64)
+        self._row_of_id[ids] = np.arange(len(ids))
+        self._models: Optional[List[ModelT]] = None
+
+    @classmethod
+    def from_models(cls, models: Sequence[ModelT], *args, **kwargs) -> Self:
+        columns = {field: [getattr(model, field) for model in models] for field in cls.dtypes}
+        if 'status' in columns:
+            columns['status'] = [status.value for status in columns['status']]
+        return cls(columns, *args, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.columns['id'])
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    def row_of(self, ids) -> np.ndarray:
+        """Row of every id in ``ids`` (-1 for unknown ids); scalars give a scalar"""
+        ids = np.asarray(ids, dtype=np.int64)
+        known = (ids >= 0) & (ids < len(self._row_of_id))
+        return np.where(known, self._row_of_id[np.where(known, ids, 0)], -1)
+
+    def get(self, item_id: int) -> Optional[ModelT]:
+        row = int(self.row_of(item_id))
+        return self.models()[row] if row >= 0 else None
+
+    def models(self, rows: Optional[np.ndarray] = None) -> List[ModelT]:
+        """Pydantic models of ``rows`` (all rows by default), built once and cached"""
+        if self._models is None:
+            fields = list(self.dtypes)
+            self._models = [self.model(**dict(zip(fields, values)))
+                            for values in zip(*(self.columns[field].tolist() for field in fields))]
+        if rows is None:
+            return self._models
+        return [self._models[row] for row in rows.tolist()]
+
+
+class FactoryRegistry(ColumnRegistry[Factory]):
+    """Factories as columns, grouped by status and region"""
+
+    model = Factory
+    dtypes = {
+        'id': np.int64, 'name': str, 'location': str, 'latitude': np.float64, 'longitude': np.float64,
+        'production_capacity': np.int64, 'current_production': np.int64, 'efficiency': np.float64, 'status': str,
+    }
+
+    def __init__(self, columns: Mapping[str, ArrayLike]):
+        super().__init__(columns)
+        self.columns['region'] = region_of(self.columns['longitude'])
+        self.by_status = _group(self.columns['status'])
+        self.by_region = _group(self.columns['region'])
+
+    def select(self, factory_id: Optional[int] = None, status: Optional[str] = None,
+               region: Optional[str] = None) -> np.ndarray:
+        """Rows matching every given filter, in row order"""
+        rows: Optional[np.ndarray] = None
+        if factory_id:
+            row = int(self.row_of(factory_id))
+            rows = np.array([row]) if row >= 0 else EMPTY_ROWS
+        for groups, key in ((self.by_status, status), (self.by_region, region)):
+            if key is not None:
+                matches = groups.get(key, EMPTY_ROWS)
+                rows = matches if rows is None else np.intersect1d(rows, matches)
+        return np.arange(len(self)) if rows is None else rows
+
+    @functools.cached_property
+    def clusters(self) -> ClusterIndex:
+        """Map clusters of the factory locations by status, built on first use"""
+        return ClusterIndex(self.columns['latitude'], self.columns['longitude'], self.columns['status'],
+                            [status.value for status in FactoryStatus])
+
+    def clusters_of(self, rows: np.ndarray) -> ClusterIndex:
+        """Map clusters of the factories at ``rows`` (in row order); the ``row`` of a cluster indexes ``rows``"""
+        if len(rows) == len(self):
+            return self.clusters
+        return ClusterIndex(self.columns['latitude'][rows], self.columns['longitude'][rows],
+                            self.columns['status'][rows], [status.value for status in FactoryStatus])
+
+
+class AssemblyLineRegistry(ColumnRegistry[AssemblyLine]):
+    """Assembly lines as columns, joined to their factory rows and grouped by factory and status"""
+
+    model = AssemblyLine
+    dtypes = {
+        'id': np.int64, 'factory_id': np.int64, 'name': str, 'status': str,
+        'output_rate': np.int64, 'target_rate': np.int64,
+    }
+
+    # Columns the line table can be sorted by, each mapped to the column holding its sort key;
+    # the live rate columns only exist while line events are streaming in
+    SORT_KEYS = {
+        'factory': 'factory_name', 'line': 'name', 'status': 'status',
+        'output_rate': 'output_rate', 'target_rate': 'target_rate', 'efficiency': 'efficiency',
+        'rate_1m': 'rate_1m', 'rate_1h': 'rate_1h',
+    }
+
+    def __init__(self, columns: Mapping[str, ArrayLike], factories: FactoryRegistry):
+        super().__init__(columns)
+        self.factories = factories
+        self.columns['factory_row'] = factories.row_of(self.columns['factory_id'])
+        self.columns['factory_name'] = factories['name'][self.columns['factory_row']]
+        self.columns['efficiency'] = self.columns['output_rate'] / self.columns['target_rate'] * 100
+        self.by_factory = _group(self.columns['factory_id'])
+        self.by_status = _group(self.columns['status'])
+        # Stable ascending orders, so any page of any sort is a slice
+        self.sort_orders = {key: np.argsort(self.columns[column], kind='stable')
+                            for key, column in self.SORT_KEYS.items() if column in self.columns}
+        # Position of every row in each order, to sort a filtered subset without scanning the full order
+        self.sort_ranks = {key: np.argsort(order) for key, order in self.sort_orders.items()}
+
+    def select(self, factory_id: Optional[int] = None, status: Optional[str] = None) -> np.ndarray:
+        rows = self.by_factory.get(factory_id, EMPTY_ROWS) if factory_id else None
+        if status is not None:
+            matches = self.by_status.get(status, EMPTY_ROWS)
+            rows = matches if rows is None else np.intersect1d(rows, matches)
+        return np.arange(len(self)) if rows is None else rows
+
+    def query(self, factory_id: Optional[int] = None, status: Optional[str] = None,
+              efficiency: Optional[Tuple[float, float]] = None, sort_by: Optional[str] = None,
+              descending: bool = False, offset: int = 0, limit: Optional[int] = None,
+              live: Optional[Columns] = None) -> Tuple[np.ndarray, int]:
+        """One page of line rows matching the filters in the requested order, and the total match count.
+
+        ``efficiency`` is a half-open ``(low, high)`` band in percent. ``live`` columns, in row
+        order, take the place of the stored columns of the same name for filtering and sorting.
+        """
+        columns = {**self.columns, **live} if live else self.columns
+        # Factory and status come from the groups, so only their rows are scanned and sorted
+        rows = self.select(factory_id, status) if factory_id or status is not None else None
+        if efficiency is not None:
+            low, high = efficiency
+            values = columns['efficiency'] if rows is None else columns['efficiency'][rows]
+            matches = (values >= low) & (values < high)
+            rows = np.flatnonzero(matches) if rows is None else rows[matches]
+        key = sort_by or ''
+        column = self.SORT_KEYS.get(key, '')
+        if live and column in live:
+            values = live[column] if rows is None else live[column][rows]
+            order = np.argsort(values, kind='stable')
+            rows = order if rows is None else rows[order]
+        elif rows is None:
+            rows = self.sort_orders.get(key, np.arange(len(self)))
+        elif key in self.sort_ranks:
+            rows = rows[np.argsort(self.sort_ranks[key][rows])]
+        if descending:
+            rows = rows[::-1]
+        end = None if limit is None else offset + limit
+        return rows[offset:end], len(rows)
+
+    def factory_column(self, field: str, rows: np.ndarray) -> np.ndarray:
+        """Vectorized join: ``field`` of the factory of each line in ``rows``"""
+        return self.factories[field][self.columns['factory_row'][rows]]
@@ -0,0 +1,510 @@
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.data_generator import DataGenerator, ScaleConfig, SnapshotService, scale_financial_record
+from app.kpis import KPIEngine
+from app.models import (
+    Factory, AssemblyLine, InventoryItem, QualityMetric, ProductLine, KPIData
+)
+from app.registry import AssemblyLineRegistry, FactoryRegistry
+from app.timeseries import TimeSeriesStore, records_to_columns
+
+log = logging.getLogger(__name__)
+
+DATABASE_URL = os.environ.get('APP_DATABASE_URL', '')
+# 'generator' builds data in-process; 'database' serves it from APP_DATABASE_URL
+DATA_SOURCE = os.environ.get('APP_DATA_SOURCE', 'generator')
+
+# Portable DDL: the same statements run on Postgres and SQLite
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS dataset_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS factories (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        location TEXT NOT NULL,
+        latitude DOUBLE PRECISION NOT NULL,
+        longitude DOUBLE PRECISION NOT NULL,
+        production_capacity INTEGER NOT NULL,
+        current_production INTEGER NOT NULL,
+        efficiency DOUBLE PRECISION NOT NULL,
+        status TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS assembly_lines (
+        id INTEGER PRIMARY KEY,
+        factory_id INTEGER NOT NULL REFERENCES factories (id),
+        name TEXT NOT NULL,
+        status TEXT NOT NULL,
+        output_rate INTEGER NOT NULL,
+        target_rate INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS production (
+        factory_id INTEGER NOT NULL REFERENCES factories (id),
+        date TIMESTAMP NOT NULL,
+        cars_produced INTEGER NOT NULL,
+        target_production INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS production_factory_date ON production (factory_id, date)",
+    "CREATE INDEX IF NOT EXISTS production_date ON production (date)",
+    """CREATE TABLE IF NOT EXISTS delays (
+        date TIMESTAMP NOT NULL,
+        factory_id INTEGER NOT NULL REFERENCES factories (id),
+        category TEXT NOT NULL,
+        duration_hours INTEGER NOT NULL,
+        financial_impact DOUBLE PRECISION NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS delays_date ON delays (date)",
+    """CREATE TABLE IF NOT EXISTS inventory (
+        factory_id INTEGER NOT NULL REFERENCES factories (id),
+        part_name TEXT NOT NULL,
+        current_stock INTEGER NOT NULL,
+        target_stock INTEGER NOT NULL,
+        reorder_point INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS quality (
+        factory_id INTEGER NOT NULL REFERENCES factories (id),
+        passed INTEGER NOT NULL,
+        failed INTEGER NOT NULL,
+        total INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS financial (
+        date TIMESTAMP NOT NULL,
+        revenue_lost DOUBLE PRECISION NOT NULL,
+        cost_expedited_shipping DOUBLE PRECISION NOT NULL,
+        cost_idle_labor DOUBLE PRECISION NOT NULL,
+        cost_penalties DOUBLE PRECISION NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS financial_date ON financial (date)",
+    """CREATE TABLE IF NOT EXISTS product_lines (
+        name TEXT PRIMARY KEY,
+        profit_margin DOUBLE PRECISION NOT NULL,
+        units_sold INTEGER NOT NULL,
+        revenue DOUBLE PRECISION NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS bottlenecks (
+        category TEXT PRIMARY KEY,
+        incidents INTEGER NOT NULL
+    )""",
+]
+
+# Child tables first so deletes respect the foreign keys
+TABLES = ['production', 'delays', 'inventory', 'quality', 'assembly_lines', 'factories',
+          'financial', 'product_lines', 'bottlenecks', 'dataset_meta']
+
+PRODUCTION_QUERY = """
+    SELECT f.name AS factory_name, p.factory_id, p.date, p.cars_produced, p.target_production
+    FROM production p JOIN factories f ON f.id = p.factory_id
+    WHERE p.date >= $1 AND p.date < $2 {factory_filter}
+    ORDER BY p.date, p.factory_id
+"""
+DELAY_QUERY = """
+    SELECT d.date, d.factory_id, f.name AS factory_name, d.category, d.duration_hours, d.financial_impact
+    FROM delays d JOIN factories f ON f.id = d.factory_id
+    WHERE d.date >= $1 AND d.date < $2
+    ORDER BY d.date
+"""
+FINANCIAL_QUERY = """
+    SELECT date, revenue_lost, cost_expedited_shipping, cost_idle_labor, cost_penalties
+    FROM financial WHERE date >= $1 AND date < $2 ORDER BY date
+"""
+# Row counts, newest history dates and the last save time; writers bump dataset_meta.updated_at
+FINGERPRINT_QUERY = """
+    SELECT (SELECT COUNT(*) FROM factories) AS factories,
+           (SELECT COUNT(*) FROM assembly_lines) AS assembly_lines,
+           (SELECT COUNT(*) FROM production) AS production,
+           (SELECT MAX(date) FROM production) AS production_until,
+           (SELECT COUNT(*) FROM delays) AS delays,
+           (SELECT MAX(date) FROM delays) AS delays_until,
+           (SELECT COUNT(*) FROM financial) AS financial,
+           (SELECT MAX(value) FROM dataset_meta WHERE key = 'updated_at') AS updated_at
+"""
+
+# A statement and the parameter rows it runs with (None: once, without parameters), as one step of a transaction
+Statement = Tuple[str, Optional[Sequence[Sequence[Any]]]]
+
+
+class Repository(ABC):
+    """Async data access API over the persisted dashboard dataset.
+
+    Getters mirror ``DataGenerator`` so callers can switch between the two.
+    Subclasses provide the connection handling; queries are written with
+    Postgres ``$n`` placeholders.
+    """
+
+    def __init__(self):
+        self._end_date: Optional[datetime] = None
+
+    @abstractmethod
+    async def connect(self) -> None: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+    @abstractmethod
+    async def fetch(self, query: str, *args: Any) -> List[Dict]: ...
+
+    @abstractmethod
+    async def execute(self, query: str, *args: Any) -> None: ...
+
+    @abstractmethod
+    async def executemany(self, query: str, rows: Sequence[Sequence[Any]]) -> None: ...
+
+    @abstractmethod
+    async def transaction(self, statements: Sequence[Statement]) -> None:
+        """Run every statement with each of its parameter rows in one transaction"""
+
+    async def create_schema(self) -> None:
+        for statement in SCHEMA:
+            await self.execute(statement)
+
+    async def is_empty(self) -> bool:
+        rows = await self.fetch('SELECT COUNT(*) AS count FROM factories')
+        return rows[0]['count'] == 0
+
+    async def fingerprint(self) -> Tuple:
+        """Row counts and newest dates of the stored dataset, which change whenever it does"""
+        return tuple((await self.fetch(FINGERPRINT_QUERY))[0].values())
+
+    async def save(self, generator: DataGenerator) -> None:
+        """Replace the stored dataset with the contents of ``generator``, in one transaction"""
+        await self.transaction(await asyncio.to_thread(self._save_statements, generator))
+        self._end_date = generator.end_date
+
+    @staticmethod
+    def _save_statements(generator: DataGenerator) -> List[Statement]:
+        statements: List[Statement] = [(f'DELETE FROM {table}', None) for table in TABLES]
+        statements.append(('INSERT INTO dataset_meta (key, value) VALUES ($1, $2)', [
+            ('end_date', generator.end_date.isoformat()),
+            ('history_start', generator.history_start.isoformat()),
+            ('updated_at', datetime.now().isoformat()),
+        ]))
+        statements += [(
+            'INSERT INTO factories (id, name, location, latitude, longitude, production_capacity, '
+            'current_production, efficiency, status) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)',
+            [(f.id, f.name, f.location, f.latitude, f.longitude, f.production_capacity, f.current_production,
+              f.efficiency, f.status.value) for f in generator.factories]), (
+            'INSERT INTO assembly_lines (id, factory_id, name, status, output_rate, target_rate) '
+            'VALUES ($1, $2, $3, $4, $5, $6)',
+            [(line.id, line.factory_id, line.name, line.status.value, line.output_rate, line.target_rate)
+             for line in generator.assembly_lines]), (
+            'INSERT INTO production (factory_id, date, cars_produced, target_production) VALUES ($1, $2, $3, $4)',
+            [(r['factory_id'], r['date'], r['cars_produced'], r['target_production'])
+             for r in generator.production_store.records()]), (
+            'INSERT INTO delays (date, factory_id, category, duration_hours, financial_impact) '
+            'VALUES ($1, $2, $3, $4, $5)',
+            [(r['date'], r['factory_id'], r['category'], r['duration_hours'], r['financial_impact'])
+             for r in generator.delay_store.records()]), (
+            'INSERT INTO inventory (factory_id, part_name, current_stock, target_stock, reorder_point) '
+            'VALUES ($1, $2, $3, $4, $5)',
+            [(i.factory_id, i.part_name, i.current_stock, i.target_stock, i.reorder_point)
+             for i in generator.get_inventory_data()]), (
+            'INSERT INTO quality (factory_id, passed, failed, total) VALUES ($1, $2, $3, $4)',
+            [(q.factory_id, q.passed, q.failed, q.total) for q in generator.get_quality_metrics()]), (
+            'INSERT INTO financial (date, revenue_lost, cost_expedited_shipping, cost_idle_labor, cost_penalties) '
+            'VALUES ($1, $2, $3, $4, $5)',
+            [(r['date'], r['revenue_lost'], r['cost_expedited_shipping'], r['cost_idle_labor'], r['cost_penalties'])
+             for r in generator.financial_store.records()]), (
+            'INSERT INTO product_lines (name, profit_margin, units_sold, revenue) VALUES ($1, $2, $3, $4)',
+            [(p.name, p.profit_margin, p.units_sold, p.revenue) for p in generator.get_product_lines()]), (
+            'INSERT INTO bottlenecks (category, incidents) VALUES ($1, $2)',
+            [(b['category'], b['incidents']) for b in generator.get_bottleneck_data()])]
+        return statements
+
+    async def _meta_date(self, key: str) -> datetime:
+        rows = await self.fetch('SELECT value FROM dataset_meta WHERE key = $1', key)
+        if not rows:
+            raise RuntimeError('The repository holds no dataset; call save() first')
+        return datetime.fromisoformat(rows[0]['value'])
+
+    async def resolve_window(self, start_date: Optional[datetime], end_date: Optional[datetime]):
+        """Fill in the default 30-day window for missing range bounds"""
+        if self._end_date is None:
+            self._end_date = await self._meta_date('end_date')
+        return start_date or self._end_date - timedelta(days=30), end_date or self._end_date
+
+    async def get_factories(self) -> List[Factory]:
+        return [Factory(**row) for row in await self.fetch('SELECT * FROM factories ORDER BY id')]
+
+    async def get_assembly_lines(self) -> List[AssemblyLine]:
+        return [AssemblyLine(**row) for row in await self.fetch('SELECT * FROM assembly_lines ORDER BY id')]
+
+    async def get_kpi_data(self, delay_multiplier: float = 1.0) -> KPIData:
+        # The same engine as DataGenerator.get_kpi_data, over the stored factories and default window's delays
+        factories = FactoryRegistry.from_models(await self.get_factories())
+        delays = records_to_columns(await self.get_delay_data())
+        return KPIEngine.from_data(factories, delays).read(delay_multiplier)
+
+    async def get_production_data(self, factory_id: Optional[int] = None, start_date: Optional[datetime] = None,
+                                  end_date: Optional[datetime] = None) -> List[Dict]:
+        start, end = await self.resolve_window(start_date, end_date)
+        if factory_id:
+            return await self.fetch(PRODUCTION_QUERY.format(factory_filter='AND p.factory_id = $3'),
+                                    start, end, factory_id)
+        return await self.fetch(PRODUCTION_QUERY.format(factory_filter=''), start, end)
+
+    async def get_inventory_data(self, factory_id: Optional[int] = None) -> List[InventoryItem]:
+        if factory_id:
+            rows = await self.fetch('SELECT * FROM inventory WHERE factory_id = $1', factory_id)
+        else:
+            rows = await self.fetch('SELECT * FROM inventory ORDER BY factory_id')
+        return [InventoryItem(**row) for row in rows]
+
+    async def get_quality_metrics(self, factory_id: Optional[int] = None) -> List[QualityMetric]:
+        if factory_id:
+            rows = await self.fetch('SELECT * FROM quality WHERE factory_id = $1', factory_id)
+        else:
+            rows = await self.fetch('SELECT * FROM quality ORDER BY factory_id')
+        return [QualityMetric(**row) for row in rows]
+
+    async def get_delay_data(self, days: int = 30, start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None) -> List[Dict]:
+        start, _ = await self.resolve_window(start_date, None)
+        return await self.fetch(DELAY_QUERY, start, end_date or (start + timedelta(days=days)))
+
+    async def get_financial_data(self, delay_multiplier: float = 1.0, start_date: Optional[datetime] = None,
+                                 end_date: Optional[datetime] = None) -> List[Dict]:
+        start, end = await self.resolve_window(start_date, end_date)
+        return [scale_financial_record(row, delay_multiplier) for row in await self.fetch(FINANCIAL_QUERY, start, end)]
+
+    async def get_product_lines(self) -> List[ProductLine]:
+        return [ProductLine(**row) for row in await self.fetch('SELECT * FROM product_lines ORDER BY name')]
+
+    async def get_bottleneck_data(self) -> List[Dict]:
+        return await self.fetch('SELECT category, incidents FROM bottlenecks')
+
+    async def load_dataset(self) -> 'StoredDataset':
+        """Read the whole stored dataset into a DataGenerator-compatible object, built in a worker thread"""
+        history_start = await self._meta_date('history_start')
+        end_date = await self._meta_date('end_date')
+        self._end_date = end_date
+        return await asyncio.to_thread(
+            StoredDataset,
+            factories=await self.get_factories(),
+            assembly_lines=await self.get_assembly_lines(),
+            production=await self.get_production_data(start_date=history_start, end_date=end_date),
+            delays=await self.get_delay_data(start_date=history_start, end_date=end_date),
+            financial=await self.get_financial_data(start_date=history_start, end_date=end_date),
+            inventory=await self.get_inventory_data(),
+            quality=await self.get_quality_metrics(),
+            product_lines=await self.get_product_lines(),
+            bottlenecks=await self.get_bottleneck_data(),
+            history_start=history_start,
+            end_date=end_date,
+        )
+
+
+class PostgresRepository(Repository):
+    """Repository backed by a shared asyncpg connection pool.
+
+    asyncpg prepares every statement on first use and keeps it in a per-connection
+    statement cache, so repeated getter calls skip parsing and planning.
+    """
+
+    def __init__(self, dsn: str, min_size: int = 2, max_size: int = 10, statement_cache_size: int = 256):
+        super().__init__()
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self._pool: Any = None
+
+    @property
+    def pool(self) -> Any:
+        """The connection pool, once ``connect`` has opened it"""
+        if self._pool is None:
+            raise RuntimeError('The repository is not open; call connect() first')
+        return self._pool
+
+    async def connect(self) -> None:
+        try:
+            import asyncpg
+        except ImportError as e:
+            raise ImportError('PostgresRepository requires asyncpg. Please run "pip install asyncpg".') from e
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size,
+                                               statement_cache_size=self.statement_cache_size)
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def fetch(self, query: str, *args: Any) -> List[Dict]:
+        async with self.pool.acquire() as connection:
+            return [dict(row) for row in await connection.fetch(query, *args)]
+
+    async def execute(self, query: str, *args: Any) -> None:
+        async with self.pool.acquire() as connection:
+            await connection.execute(query, *args)
+
+    async def executemany(self, query: str, rows: Sequence[Sequence[Any]]) -> None:
+        async with self.pool.acquire() as connection:
+            await connection.executemany(query, rows)
+
+    async def transaction(self, statements: Sequence[Statement]) -> None:
+        async with self.pool.acquire() as connection, connection.transaction():
+            for query, rows in statements:
+                if rows is None:
+                    await connection.execute(query)
+                else:
+                    await connection.executemany(query, rows)
+
+
+class SQLiteRepository(Repository):
+    """Local stand-in for Postgres using the standard library sqlite3 module.
+
+    Calls run in a worker thread so the event loop is never blocked; one
+    connection is shared and serialized by a lock.
+    """
+
+    PLACEHOLDER = re.compile(r'\$\d+')
+    DATE_COLUMNS = {'date'}
+
+    def __init__(self, path: str = ':memory:'):
+        super().__init__()
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The shared connection, once ``connect`` has opened it"""
+        if self._connection is None:
+            raise RuntimeError('The repository is not open; call connect() first')
+        return self._connection
+
+    async def connect(self) -> None:
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await asyncio.to_thread(self._close)
+
+    def _close(self) -> None:
+        # Wait for a query still running in a worker thread before closing under it
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _convert(self, query: str, args: Sequence[Any]):
+        # sqlite uses positional '?' placeholders; the queries use them in order
+        params = [value.isoformat(timespec='microseconds') if isinstance(value, datetime) else value for value in args]
+        return self.PLACEHOLDER.sub('?', query), params
+
+    def _row(self, row: sqlite3.Row) -> Dict:
+        record = dict(row)
+        for column in self.DATE_COLUMNS & record.keys():
+            record[column] = datetime.fromisoformat(record[column])
+        return record
+
+    def _fetch(self, query: str, args: Sequence[Any]) -> List[Dict]:
+        with self._lock:
+            return [self._row(row) for row in self.connection.execute(*self._convert(query, args)).fetchall()]
+
+    def _execute(self, query: str, args: Sequence[Any]) -> None:
+        with self._lock, self.connection as connection:
+            connection.execute(*self._convert(query, args))
+
+    def _executemany(self, query: str, rows: Sequence[Sequence[Any]]) -> None:
+        statement = self.PLACEHOLDER.sub('?', query)
+        with self._lock, self.connection as connection:
+            connection.executemany(statement, [self._convert(query, row)[1] for row in rows])
+
+    async def fetch(self, query: str, *args: Any) -> List[Dict]:
+        return await asyncio.to_thread(self._fetch, query, args)
+
+    async def execute(self, query: str, *args: Any) -> None:
+        await asyncio.to_thread(self._execute, query, args)
+
+    async def executemany(self, query: str, rows: Sequence[Sequence[Any]]) -> None:
+        await asyncio.to_thread(self._executemany, query, rows)
+
+    def _transaction(self, statements: Sequence[Statement]) -> None:
+        # The connection commits when the block succeeds and rolls back when it raises
+        with self._lock, self.connection as connection:
+            for query, rows in statements:
+                if rows is None:
+                    connection.execute(*self._convert(query, ()))
+                else:
+                    connection.executemany(self.PLACEHOLDER.sub('?', query),
+                                                 [self._convert(query, row)[1] for row in rows])
+
+    async def transaction(self, statements: Sequence[Statement]) -> None:
+        await asyncio.to_thread(self._transaction, statements)
+
+
+class StoredDataset(DataGenerator):
+    """DataGenerator-compatible dataset whose contents come from a Repository"""
+
+    def __init__(self, *, factories: List[Factory], assembly_lines: List[AssemblyLine], production: List[Dict],
+                 delays: List[Dict], financial: List[Dict], inventory: List[InventoryItem],
+                 quality: List[QualityMetric], product_lines: List[ProductLine], bottlenecks: List[Dict],
+                 history_start: datetime, end_date: datetime):
+        # The setup steps of DataGenerator.__init__, fed from the stored records instead of generated ones
+        self._set_random(None, ScaleConfig(factories=len(factories)))
+        self.factory_registry = FactoryRegistry.from_models(factories)
+        self.line_registry = AssemblyLineRegistry.from_models(assembly_lines, self.factory_registry)
+        self._set_window(end_date, (end_date - history_start).days)
+        self._set_history(TimeSeriesStore.from_records(production), TimeSeriesStore.from_records(delays),
+                          TimeSeriesStore.from_records(financial, partition_key=None))
+        self._inventory = inventory
+        self._quality = quality
+        self._product_lines = product_lines
+        self._bottlenecks = bottlenecks
+
+    def get_inventory_data(self, factory_id: Optional[int] = None) -> List[InventoryItem]:
+        return [item for item in self._inventory if not factory_id or item.factory_id == factory_id]
+
+    def get_quality_metrics(self, factory_id: Optional[int] = None) -> List[QualityMetric]:
+        return [metric for metric in self._quality if not factory_id or metric.factory_id == factory_id]
+
+    def get_product_lines(self) -> List[ProductLine]:
+        return list(self._product_lines)
+
+    def get_bottleneck_data(self) -> List[Dict]:
+        return list(self._bottlenecks)
+
+
+def create_repository(url: str) -> Repository:
+    """Create a repository for a ``postgres://`` or ``sqlite:///relative/path`` (``sqlite:////absolute``) URL"""
+    if url.startswith(('postgres://', 'postgresql://')):
+        return PostgresRepository(url)
+    if url.startswith('sqlite://'):
+        return SQLiteRepository(url[len('sqlite:///'):] or ':memory:')
+    raise ValueError(f'Unsupported database URL "{url}"')
+
+
+async def open_repository(url: str = DATABASE_URL) -> Repository:
+    """Connect, create the schema and seed it from a DataGenerator when empty"""
+    repository = create_repository(url)
+    await repository.connect()
+    await repository.create_schema()
+    if await repository.is_empty():
+        log.info('Seeding empty database with generated data')
+        await repository.save(await asyncio.to_thread(DataGenerator))
+    return repository
+
+
+async def sync_snapshots(repository: Repository, service: SnapshotService) -> None:
+    """Check the stored dataset once per refresh interval and publish it to ``service`` when it changed"""
+    service.use_external_source()
+    published = None
+    while True:
+        try:
+            fingerprint = await repository.fingerprint()
+            if fingerprint != published:
+                dataset = await repository.load_dataset()
+                await asyncio.to_thread(service.publish, dataset)
+                published = fingerprint
+        except Exception:
+            log.exception('Failed to load dataset from the database')
+        await asyncio.sleep(service.refresh_interval)
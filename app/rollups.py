@@ -0,0 +1,219 @@
+import numpy as np
+from datetime import datetime
+from typing import Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+from app.timeseries import Columns
+
+# Supported bucket sizes, finest first
+RESOLUTIONS = ('hour', 'day', 'week', 'month')
+# How chart titles name a series of each resolution
+RESOLUTION_TITLES = {'hour': 'Hourly', 'day': 'Daily', 'week': 'Weekly', 'month': 'Monthly'}
+ONE_MICROSECOND = np.timedelta64(1, 'us')
+
+
+def bucket_numbers(timestamps, resolution: str) -> np.ndarray:
+    """Bucket of each timestamp, counted from the Unix epoch; weeks start on Monday"""
+    timestamps = np.asarray(timestamps, dtype='datetime64[us]')
+    if resolution == 'hour':
+        return timestamps.astype('datetime64[h]').astype(np.int64)
+    if resolution == 'day':
+        return timestamps.astype('datetime64[D]').astype(np.int64)
+    if resolution == 'week':
+        # 1970-01-01 was a Thursday, three days after the Monday starting its week
+        return (timestamps.astype('datetime64[D]').astype(np.int64) + 3) // 7
+    if resolution == 'month':
+        return timestamps.astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f'Unknown rollup resolution "{resolution}", expected one of {", ".join(RESOLUTIONS)}')
+
+
+def bucket_starts(buckets: np.ndarray, resolution: str) -> np.ndarray:
+    """Start timestamp of each bucket number"""
+    buckets = np.asarray(buckets, dtype=np.int64)
+    if resolution == 'week':
+        return (buckets * 7 - 3).astype('datetime64[D]').astype('datetime64[us]')
+    unit = {'hour': 'h', 'day': 'D', 'month': 'M'}[resolution]
+    return buckets.astype(f'datetime64[{unit}]').astype('datetime64[us]')
+
+
+class Rollup:
+    """Sums of value columns per key and time bucket, stored as prefix sums over the buckets.
+
+    ``prefix[row, i]`` holds the totals of key ``row`` over all buckets before
+    bucket ``i``, so the total over any bucket range is one subtraction per
+    key whatever the length of the history. Every rollup also counts its
+    records in a ``count`` column. Records may be added in several batches
+    in any order; a batch before the origin or inside the history shifts the
+    running totals of every later bucket.
+    """
+
+    def __init__(self, resolution: str, columns: Sequence[str]):
+        bucket_numbers(np.empty(0, dtype='datetime64[us]'), resolution)  # validates the resolution
+        self.resolution = resolution
+        self.columns = ['count', *columns]
+        self.keys: List[Hashable] = []
+        self._rows: Dict[Hashable, int] = {}
+        self.origin = 0  # bucket number of the first bucket
+        self.size = 0  # buckets held
+        self._prefix = np.zeros((0, 1, len(self.columns)))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def row_of(self, key: Hashable) -> Optional[int]:
+        return self._rows.get(key)
+
+    def add(self, timestamps, keys, values: Mapping[str, np.ndarray]) -> None:
+        """Add records: one timestamp, key and value per column for each; ``keys=None`` puts all under None"""
+        buckets = bucket_numbers(timestamps, self.resolution)
+        if not len(buckets):
+            return
+        if keys is None:
+            unique, inverse = [None], np.zeros(len(buckets), dtype=np.int64)
+        else:
+            unique, inverse = np.unique(np.asarray(keys), return_inverse=True)
+            unique = unique.tolist()
+        for key in unique:
+            if key not in self._rows:
+                self._rows[key] = len(self.keys)
+                self.keys.append(key)
+        rows = np.array([self._rows[key] for key in unique])[inverse.ravel()]
+        first, last = int(buckets.min()), int(buckets.max())
+        self._reserve(first, last)
+
+        # Per-bucket sums of the new records over the buckets they touch
+        lo, hi = first - self.origin, last - self.origin + 1
+        span = hi - lo
+        cells = rows * span + (buckets - first)
+        delta = np.stack([np.bincount(cells, weights=self._values(values, column, len(buckets)),
+                                      minlength=len(self.keys) * span).reshape(len(self.keys), span)
+                          for column in self.columns], axis=-1)
+        prefix = self._prefix[:len(self.keys)]
+        prefix[:, lo + 1:hi + 1] += np.cumsum(delta, axis=1)
+        prefix[:, hi + 1:self.size + 1] += delta.sum(axis=1)[:, None]
+
+    @staticmethod
+    def _values(values: Mapping[str, np.ndarray], column: str, count: int) -> np.ndarray:
+        if column == 'count':
+            return np.ones(count)
+        return np.asarray(values[column], dtype=np.float64)
+
+    def _reserve(self, first: int, last: int) -> None:
+        """Make room for the current keys and buckets ``first`` to ``last``"""
+        if not self.size:
+            self.origin = first
+        start = min(self.origin, first)
+        size = max(self.origin + self.size, last + 1) - start
+        shift = self.origin - start
+        keys, capacity = self._prefix.shape[0], self._prefix.shape[1] - 1
+        if shift or size > capacity or len(self.keys) > keys:
+            # Grow to twice the buckets so appends reallocate a logarithmic number of times
+            capacity = capacity if size <= capacity else max(size, 2 * capacity)
+            grown = np.zeros((len(self.keys), capacity + 1, len(self.columns)))
+            grown[:keys, shift + 1:shift + self.size + 1] = self._prefix[:, 1:self.size + 1]
+            self._prefix = grown
+        # New buckets after the old end start from the old running totals
+        end = shift + self.size
+        self._prefix[:, end + 1:size + 1] = self._prefix[:, end:end + 1]
+        self.origin, self.size = start, size
+
+    def bounds(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Tuple[int, int]:
+        """Bucket index range of the buckets overlapping ``start <= timestamp < end``"""
+        lo = 0
+        if start is not None:
+            lo = int(bucket_numbers([np.datetime64(start, 'us')], self.resolution)[0]) - self.origin
+        hi = self.size
+        if end is not None:
+            last = np.datetime64(end, 'us') - ONE_MICROSECOND
+            hi = int(bucket_numbers([last], self.resolution)[0]) - self.origin + 1
+        lo, hi = min(max(lo, 0), self.size), min(max(hi, 0), self.size)
+        return lo, max(lo, hi)
+
+    def totals(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> np.ndarray:
+        """Totals per key (rows) and column over the range, in O(keys)"""
+        lo, hi = self.bounds(start, end)
+        return self._prefix[:len(self.keys), hi] - self._prefix[:len(self.keys), lo]
+
+    def series(self, start: Optional[datetime] = None,
+               end: Optional[datetime] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Bucket start timestamps and the per-key, per-bucket sums (keys x buckets x columns)"""
+        lo, hi = self.bounds(start, end)
+        dates = bucket_starts(np.arange(self.origin + lo, self.origin + hi), self.resolution)
+        return dates, np.diff(self._prefix[:len(self.keys), lo:hi + 1], axis=1)
+
+
+class RollupSet:
+    """The same records rolled up at several resolutions.
+
+    Range totals read the finest rollup; trends read the finest rollup that
+    has no more buckets in the range than the chart can use.
+    """
+
+    def __init__(self, columns: Sequence[str], resolutions: Sequence[str] = ('day', 'week', 'month')):
+        self.rollups = {resolution: Rollup(resolution, columns)
+                        for resolution in sorted(resolutions, key=RESOLUTIONS.index)}
+        self.finest = next(iter(self.rollups.values()))
+        self.coarsest = next(reversed(self.rollups.values()))
+
+    @classmethod
+    def from_columns(cls, columns: Columns, key: Optional[str], values: Sequence[str], time_key: str = 'date',
+                     resolutions: Sequence[str] = ('day', 'week', 'month')) -> 'RollupSet':
+        """Roll up stored columns, keyed by the ``key`` column (or not at all for None)"""
+        rollups = cls(values, resolutions)
+        if columns:
+            rollups.add(columns[time_key], columns[key] if key else None, columns)
+        return rollups
+
+    def add(self, timestamps, keys, values: Mapping[str, np.ndarray]) -> None:
+        for rollup in self.rollups.values():
+            rollup.add(timestamps, keys, values)
+
+    @property
+    def keys(self) -> List[Hashable]:
+        return self.finest.keys
+
+    def totals(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Columns:
+        """One row per key with its record count and column totals over the range"""
+        totals = self.finest.totals(start, end)
+        columns: Columns = {'key': np.array(self.keys)}
+        columns.update({column: totals[:, i] for i, column in enumerate(self.finest.columns)})
+        return columns
+
+    def total(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              key: Optional[Hashable] = None) -> Dict[str, float]:
+        """Column totals over the range for one key, or for all keys"""
+        totals = self.finest.totals(start, end)
+        if key is not None:
+            row = self.finest.row_of(key)
+            totals = totals[row:row + 1] if row is not None else totals[:0]
+        return dict(zip(self.finest.columns, totals.sum(axis=0).tolist()))
+
+    def resolution_for(self, start: Optional[datetime], end: Optional[datetime],
+                       max_buckets: Optional[int] = None) -> str:
+        """Finest resolution with at most ``max_buckets`` buckets in the range (else the coarsest)"""
+        for resolution, rollup in self.rollups.items():
+            lo, hi = rollup.bounds(start, end)
+            if max_buckets is None or hi - lo <= max_buckets:
+                return resolution
+        return self.coarsest.resolution
+
+    def series(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               key: Optional[Hashable] = None, max_buckets: Optional[int] = None) -> Columns:
+        """Per-bucket totals over the range for one key, or summed over all keys.
+
+        Buckets are labelled by their start; the first and last hold only the part of the range they overlap.
+        """
+        rollup = self.rollups[self.resolution_for(start, end, max_buckets)]
+        dates, sums = rollup.series(start, end)
+        if rollup is not self.finest and len(dates):
+            # Coarse buckets reaching past the range keep only the records inside it, summed from the
+            # finest rollup, so the edge weeks or months of a trend match the range totals
+            if start is not None:
+                sums[:, 0] = self.finest.totals(start, dates[1].item() if len(dates) > 1 else end)
+            if end is not None:
+                sums[:, -1] = self.finest.totals(dates[-1].item() if len(dates) > 1 else start, end)
+        if key is not None:
+            row = rollup.row_of(key)
+            sums = sums[row:row + 1] if row is not None else sums[:0]
+        sums = sums.sum(axis=0)
+        columns: Columns = {'date': dates}
+        columns.update({column: sums[:, i] for i, column in enumerate(rollup.columns)})
+        return columns
@@ -0,0 +1,69 @@
+import os
+import weakref
+from typing import Any, Dict, MutableMapping, Optional, Set
+from nicegui import app, context, Client
+from app.refresh import CoalescingUpdateQueue, RefreshScheduler
+
+# User preferences kept across visits in app.storage.user; all other view state lives only in the session
+PREFERENCES = ('delay_multiplier', 'selected_factory', 'start_date', 'end_date', 'open_sections')
+# Seconds preference changes are collected before they are written to the user storage in one update
+PREFERENCE_FLUSH_SECONDS = float(os.environ.get('APP_PREFERENCE_FLUSH_SECONDS', 1.0))
+
+
+class Session:
+    """In-memory state of one dashboard tab (NiceGUI client).
+
+    ``values`` holds the user's preferences, loaded from the persisted user
+    storage when the page is built, alongside per-tab view state such as
+    chart selections; panels read and bind to it. Changed preferences are written back in one coalesced storage
+    update per flush period, so dragging a slider costs a single write, and
+    callbacks like the page's refresh scheduler never reach the storage.
+    """
+
+    def __init__(self, storage: MutableMapping[str, Any], flush_seconds: float = PREFERENCE_FLUSH_SECONDS):
+        self.storage = storage
+        self.values: Dict[str, Any] = {key: storage[key] for key in PREFERENCES if key in storage}
+        self.scheduler: Optional[RefreshScheduler] = None
+        self._dirty: Set[str] = set()
+        self.writes = CoalescingUpdateQueue(lambda _: self.flush(), debounce=flush_seconds)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.values.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.values[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.values[key] = value
+        if key in PREFERENCES and self.storage.get(key) != value:
+            self._dirty.add(key)
+            self.writes.submit(None)
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        """Value of ``key``, starting it at ``default``; defaults are not persisted"""
+        return self.values.setdefault(key, default)
+
+    def flush(self) -> None:
+        """Write the changed preferences to the user storage in one update"""
+        if self._dirty:
+            self.storage.update({key: self.values[key] for key in self._dirty})
+            self._dirty.clear()
+
+
+# Sessions go away with their client
+sessions: 'weakref.WeakKeyDictionary[Client, Session]' = weakref.WeakKeyDictionary()
+
+
+def current_session() -> Session:
+    """Session of the client whose page or event is being handled, created on first use"""
+    client = context.client
+    session = sessions.get(client)
+    if session is None:
+        storage = app.storage.user
+        # Another open tab of the same user may still hold unwritten preferences
+        for other in list(sessions.values()):
+            if other.storage is storage:
+                other.flush()
+        session = sessions[client] = Session(storage)
+        client.on_disconnect(session.flush)
+    return session
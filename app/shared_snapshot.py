@@ -0,0 +1,187 @@
+import asyncio
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    # Only for annotations, so workers can read the configuration without loading pandas
+    from app.data_generator import DataSnapshot, SnapshotService
+    from app.ingestion import LineWindows
+
+log = logging.getLogger(__name__)
+
+# Directory the producer publishes snapshots to; set for the workers of a multi-process deployment
+DIRECTORY = os.environ.get('APP_SHARED_SNAPSHOT_DIR', '')
+# Seconds between checks for a newer snapshot, by the producer and by the workers
+POLL_SECONDS = float(os.environ.get('APP_SHARED_SNAPSHOT_POLL_SECONDS', 1))
+# Published versions kept on disk; older files are removed once workers have had time to move on
+KEEP_VERSIONS = 3
+POINTER = 'current.json'
+# Live line windows of the producer, the only process that ingests line events
+LINES = 'lines.pickle'
+
+MAGIC = b'DSNAP\x00\x00\x01'
+HEADER = struct.Struct('<8sQ')  # magic, length of the buffer index
+ALIGNMENT = 64  # cache line, so every array starts aligned
+
+
+def _align(position: int) -> int:
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(snapshot: 'DataSnapshot', path: str) -> None:
+    """Write ``snapshot`` to ``path``: its pickle plus every NumPy buffer stored out of band, aligned.
+
+    Pickle protocol 5 hands contiguous array buffers to a callback instead
+    of copying them into the stream, so the file is a small index followed
+    by the raw array data, ready to be mapped by ``attach``.
+    """
+    buffers = []
+    payload = pickle.dumps(snapshot, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+    offsets, position = [], 0
+    for raw in raws:
+        offsets.append(position)
+        position = _align(position + raw.nbytes)
+    index = pickle.dumps((payload, offsets, [raw.nbytes for raw in raws]), protocol=5)
+    start = _align(HEADER.size + len(index))
+    partial = f'{path}.partial'
+    with open(partial, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(index)))
+        file.write(index)
+        for raw, offset in zip(raws, offsets):
+            file.seek(start + offset)
+            file.write(raw)
+        file.truncate(start + position)
+    # Readers only ever see complete files
+    os.replace(partial, path)
+
+
+def attach(path: str) -> 'DataSnapshot':
+    """Snapshot whose arrays are read-only views of ``path`` mapped into memory, without copying them"""
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    magic, length = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a shared data snapshot')
+    payload, offsets, sizes = pickle.loads(view[HEADER.size:HEADER.size + length])
+    start = _align(HEADER.size + length)
+    return pickle.loads(payload, buffers=[view[start + offset:start + offset + size]
+                                          for offset, size in zip(offsets, sizes)])
+
+
+def snapshot_file(version: int) -> str:
+    """Name of the file a snapshot version is published to"""
+    return f'snapshot-{version:08d}.bin'
+
+
+class SnapshotPublisher:
+    """Writes versioned snapshot files to a directory and points ``current.json`` at the newest"""
+
+    def __init__(self, directory: str, keep: int = KEEP_VERSIONS):
+        self.directory = directory
+        self.keep = keep
+        self.published = []
+
+    def publish(self, snapshot: 'DataSnapshot') -> str:
+        name = snapshot_file(snapshot.version)
+        write_snapshot(snapshot, os.path.join(self.directory, name))
+        pointer = os.path.join(self.directory, POINTER)
+        with open(f'{pointer}.partial', 'w') as file:
+            json.dump({'version': snapshot.version, 'file': name}, file)
+        os.replace(f'{pointer}.partial', pointer)
+        self.published.append(name)
+        # Workers still mapping a removed file keep reading it until they let go
+        while len(self.published) > self.keep:
+            os.remove(os.path.join(self.directory, self.published.pop(0)))
+        return name
+
+
+def read_pointer(directory: str) -> Optional[Dict]:
+    """Version and file name of the newest published snapshot; None before the first one"""
+    try:
+        with open(os.path.join(directory, POINTER)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+async def produce(directory: str, service: 'SnapshotService', interval: float = POLL_SECONDS) -> None:
+    """Publish every new snapshot of ``service`` (built locally or loaded by its source) to ``directory``"""
+    publisher = SnapshotPublisher(directory)
+    version = None
+    while True:
+        try:
+            snapshot = await asyncio.to_thread(service.get)
+            if snapshot.version != version:
+                await asyncio.to_thread(publisher.publish, snapshot)
+                version = snapshot.version
+        except Exception:
+            log.exception('Failed to publish the shared data snapshot')
+        await asyncio.sleep(interval)
+
+
+async def follow(directory: str, service: 'SnapshotService', interval: float = POLL_SECONDS) -> None:
+    """Serve the snapshots published to ``directory`` from ``service``, attaching to each new version"""
+    service.use_external_source()
+    version = None
+    while True:
+        try:
+            pointer = read_pointer(directory)
+            if pointer is not None and pointer['version'] != version:
+                path = os.path.join(directory, pointer['file'])
+                service.adopt(await asyncio.to_thread(attach, path))
+                version = pointer['version']
+        except Exception:
+            log.exception('Failed to attach to the shared data snapshot')
+        await asyncio.sleep(interval)
+
+
+def write_lines(windows: 'LineWindows', directory: str) -> None:
+    """Write the clock and running sums of ``windows`` to the directory's lines file"""
+    path = os.path.join(directory, LINES)
+    with open(f'{path}.partial', 'wb') as file:
+        pickle.dump(windows.state(), file, protocol=5)
+    os.replace(f'{path}.partial', path)
+
+
+def read_lines(directory: str) -> Dict:
+    """State of the line windows last written to the directory's lines file"""
+    with open(os.path.join(directory, LINES), 'rb') as file:
+        return pickle.load(file)
+
+
+async def share_lines(directory: str, windows: 'LineWindows', interval: float = POLL_SECONDS) -> None:
+    """Publish the producer's line windows every ``interval`` seconds, moving their clock to the present"""
+    while True:
+        try:
+            if windows.live:
+                windows.advance(time.time())
+                await asyncio.to_thread(write_lines, windows, directory)
+        except Exception:
+            log.exception('Failed to publish the live line windows')
+        await asyncio.sleep(interval)
+
+
+async def follow_lines(directory: str, windows: 'LineWindows', interval: float = POLL_SECONDS) -> None:
+    """Mirror the line windows published to ``directory`` into ``windows`` instead of ingesting"""
+    path = os.path.join(directory, LINES)
+    modified = None
+    while True:
+        try:
+            # The file is read in a worker thread; only restoring the windows runs on the loop
+            stat = await asyncio.to_thread(os.stat, path)
+            if stat.st_mtime_ns != modified:
+                windows.restore(await asyncio.to_thread(read_lines, directory))
+                modified = stat.st_mtime_ns
+        except FileNotFoundError:
+            pass
+        except Exception:
+            log.exception('Failed to read the live line windows')
+        await asyncio.sleep(interval)
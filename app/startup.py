@@ -1,6 +1,58 @@
-from nicegui import ui
-from app import dashboard
+from nicegui import app, background_tasks
+from app import dashboard, warmup
+from app.warmup import warm_up
 
 def startup() -> None:
-    # Create the main dashboard
-    dashboard.create()
\ No newline at end of file
+    # Register the pages right away; the heavy modules and the data load in the warm-up
+    dashboard.create()
+    warmup.create()
+    background_tasks.create(warm_up.run(start_services), name='warm-up')
+
+
+def start_services() -> None:
+    from app.broadcast import broadcast_hub
+    from app.data_generator import snapshot_service
+    from app.executor import panel_executor
+    from app.ingestion import feed_kpis, ingestion, line_windows
+    from app import repository, shared_snapshot
+    
+    # Push each distinct dashboard view to its subscribers once per tick
+    if broadcast_hub.enabled:
+        background_tasks.create(broadcast_hub.run(), name='dashboard broadcast')
+    
+    # Stream assembly line output into the live rate windows; workers of a
+    # multi-process deployment mirror the windows of the producer, which ingests
+    if ingestion.enabled and shared_snapshot.DIRECTORY:
+        background_tasks.create(shared_snapshot.follow_lines(shared_snapshot.DIRECTORY, line_windows),
+                                name='shared line windows')
+    elif ingestion.enabled:
+        background_tasks.create(ingestion.run(line_registry), name='line ingestion')
+    # The KPI cards read the live output from the engine, which gets it as output events
+    if ingestion.enabled:
+        background_tasks.create(feed_kpis(snapshot_service.kpis, line_registry), name='live KPIs')
+    
+    # Workers of a multi-process deployment attach to the producer's snapshots;
+    # otherwise serve snapshots loaded from APP_DATABASE_URL instead of generating them
+    if shared_snapshot.DIRECTORY:
+        snapshot_service.use_external_source()
+        background_tasks.create(shared_snapshot.follow(shared_snapshot.DIRECTORY, snapshot_service),
+                                name='shared snapshots')
+    elif repository.DATA_SOURCE == 'database':
+        snapshot_service.use_external_source()
+        background_tasks.create(load_from_database(), name='database snapshots')
+    
+    # Release panel worker threads/processes with the server
+    app.on_shutdown(panel_executor.shutdown)
+
+
+async def line_registry():
+    from app.executor import current_snapshot
+    return (await current_snapshot()).line_registry
+
+
+async def load_from_database() -> None:
+    from app import repository
+    from app.data_generator import snapshot_service
+    repo = await repository.open_repository()
+    app.on_shutdown(repo.close)
+    await repository.sync_snapshots(repo, snapshot_service)
@@ -0,0 +1,168 @@
+import functools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple, TypeVar
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+INF_LABEL = 'le="+Inf"'
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """Prometheus-style histogram with cumulative buckets, one series per label combination"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = SECONDS_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: Any) -> None:
+        key = tuple(str(label) for label in labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: Any) -> int:
+        series = self._series.get(tuple(str(label) for label in labels))
+        return series[2] if series else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, INF_LABEL)} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class Span:
+    """Context manager observing the time spent in its block, or doing nothing when telemetry is off"""
+
+    __slots__ = ('telemetry', 'histogram', 'labels', 'start')
+
+    def __init__(self, telemetry: 'Telemetry', histogram: Histogram, labels: Tuple):
+        self.telemetry = telemetry
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self) -> 'Span':
+        if self.telemetry.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        if self.telemetry.enabled and self.start:
+            self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Telemetry:
+    """In-process registry of timing and size histograms exposed in the Prometheus text format.
+
+    Recording is switched on with APP_TELEMETRY; when it is off every
+    instrumented call costs a single attribute check. Metrics recorded in
+    process-pool workers stay in those workers.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms: List[Histogram] = []
+        self._client_bytes: Dict[str, int] = {}
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = SECONDS_BUCKETS) -> Histogram:
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self.histograms.append(histogram)
+        return histogram
+
+    def span(self, histogram: Histogram, *labels: Any) -> Span:
+        return Span(self, histogram, labels)
+
+    def timed(self, histogram: Histogram, *labels: Any) -> Callable[[F], F]:
+        """Decorator recording each call's duration; a single label defaults to the function name"""
+        def decorator(fn: F) -> F:
+            values = labels or ((fn.__name__,) if histogram.labelnames else ())
+
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start, *values)
+            return wrapper  # type: ignore
+        return decorator
+
+    def add_client_bytes(self, client: Any, sent: int) -> None:
+        """Count bytes pushed to ``client``; the session total is observed when it disconnects"""
+        if not self.enabled:
+            return
+        if client.id not in self._client_bytes:
+            self._client_bytes[client.id] = 0
+            client.on_disconnect(lambda: CLIENT_BYTES.observe(self._client_bytes.pop(client.id, 0)))
+        self._client_bytes[client.id] += sent
+
+    def reset(self) -> None:
+        for histogram in self.histograms:
+            histogram.clear()
+        self._client_bytes.clear()
+
+    def render(self) -> str:
+        lines = [line for histogram in self.histograms for line in histogram.render()]
+        return '\n'.join(lines) + '\n'
+
+
+telemetry = Telemetry(enabled=os.environ.get('APP_TELEMETRY', '').lower() in ('1', 'true', 'yes'))
+
+GETTER_SECONDS = telemetry.histogram(
+    'dashboard_data_getter_seconds', 'Time spent in DataGenerator getters', ['getter'])
+PANEL_BUILD_SECONDS = telemetry.histogram(
+    'dashboard_panel_build_seconds', 'Time spent computing a panel payload (pandas and Plotly)', ['panel'])
+PANEL_UPDATE_SECONDS = telemetry.histogram(
+    'dashboard_panel_update_seconds', 'Time spent in a panel update function, including the push', ['panel'])
+PAGE_BUILD_SECONDS = telemetry.histogram(
+    'dashboard_page_build_seconds', 'Time spent building the dashboard page')
+FIGURE_UPDATE_BYTES = telemetry.histogram(
+    'dashboard_figure_update_bytes', 'Bytes sent per chart update', ['kind'], BYTES_BUCKETS)
+CLIENT_BYTES = telemetry.histogram(
+    'dashboard_client_bytes', 'Chart bytes sent to a client over its session', buckets=BYTES_BUCKETS)
+
@@ -0,0 +1,110 @@
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+def to_range(start_date: Optional[str], end_date: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Convert the inclusive 'YYYY-MM-DD' dates of the Time Range control into a half-open range"""
+    start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else None
+    end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1) if end_date else None
+    return start, end
+
+
+def range_title(start: datetime, end: datetime) -> str:
+    """Name the days of a half-open range for a chart title, e.g. 'Mar 3 – Apr 21, 2025'"""
+    last = end - timedelta(microseconds=1)
+    if start.date() == last.date():
+        return f'{start:%b} {start.day}, {start.year}'
+    first = f'{start:%b} {start.day}' if start.year == last.year else f'{start:%b} {start.day}, {start.year}'
+    return f'{first} – {last:%b} {last.day}, {last.year}'
+
+
+Columns = Dict[str, np.ndarray]
+
+
+def to_records(columns: Columns) -> List[Dict]:
+    """Convert columns to a list of row dicts holding plain Python values (datetime, int, float, str)"""
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*(columns[key].tolist() for key in keys))]
+
+
+def records_to_columns(records: Sequence[Dict]) -> Columns:
+    """Convert a list of row dicts to one array per key"""
+    if not records:
+        return {}
+    return {key: np.array([record[key] for record in records]) for key in records[0]}
+
+
+class TimeIndex:
+    """Columns sorted by timestamp, sliced by binary search over a datetime64 array.
+
+    The stored arrays are read-only; slices are views into them.
+    """
+
+    def __init__(self, columns: Columns, time_key: str = 'date'):
+        timestamps = np.asarray(columns.get(time_key, ()), dtype='datetime64[us]')
+        order = np.argsort(timestamps, kind='stable')
+        self.columns: Columns = {}
+        for key, values in columns.items():
+            values = np.asarray(values)[order]
+            values.flags.writeable = False
+            self.columns[key] = values
+        self.timestamps = timestamps[order]
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def bounds(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Tuple[int, int]:
+        """Index range of the rows with ``start <= timestamp < end``"""
+        lo = 0 if start is None else int(np.searchsorted(self.timestamps, np.datetime64(start, 'us'), 'left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.timestamps, np.datetime64(end, 'us'), 'left'))
+        return lo, max(lo, hi)
+
+    def slice(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Columns:
+        lo, hi = self.bounds(start, end)
+        return {key: values[lo:hi] for key, values in self.columns.items()}
+
+
+class TimeSeriesStore:
+    """Columnar time series with one sorted index per partition (e.g. per factory).
+
+    Date-range queries cost O(log n) plus a view of the k matching rows
+    instead of a scan over the whole history, and return one array per
+    column that panels can hand straight to pandas.
+    """
+
+    def __init__(self, columns: Columns, time_key: str = 'date', partition_key: Optional[str] = 'factory_id'):
+        self.time_key = time_key
+        self._all = TimeIndex(columns, time_key)
+        self._partitions: Dict[Hashable, TimeIndex] = {}
+        if partition_key is not None and partition_key in columns:
+            keys = self._all.columns[partition_key]
+            # A stable sort by partition keeps each partition in time order
+            order = np.argsort(keys, kind='stable')
+            values, starts = np.unique(keys[order], return_index=True)
+            ends = list(starts[1:]) + [len(order)]
+            for value, lo, hi in zip(values.tolist(), starts, ends):
+                rows = order[lo:hi]
+                self._partitions[value] = TimeIndex({key: column[rows] for key, column in self._all.columns.items()}, time_key)
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict], time_key: str = 'date',
+                     partition_key: Optional[str] = 'factory_id') -> 'TimeSeriesStore':
+        return cls(records_to_columns(records), time_key, partition_key)
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              partition: Optional[Hashable] = None) -> Columns:
+        if partition is None:
+            return self._all.slice(start, end)
+        index = self._partitions.get(partition)
+        if index is None:
+            return {key: values[:0] for key, values in self._all.columns.items()}
+        return index.slice(start, end)
+
+    def records(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                partition: Optional[Hashable] = None) -> List[Dict]:
+        """Row-dict view of query() for callers of the list-of-dicts API"""
+        return to_records(self.query(start, end, partition))
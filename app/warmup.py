@@ -0,0 +1,196 @@
+import asyncio
+import importlib
+import importlib.abc
+import logging
+import sys
+import threading
+import time
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from fastapi.responses import PlainTextResponse
+from nicegui import app
+
+log = logging.getLogger(__name__)
+
+# Modules behind the dashboard page, imported off the event loop during warm-up
+MODULES = ('app.header', 'app.kpi_overview', 'app.controls', 'app.factory_operations', 'app.logistics',
+           'app.financial')
+# Seconds between checks of a warm-up that is still running
+POLL_SECONDS = 0.05
+
+
+class TimedLoader(importlib.abc.Loader):
+    """Loader that times ``exec_module`` of the loader it wraps"""
+
+    def __init__(self, loader: importlib.abc.Loader, timer: 'ImportTimer'):
+        self.loader = loader
+        self.timer = timer
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        self.timer.start()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.timer.stop(module.__name__)
+
+    def __getattr__(self, name: str) -> Any:
+        # get_source, get_code, is_package, ... are those of the wrapped loader
+        return getattr(self.loader, name)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """Self and cumulative import times of our modules, like ``python -X importtime`` scoped to a prefix.
+
+    A module's cumulative time includes everything its import pulls in,
+    third-party libraries included; its self time excludes the modules of
+    the prefix it imports, so heavy dependencies show up on the first of
+    our modules that imports them.
+    """
+
+    def __init__(self, prefix: str = 'app.'):
+        self.prefix = prefix
+        self.entries: List[Tuple[int, float, float, str]] = []  # depth, self, cumulative, module
+        self._local = threading.local()
+
+    @property
+    def _stack(self) -> List[List[float]]:
+        # Start time and time spent in nested modules of each import in progress on this thread
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def install(self) -> None:
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def find_spec(self, name: str, path=None, target=None):
+        if not name.startswith(self.prefix):
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+    def start(self) -> None:
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def stop(self, name: str) -> None:
+        started, nested = self._stack.pop()
+        cumulative = time.perf_counter() - started
+        if self._stack:
+            self._stack[-1][1] += cumulative
+        self.entries.append((len(self._stack), cumulative - nested, cumulative, name))
+
+    def render(self) -> str:
+        lines = ['import time: self [us] | cumulative | module']
+        lines += [f'import time: {self_time * 1e6:9.0f} | {cumulative * 1e6:10.0f} | {"  " * depth}{name}'
+                  for depth, self_time, cumulative, name in self.entries]
+        return '\n'.join(lines)
+
+
+class WarmUp:
+    """Loads what the first page needs in the background, in timed phases.
+
+    The server answers requests as soon as the pages are registered; the
+    warm-up then imports the dashboard modules in a thread, starts the
+    background services, builds the shared snapshot and computes every
+    panel's default figures once, so plotly's templates and validators are
+    loaded before the first visitor arrives. A failing phase ends the
+    warm-up: its error is logged and recorded in ``errors``, and the warm-up
+    still counts as finished so pages stop waiting and report it.
+    """
+
+    def __init__(self, modules: Sequence[str] = MODULES):
+        self.modules = modules
+        self.phases: List[Tuple[str, float]] = []
+        self.phase: Optional[str] = None
+        self.ready = False
+        self.errors: List[Tuple[str, str]] = []
+
+    async def _timed(self, phase: str, step: Callable[[], Any]) -> Any:
+        self.phase = phase
+        start = time.perf_counter()
+        result = await asyncio.to_thread(step)
+        self.phases.append((phase, time.perf_counter() - start))
+        return result
+
+    def _import_modules(self) -> None:
+        for name in self.modules:
+            importlib.import_module(name)
+
+    async def run(self, start_services: Callable[[], None]) -> None:
+        """Warm up once per process; ``start_services`` runs on every server start, once the modules are loaded"""
+        try:
+            if self.ready:
+                self.phase = 'services'
+                start_services()
+                return
+            await self._phases(start_services)
+        except Exception as e:
+            self.errors.append((self.phase or 'starting', f'{type(e).__name__}: {e}'))
+            log.exception('Warm-up failed in the %s phase', self.phase)
+        finally:
+            self.phase = None
+            self.ready = True
+        log.info('Warm-up finished\n%s', self.render())
+
+    async def _phases(self, start_services: Callable[[], None]) -> None:
+        await self._timed('imports', self._import_modules)
+        self.phase = 'services'
+        start_services()
+        from app.data_generator import get_snapshot
+        from app.factory_operations import build_factory_operations
+        from app.financial import build_financial
+        from app.logistics import build_factory_map, build_logistics
+        while True:
+            try:
+                snapshot = await self._timed('snapshot', get_snapshot)
+                break
+            except RuntimeError:
+                # An external source has not published yet
+                log.warning('Warm-up is still waiting for the first data snapshot')
+        await self._timed('figures', lambda: [build(snapshot) for build in (
+            build_factory_operations, build_logistics, build_factory_map, build_financial)])
+
+    async def wait(self) -> None:
+        while not self.ready:
+            await asyncio.sleep(POLL_SECONDS)
+
+    def render(self) -> str:
+        lines = [f'warm-up: {phase} {seconds * 1000:.1f} ms' for phase, seconds in self.phases]
+        lines += [f'warm-up: {phase} failed: {error}' for phase, error in self.errors]
+        if self.phase is not None:
+            lines.append(f'warm-up: {self.phase} (running)')
+        if import_timer.entries:
+            lines.append(import_timer.render())
+        return '\n'.join(lines)
+
+
+import_timer = ImportTimer()
+warm_up = WarmUp()
+
+
+def create() -> None:
+    """Register the readiness and startup report endpoints"""
+
+    @app.get('/ready')
+    def ready():
+        """200 once the warm-up finished, 503 while it is still running, 500 if a phase failed"""
+        if warm_up.errors:
+            failures = '; '.join(f'{phase}: {error}' for phase, error in warm_up.errors)
+            return PlainTextResponse(f'warm-up failed: {failures}', status_code=500)
+        if warm_up.ready:
+            return PlainTextResponse('ready')
+        return PlainTextResponse(f'warming up: {warm_up.phase or "starting"}', status_code=503)
+
+    @app.get('/startup')
+    def startup_report():
+        """Warm-up phase durations and the import times of our modules"""
+        return PlainTextResponse(warm_up.render())
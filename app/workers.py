@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+import logging
+import os
+import re
+import shutil
+import signal
+import sys
+import tempfile
+from typing import List, Optional, Sequence, Tuple
+from app.shared_snapshot import POLL_SECONDS, produce, read_pointer, share_lines
+
+log = logging.getLogger(__name__)
+
+# Dashboard worker processes behind the public port; 1 runs the single-process server
+WORKERS = int(os.environ.get('APP_WORKERS', 1))
+# Workers listen on 127.0.0.1 from this port upwards (default: the public port + 1)
+WORKER_BASE_PORT = int(os.environ['APP_WORKER_BASE_PORT']) if os.environ.get('APP_WORKER_BASE_PORT') else None
+# Cookie pinning a browser, and so its websocket sessions, to the worker that owns them
+COOKIE = 'app_worker'
+COOKIE_PATTERN = re.compile(rb'^cookie:.*?\b' + COOKIE.encode() + rb'=(\d+)', re.IGNORECASE | re.MULTILINE)
+# Longest request or response head the proxy reads before giving up on a connection
+MAX_HEAD = 1 << 16
+READ_CHUNK = 1 << 16
+BAD_GATEWAY = b'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n'
+
+
+class StickyProxy:
+    """Front end on the public port that pins each browser to one worker.
+
+    The proxy reads the head of the first request on a connection and picks
+    the worker named by the ``app_worker`` cookie, or the next worker in turn
+    for a browser without one. It then only relays bytes, so HTTP keep-alive
+    and websocket upgrades pass through untouched. The response to a request
+    without the cookie gets a ``Set-Cookie`` header, so the page's later
+    requests and its websocket reach the worker that built the page.
+    """
+
+    def __init__(self, ports: Sequence[int], host: str = '127.0.0.1'):
+        self.ports = list(ports)
+        self.host = host
+        self._turn = itertools.cycle(range(len(self.ports)))
+
+    def choose(self, head: bytes) -> Tuple[int, bool]:
+        """Worker for a request head, and whether its response has to set the cookie"""
+        match = COOKIE_PATTERN.search(head)
+        if match and int(match.group(1)) < len(self.ports):
+            return int(match.group(1)), False
+        return next(self._turn), True
+
+    @staticmethod
+    def set_cookie(head: bytes, worker: int) -> bytes:
+        """Response head with the worker cookie added after the status line"""
+        status, _, headers = head.partition(b'\r\n')
+        cookie = f'Set-Cookie: {COOKIE}={worker}; Path=/; HttpOnly; SameSite=Lax\r\n'.encode()
+        return status + b'\r\n' + cookie + headers
+
+    @staticmethod
+    async def relay(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while data := await reader.read(READ_CHUNK):
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await client_reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+        worker, assign = self.choose(head)
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.ports[worker], limit=MAX_HEAD)
+        except OSError:
+            # The worker is starting or gone; the browser retries
+            client_writer.write(BAD_GATEWAY)
+            client_writer.close()
+            return
+        writer.write(head)
+        upstream = asyncio.create_task(self.relay(client_reader, writer))
+        if assign:
+            try:
+                client_writer.write(self.set_cookie(await reader.readuntil(b'\r\n\r\n'), worker))
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                upstream.cancel()
+                writer.close()
+                client_writer.close()
+                return
+        await asyncio.gather(upstream, self.relay(reader, client_writer))
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEAD)
+        async with server:
+            await server.serve_forever()
+
+
+def run_producer(directory: str) -> None:
+    """Build (or load) the dataset in this process and publish each snapshot to ``directory``.
+
+    The producer is also the only process that ingests line events, so a
+    socket source is bound once; the workers mirror its line windows.
+    """
+    from app import repository
+    from app.data_generator import snapshot_service
+    from app.ingestion import ingestion
+
+    async def lines():
+        return (await asyncio.to_thread(snapshot_service.get)).line_registry
+
+    async def main() -> None:
+        # The database loader publishes to the local service; its snapshots are shared from there
+        if repository.DATA_SOURCE == 'database':
+            repo = await repository.open_repository()
+            asyncio.create_task(repository.sync_snapshots(repo, snapshot_service))
+        if ingestion.enabled:
+            asyncio.create_task(ingestion.run(lines))
+            asyncio.create_task(share_lines(directory, ingestion.windows))
+        await produce(directory, snapshot_service)
+
+    asyncio.run(main())
+
+
+async def _wait_for_first_snapshot(directory: str, producer: asyncio.subprocess.Process) -> None:
+    while await asyncio.to_thread(read_pointer, directory) is None:
+        if producer.returncode is not None:
+            raise RuntimeError('The snapshot producer exited before publishing a snapshot')
+        await asyncio.sleep(POLL_SECONDS / 4)
+
+
+async def _supervise(script: str, host: str, port: int, workers: int, base_port: int, directory: str) -> None:
+    env = {**os.environ, 'APP_SHARED_SNAPSHOT_DIR': directory}
+    processes: List[asyncio.subprocess.Process] = [
+        await asyncio.create_subprocess_exec(sys.executable, '-m', 'app.workers', directory, env=env)]
+    try:
+        await _wait_for_first_snapshot(directory, processes[0])
+        ports = [base_port + index for index in range(workers)]
+        for index, worker_port in enumerate(ports):
+            processes.append(await asyncio.create_subprocess_exec(sys.executable, script, env={
+                **env, 'APP_WORKER_INDEX': str(index), 'APP_HOST': '127.0.0.1', 'NICEGUI_PORT': str(worker_port)}))
+        proxy = asyncio.create_task(StickyProxy(ports).serve(host, port))
+        log.info('Serving %d workers on port %d', workers, port)
+        # Exit with the first child that does, so the service manager restarts the whole group
+        exits = [asyncio.create_task(process.wait()) for process in processes]
+        await asyncio.wait([proxy, *exits], return_when=asyncio.FIRST_COMPLETED)
+        proxy.cancel()
+    finally:
+        for process in processes:
+            if process.returncode is None:
+                process.terminate()
+        await asyncio.gather(*(process.wait() for process in processes))
+
+
+def supervise(script: str, host: str, port: int, workers: int = WORKERS,
+              base_port: Optional[int] = WORKER_BASE_PORT) -> None:
+    """Run the snapshot producer, ``workers`` copies of ``script`` and the sticky proxy on ``port``"""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else None  # memory-backed where available
+    directory = tempfile.mkdtemp(prefix='dashboard-snapshots-', dir=base)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        asyncio.run(_supervise(script, host, port, workers, base_port or port + 1, directory))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    run_producer(sys.argv[1])
@@ -0,0 +1,171 @@
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Generator, List
+import pytest
+from nicegui.testing import User
+from app.data_generator import DataGenerator, ScaleConfig, snapshot_service
+from app.startup import startup
+
+pytest_plugins = ['nicegui.testing.plugin']
+
+BENCHMARK_DIR = Path(__file__).parent
+# Factory counts every benchmark runs at, e.g. APP_BENCH_SCALES=10,100,500
+SCALES = [int(scale) for scale in os.environ.get('APP_BENCH_SCALES', '10,100,500').split(',')]
+ROUNDS = int(os.environ.get('APP_BENCH_ROUNDS', '5'))
+if ROUNDS < 1:
+    raise pytest.UsageError(f'APP_BENCH_ROUNDS must be at least 1, got {ROUNDS}')
+SEED = 1234
+# Slowdowns smaller than this are timer noise rather than regressions
+MIN_REGRESSION_SECONDS = 0.0005
+
+results: Dict[str, Dict[str, Any]] = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks')
+    group.addoption('--bench-output', default=str(BENCHMARK_DIR / 'results.json'),
+                    help='file the benchmark results are written to')
+    group.addoption('--bench-baseline', default=str(BENCHMARK_DIR / 'baseline.json'),
+                    help='results file to compare against; missing means no comparison')
+    group.addoption('--bench-threshold', type=float, default=float(os.environ.get('APP_BENCH_THRESHOLD', 0.2)),
+                    help='allowed slowdown of the median against the baseline (0.2 = 20%%)')
+    group.addoption('--bench-save-baseline', action='store_true',
+                    help='also write the results to the baseline file')
+    group.addoption('--bench-require-baseline', action='store_true',
+                    help='fail the session when the baseline file is missing')
+
+
+class Bench:
+    """Times a callable over several rounds and records the result under the test's id"""
+
+    def __init__(self, name: str, scale: int):
+        self.name = name
+        self.scale = scale
+
+    def _record(self, samples: List[float]) -> None:
+        results[self.name] = {
+            'scale': self.scale,
+            'rounds': len(samples),
+            'median': statistics.median(samples),
+            'min': min(samples),
+            'mean': statistics.mean(samples),
+        }
+
+    def __call__(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        samples = []
+        result = None
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            samples.append(time.perf_counter() - start)
+        self._record(samples)
+        return result
+
+    def throughput(self, items: int, unit: str = 'items') -> float:
+        """Record ``items`` processed per round as a rate over the median round time"""
+        rate = items / results[self.name]['median']
+        results[self.name][f'{unit}_per_second'] = rate
+        return rate
+
+    async def run_async(self, fn: Callable[[], Awaitable[Any]], setup: Callable[[], Any] = lambda: None) -> Any:
+        """Time ``await fn()``, calling the untimed ``setup`` before every round"""
+        samples = []
+        result = None
+        for _ in range(ROUNDS):
+            setup()
+            start = time.perf_counter()
+            result = await fn()
+            samples.append(time.perf_counter() - start)
+        self._record(samples)
+        return result
+
+
+@pytest.fixture(params=SCALES, ids=lambda scale: f'{scale}-factories')
+def scale(request) -> int:
+    return request.param
+
+
+@pytest.fixture
+def make_generator(scale: int) -> Callable[[], DataGenerator]:
+    return lambda: DataGenerator(seed=SEED, scale=ScaleConfig(factories=scale))
+
+
+@pytest.fixture
+def bench(request, scale: int) -> Bench:
+    return Bench(request.node.name, scale)
+
+
+@pytest.fixture
+def user(user: User, make_generator, monkeypatch) -> Generator[User, None, None]:
+    # Serve a seeded dataset of the benchmark's scale
+    monkeypatch.setattr(snapshot_service, '_generator_factory', make_generator)
+    snapshot_service.invalidate()
+    snapshot_service.get()
+    startup()
+    yield user
+    snapshot_service.invalidate()
+
+
+def compare(current: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Benchmarks whose median got slower than the baseline by more than ``threshold``"""
+    regressions = []
+    for name, result in current.items():
+        reference = baseline.get(name)
+        if reference is None or reference['median'] <= 0:
+            continue
+        change = result['median'] / reference['median'] - 1
+        if change > threshold and result['median'] - reference['median'] > MIN_REGRESSION_SECONDS:
+            regressions.append(f'{name}: {reference["median"] * 1000:.1f} ms -> {result["median"] * 1000:.1f} ms '
+                               f'(+{change:.0%})')
+    return regressions
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not results:
+        return
+    config = session.config
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'rounds': ROUNDS,
+        },
+        'results': dict(sorted(results.items())),
+    }
+    Path(config.getoption('--bench-output')).write_text(json.dumps(report, indent=2))
+    rates = [(name, key, value) for name, result in results.items()
+             for key, value in result.items() if key.endswith('_per_second')]
+    if rates:
+        reporter = config.pluginmanager.get_plugin('terminalreporter')
+        reporter.section('benchmark throughput', sep='-')
+        for name, key, value in rates:
+            reporter.write_line(f'{name}: {value:,.0f} {key.replace("_", " ")}')
+    baseline_path = Path(config.getoption('--bench-baseline'))
+    if config.getoption('--bench-save-baseline'):
+        baseline_path.write_text(json.dumps(report, indent=2))
+        return
+    if not baseline_path.exists():
+        reporter = config.pluginmanager.get_plugin('terminalreporter')
+        required = config.getoption('--bench-require-baseline')
+        reporter.write('\n')
+        reporter.section('benchmark baseline', sep='=', red=required, yellow=not required)
+        reporter.write_line(f'no baseline at {baseline_path}; regressions were not checked. '
+                            'Record one on this machine with --bench-save-baseline.')
+        if required:
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+        return
+
+    regressions = compare(results, json.loads(baseline_path.read_text())['results'],
+                          config.getoption('--bench-threshold'))
+    if regressions:
+        reporter = config.pluginmanager.get_plugin('terminalreporter')
+        reporter.section('benchmark regressions', sep='=', red=True)
+        for line in regressions:
+            reporter.write_line(line)
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
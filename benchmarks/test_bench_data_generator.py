@@ -0,0 +1,39 @@
+import pytest
+from app.data_generator import DataSnapshot
+
+GETTERS = [
+    ('get_kpi_data', (1.5,)),
+    ('get_production_data', ()),
+    ('get_production_frame', ()),
+    ('get_production_totals', ()),
+    ('get_delay_data', ()),
+    ('get_delay_frame', ()),
+    ('get_delay_series', ()),
+    ('get_financial_data', (1.5,)),
+    ('get_financial_frame', (1.5,)),
+    ('get_financial_totals', (1.5,)),
+    ('get_financial_series', (1.5,)),
+    ('get_inventory_data', ()),
+    ('get_quality_metrics', ()),
+    ('get_product_lines', ()),
+    ('get_bottleneck_data', ()),
+]
+
+def test_generator_construction(bench, make_generator):
+    """Time building a full dataset"""
+    data_gen = bench(make_generator)
+
+    assert data_gen.factories
+
+@pytest.mark.parametrize('getter, args', GETTERS, ids=[getter for getter, _ in GETTERS])
+def test_generator_getter(bench, make_generator, getter, args):
+    """Time one DataGenerator getter over the default window"""
+    data_gen = make_generator()
+
+    bench(getattr(data_gen, getter), *args)
+
+def test_snapshot_construction(bench, make_generator):
+    """Time freezing a dataset into a snapshot"""
+    data_gen = make_generator()
+
+    bench(DataSnapshot, data_gen, 1)
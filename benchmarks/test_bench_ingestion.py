@@ -0,0 +1,23 @@
+import asyncio
+import time
+import numpy as np
+from app.ingestion import LineWindows, consume, format_events
+
+# Events per round: about one minute of per-second counts from every line
+SECONDS = 60
+
+def test_ingestion_throughput(bench, make_generator):
+    """Time parsing and windowing a burst of line events; reports sustained events per second"""
+    lines = make_generator().line_registry['id']
+    rng = np.random.default_rng(1)
+    timestamps = time.time() + np.repeat(np.arange(SECONDS), len(lines)) + rng.uniform(0, 1, SECONDS * len(lines))
+    data = format_events(np.tile(lines, SECONDS), timestamps, rng.integers(1, 3, SECONDS * len(lines)))
+
+    async def ingest():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        await consume(reader, LineWindows())
+
+    bench(lambda: asyncio.run(ingest()))
+    bench.throughput(SECONDS * len(lines), 'events')
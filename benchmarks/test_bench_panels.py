@@ -0,0 +1,70 @@
+import asyncio
+import contextvars
+import pytest
+from nicegui.testing import User
+from app import dashboard
+from app.broadcast import broadcast_hub
+from app.data_generator import DataSnapshot
+from app.factory_operations import build_factory_operations
+from app.financial import build_financial
+from app.logistics import build_factory_map, build_logistics
+from app.refresh import RefreshScheduler
+
+PANELS = ['kpis', 'factory_operations', 'logistics', 'financial']
+
+class RecordingScheduler(RefreshScheduler):
+    """Scheduler that keeps a handle on the page and the UI context it was built in"""
+    instances = []
+
+    def __init__(self):
+        super().__init__()
+        self.context = contextvars.copy_context()
+        RecordingScheduler.instances.append(self)
+
+    async def timed_refresh(self, name: str) -> None:
+        # Update functions look up the page's client, so they run in its context
+        await asyncio.create_task(self.refresh(name), context=self.context.copy())
+
+@pytest.fixture
+def scheduler_page(monkeypatch):
+    RecordingScheduler.instances.clear()
+    monkeypatch.setattr(dashboard, 'RefreshScheduler', RecordingScheduler)
+    return RecordingScheduler.instances
+
+@pytest.mark.parametrize('build', [build_factory_operations, build_logistics, build_factory_map, build_financial],
+                         ids=['factory_operations', 'logistics', 'logistics_map', 'financial'])
+def test_panel_build(bench, make_generator, build):
+    """Time computing one panel's payload from a snapshot"""
+    snapshot = DataSnapshot(make_generator(), 1)
+
+    bench(build, snapshot)
+
+def test_cross_filtered_panel_build(bench, make_generator):
+    """Time the logistics payload with a factory and a delay cause selected"""
+    snapshot = DataSnapshot(make_generator(), 1)
+
+    bench(build_logistics, snapshot, selected_factory=1, selected_category='customs')
+
+@pytest.mark.parametrize('build', [build_factory_operations, build_logistics, build_factory_map, build_financial],
+                         ids=['factory_operations', 'logistics', 'logistics_map', 'financial'])
+def test_part_filtered_panel_build(bench, make_generator, build):
+    """Time one panel's payload with a part and a delay cause selected, reaching it through the factories"""
+    snapshot = DataSnapshot(make_generator(), 1)
+
+    bench(build, snapshot, selected_part='Tires', selected_category='customs')
+
+async def test_page_build(bench, user: User):
+    """Time building the whole '/' page"""
+    await user.open('/')  # warm up routes and the snapshot
+
+    await bench.run_async(lambda: user.open('/'))
+
+@pytest.mark.parametrize('panel', PANELS)
+async def test_panel_update(bench, user: User, scheduler_page, panel):
+    """Time one panel's update function end to end, including its figure push"""
+    await user.open('/')
+    scheduler = scheduler_page[-1]
+
+    await bench.run_async(lambda: scheduler.timed_refresh(panel), setup=broadcast_hub.clear)
+
+    assert scheduler.timings[panel].calls >= 1
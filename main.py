@@ -1,12 +1,23 @@
 import os
+from app.warmup import import_timer
+
+# Time our own modules from here on; the report is served on /startup
+import_timer.install()
+
+from app import shared_snapshot
 from app.startup import startup
+from app.workers import WORKERS, supervise
 from nicegui import app, ui
 
-app.on_startup(startup)
-ui.run(
-    host="0.0.0.0",
-    port=int(os.environ.get('NICEGUI_PORT', 8000)),
-    reload=False,
-    storage_secret=os.environ.get('NICEGUI_STORAGE_SECRET', 'STORAGE_SECRET'),
-    title="Created with ♥️ by app.build"
-)
+if WORKERS > 1 and not shared_snapshot.DIRECTORY:
+    # Snapshot producer, worker processes running this script and the sticky proxy on the public port
+    supervise(__file__, host="0.0.0.0", port=int(os.environ.get('NICEGUI_PORT', 8000)))
+else:
+    app.on_startup(startup)
+    ui.run(
+        host=os.environ.get('APP_HOST', "0.0.0.0"),
+        port=int(os.environ.get('NICEGUI_PORT', 8000)),
+        reload=False,
+        storage_secret=os.environ.get('NICEGUI_STORAGE_SECRET', 'STORAGE_SECRET'),
+        title="Created with ♥️ by app.build"
+    )
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from app.broadcast import BroadcastHub
+from app.data_generator import snapshot_service
+
+def build_label(snapshot, selected_factory=None):
+    return {'version': snapshot.version, 'factory': selected_factory}
+
+async def test_concurrent_requests_share_one_computation():
+    """Test that clients asking for the same view at once trigger one build"""
+    hub = BroadcastHub()
+
+    payloads = await asyncio.gather(*(hub.compute('panel', build_label, {'selected_factory': 1}) for _ in range(10)))
+
+    assert hub.computations == 1
+    assert all(payload is payloads[0] for payload in payloads)
+
+async def test_distinct_inputs_are_computed_separately():
+    """Test that each distinct filter combination gets its own payload"""
+    hub = BroadcastHub()
+
+    first = await hub.compute('panel', build_label, {'selected_factory': 1})
+    second = await hub.compute('panel', build_label, {'selected_factory': 2})
+    again = await hub.compute('panel', build_label, {'selected_factory': 1})
+
+    assert hub.computations == 2
+    assert first['factory'] == 1 and second['factory'] == 2
+    assert again is first
+
+async def test_cache_keeps_the_newest_version_and_the_most_recently_used():
+    """Test that a newer snapshot drops older payloads and the cache evicts its least recently used entry"""
+    hub = BroadcastHub(max_entries=2)
+
+    first = await hub.compute('panel', build_label, {'selected_factory': 1})
+    await hub.compute('panel', build_label, {'selected_factory': 2})
+    await hub.compute('panel', build_label, {'selected_factory': 1})
+    await hub.compute('panel', build_label, {'selected_factory': 3})
+    assert await hub.compute('panel', build_label, {'selected_factory': 1}) is first
+    await hub.compute('panel', build_label, {'selected_factory': 2})
+    assert hub.computations == 4 and hub.cached == 2
+
+    snapshot_service.invalidate()
+    newer = await hub.compute('panel', build_label, {'selected_factory': 1})
+
+    assert newer['version'] > first['version']
+    assert hub.cached == 1
+
+async def test_tick_computes_each_distinct_view_once():
+    """Test that a tick fans one computation out to every subscriber of a view"""
+    hub = BroadcastHub()
+    received = []
+    views = [hub.subscribe('panel', build_label, received.append) for _ in range(5)]
+    for view in views[:4]:
+        view.inputs = {'selected_factory': 1}
+    views[4].inputs = {'selected_factory': 2}
+    ticks = []
+    hub.add_tick_listener(lambda: ticks.append(True))
+
+    await hub.tick()
+
+    assert hub.distinct_views == 2
+    assert hub.computations == 2
+    assert len(received) == 5
+    assert ticks == [True]
+
+async def test_closed_views_stop_receiving_pushes():
+    """Test that a disconnected client is no longer pushed to"""
+    hub = BroadcastHub()
+    received = []
+    view = hub.subscribe('panel', build_label, received.append)
+    view.close()
+
+    await hub.tick()
+
+    assert received == []
+    assert hub.distinct_views == 0
+
+async def test_failed_build_propagates_and_is_not_cached():
+    """Test that a failing build raises and is retried on the next request"""
+    hub = BroadcastHub()
+    calls = []
+
+    def flaky(snapshot):
+        calls.append(True)
+        if len(calls) == 1:
+            raise RuntimeError('boom')
+        return {'ok': True}
+
+    with pytest.raises(RuntimeError):
+        await hub.compute('panel', flaky, {})
+    assert await hub.compute('panel', flaky, {}) == {'ok': True}
@@ -0,0 +1,93 @@
+import numpy as np
+from app.clustering import MAX_LEVEL, ClusterIndex, Viewport, project
+from app.data_generator import DataGenerator, DataSnapshot, ScaleConfig
+from app.logistics import build_factory_map, map_viewport
+
+LABELS = ['running', 'delayed', 'maintenance']
+
+def random_index(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    return ClusterIndex(rng.uniform(-60, 70, n), rng.uniform(-180, 180, n), rng.choice(LABELS, n), LABELS)
+
+def test_project_web_mercator():
+    """Test that the equator and prime meridian map to the middle of the unit square"""
+    x, y = project([0.0, 85.05112878], [0.0, -180.0])
+
+    assert np.allclose(x, [0.5, 0.0])
+    assert np.allclose(y, [0.5, 0.0], atol=1e-9)
+
+def test_world_query_keeps_every_point_and_status():
+    """Test that clusters of the whole world add up to all points at every level"""
+    index = random_index()
+    total = index.points(np.arange(20000))['categories'].sum(axis=0)
+
+    for zoom in (0, 2, 5):
+        clusters = index.query(Viewport.from_bounds(-180, -90, 180, 90, zoom))
+        assert clusters['count'].sum() == 20000
+        assert clusters['categories'].sum(axis=0).tolist() == total.tolist()
+
+def test_marker_count_is_bounded():
+    """Test that no viewport yields more clusters than the marker budget"""
+    index = random_index()
+
+    for bounds, zoom in [((-180, -90, 180, 90), 12), ((-20, 30, 40, 60), 6), ((-1, 40, 1, 41), 14)]:
+        viewport = Viewport.from_bounds(*bounds, zoom, max_markers=100)
+        assert viewport.cells <= 100
+        assert len(index.query(viewport)['count']) <= 100
+
+def test_query_only_returns_points_in_view():
+    """Test that a zoomed-in query covers just the points inside its cells"""
+    index = random_index()
+    viewport = Viewport.from_bounds(0, 0, 30, 30, 3)
+    clusters = index.query(viewport)
+
+    assert np.all((clusters['longitude'] >= -23) & (clusters['longitude'] <= 46))
+    assert 0 < clusters['count'].sum() < 20000
+
+def test_viewport_wraps_the_antimeridian():
+    """Test that a view across 180 degrees collects clusters from both edges"""
+    index = ClusterIndex([0.0, 0.0, 0.0], [179.0, -179.0, 0.0], ['running', 'delayed', 'running'], LABELS)
+    viewport = Viewport.from_bounds(170, -10, 190, 10, 6)
+
+    clusters = index.query(viewport)
+
+    assert viewport.x[0] > viewport.x[1]
+    assert sorted(clusters['longitude'].tolist()) == [-179.0, 179.0]
+
+def test_nearby_points_merge_at_low_zoom():
+    """Test that two close points are one cluster when zoomed out and two when zoomed in"""
+    index = ClusterIndex([48.1, 48.2], [11.5, 11.6], ['running', 'delayed'], LABELS)
+    everywhere = (-180, -90, 180, 90)
+
+    zoomed_out = index.query(Viewport.from_bounds(*everywhere, 2))
+    zoomed_in = index.query(Viewport.from_bounds(11, 47.5, 12, 48.5, MAX_LEVEL))
+
+    assert zoomed_out['count'].tolist() == [2]
+    assert zoomed_out['categories'].tolist() == [[1, 1, 0]]
+    assert np.isclose(zoomed_out['latitude'][0], 48.15)
+    assert zoomed_in['count'].tolist() == [1, 1]
+
+def test_map_payload_is_bounded_at_scale():
+    """Test that the map figure holds clusters rather than one marker per factory"""
+    snapshot = DataSnapshot(DataGenerator(seed=5, history_days=3, scale=ScaleConfig(factories=2000)), 1)
+
+    trace = build_factory_map(snapshot)['map']['data'][0]
+    single = build_factory_map(snapshot, selected_factory=7)['map']['data'][0]
+
+    assert len(trace['text']) <= 256
+    assert sum(map(sum, trace['customdata'])) == 2000
+    factory = snapshot.factory_registry.get(7)
+    assert factory is not None and single['text'] == [factory.name]
+
+def test_relayout_updates_the_camera():
+    """Test that map pans and zooms become viewports and other relayouts are ignored"""
+    camera = {'lat': 30, 'lon': 0, 'zoom': 1}
+
+    zoomed = map_viewport(camera, {'mapbox.zoom': 4})
+    panned = map_viewport(camera, {'mapbox.center': {'lat': 48, 'lon': 11}, 'mapbox._derived': {
+        'coordinates': [[5, 52], [17, 52], [17, 44], [5, 44]]}})
+
+    assert camera == {'lat': 48, 'lon': 11, 'zoom': 4}
+    assert zoomed is not None and zoomed.level == 7
+    assert panned == Viewport.from_bounds(5, 44, 17, 52, 4)
+    assert map_viewport(camera, {'xaxis.autorange': True}) is None
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+from app.cube import Dimension, FactTable, build_cube
+from app.data_generator import DataGenerator, DataSnapshot
+from app.financial import build_financial
+from app.logistics import SELECTED_COLOR, build_factory_map, build_logistics
+from app.factory_operations import build_factory_operations
+
+START, END = datetime(2025, 3, 3, 7), datetime(2025, 4, 21, 13)
+
+@pytest.fixture(scope='module')
+def snapshot():
+    return DataSnapshot(DataGenerator(seed=3, history_days=200, end_date=datetime(2025, 7, 1)), 1)
+
+@pytest.fixture(scope='module')
+def delays(snapshot):
+    return pd.DataFrame(snapshot._generator.delay_store.query())
+
+def test_select_matches_a_boolean_mask(snapshot, delays):
+    """Test that bitmap selections OR members within a dimension and AND across dimensions"""
+    table = snapshot.cube['delays']
+    in_range = (delays['date'] >= START) & (delays['date'] < END)
+    cases = [
+        {},
+        {'factory': 3},
+        {'factory': [2, 5], 'category': 'weather'},
+        {'factory': None, 'category': ['customs', 'supplier_issues']},
+        {'factory': 999},
+    ]
+
+    for filters in cases:
+        expected = in_range.copy()
+        for name, column in (('factory', 'factory_id'), ('category', 'category')):
+            if filters.get(name) is not None:
+                expected &= delays[column].isin(np.atleast_1d(filters[name]))
+        rows = table.select(filters, START, END)
+
+        assert len(rows) == expected.sum()
+        assert sorted(table.measures['financial_impact'][rows]) == pytest.approx(
+            sorted(delays.loc[expected, 'financial_impact']))
+
+def test_totals_and_series_match_groupby(snapshot, delays):
+    """Test per-member totals and daily series of a cross-filtered fact table"""
+    matching = delays[(delays['date'] >= START) & (delays['date'] < END) & (delays['factory_id'] == 4)]
+
+    totals = snapshot.get_delay_causes({'factory': 4}, start_date=START, end_date=END)
+    series = snapshot.get_delay_series(start_date=START, end_date=END, filters={'factory': 4, 'category': 'weather'})
+
+    expected = matching.groupby('category')['duration_hours'].sum()
+    assert dict(zip(totals['category'].tolist(), totals['duration_hours'].tolist())) == pytest.approx(
+        {category: expected.get(category, 0.0) for category in totals['category'].tolist()})
+    weather = matching[matching['category'] == 'weather']
+    daily = weather.groupby(weather['date'].dt.floor('D'))['financial_impact'].sum()
+    nonzero = series['count'] > 0
+    assert series['date'][nonzero].tolist() == [day.to_pydatetime() for day in daily.index]
+    assert series['financial_impact'][nonzero] == pytest.approx(daily.to_numpy())
+
+def test_filters_on_missing_dimensions_are_ignored():
+    """Test that a table is not filtered by a dimension it does not have, and unknown members match nothing"""
+    part = Dimension('part', ['Engines', 'Tires'])
+    table = FactTable({'part_name': np.array(['Tires', 'Engines', 'Tires']), 'current_stock': np.array([1, 2, 3])},
+                      {'part': (part, 'part_name')}, ['current_stock'], time_key=None)
+
+    assert table.select({'category': 'weather'}).tolist() == [0, 1, 2]
+    assert table.select({'part': 'Tires'}).tolist() == [0, 2]
+    assert table.select({'part': 'Wheels'}).tolist() == []
+    assert table.totals({}, 'part')['current_stock'].tolist() == [2.0, 4.0]
+
+def test_selected_category_filters_the_trend_and_highlights_its_bar(snapshot):
+    """Test that selecting a delay cause narrows the delay trend and marks its bar"""
+    start_date, end_date = START.strftime('%Y-%m-%d'), END.strftime('%Y-%m-%d')
+    unfiltered = build_logistics(snapshot, None, start_date, end_date)
+    filtered = build_logistics(snapshot, None, start_date, end_date, selected_category='customs')
+
+    bars = filtered['bottlenecks']['data'][0]
+    assert bars['customdata'][bars['marker']['color'].index(SELECTED_COLOR)] == 'customs'
+    assert bars['x'] == unfiltered['bottlenecks']['data'][0]['x']
+    customs = bars['x'][bars['customdata'].index('customs')]
+    assert 0 < len(filtered['delay_trend']['data'][0]['x']) <= customs < sum(bars['x'])
+
+def test_inventory_is_summed_per_part_from_the_snapshot(snapshot):
+    """Test that the inventory chart sums the snapshot inventory per part at the selected factory"""
+    totals = snapshot.get_inventory_totals({'factory': 2})
+    payload = build_factory_operations(snapshot, selected_factory=2, selected_part='Tires')
+
+    expected = {item.part_name: item.current_stock for item in snapshot.get_inventory_data(2)}
+    assert dict(zip(totals['part'].tolist(), totals['current_stock'].tolist())) == expected
+    current = payload['inventory']['data'][0]
+    assert current['x'] == sorted(expected)
+    assert current['marker']['size'][current['x'].index('Tires')] > min(current['marker']['size'])
+
+def columns(**values):
+    return {name: np.array(column) for name, column in values.items()}
+
+def test_selections_reach_other_tables_through_factories():
+    """Test that a part or delay cause filters tables without that dimension to the factories it reaches"""
+    day = datetime(2025, 3, 3)
+    cube = build_cube(
+        [1, 2, 3], ['weather', 'customs'],
+        columns(date=[day] * 3, factory_id=[1, 2, 3], cars_produced=[10, 20, 30]),
+        columns(date=[day] * 2, factory_id=[1, 3], category=['weather', 'customs'],
+                duration_hours=[1, 2], financial_impact=[100, 200]),
+        columns(factory_id=[1, 2, 2], part_name=['Tires', 'Tires', 'Engines'],
+                current_stock=[5, 6, 7], target_stock=[8, 8, 8]))
+    tires, tires_at_2_or_3 = cube.factories({'part': 'Tires'}), cube.factories({'part': 'Tires', 'factory': [2, 3]})
+
+    assert cube.factories({'part': None}) is None
+    assert tires is not None and tires.tolist() == [1, 2]
+    assert tires_at_2_or_3 is not None and tires_at_2_or_3.tolist() == [2]
+    production = cube.resolve({'part': 'Engines'}, 'production')
+    assert cube['production'].totals(production, 'factory')['cars_produced'].tolist() == [0.0, 20.0, 0.0]
+    delays = cube.resolve({'part': 'Tires', 'category': None}, 'delays')
+    assert cube['delays'].totals(delays, 'category')['count'].tolist() == [1, 0]
+    inventory = cube.resolve({'category': 'customs'}, 'inventory', day, datetime(2025, 3, 4))
+    assert cube['inventory'].select(inventory).tolist() == []
+    assert cube.resolve({'factory': 2}, 'inventory') == {'factory': 2}
+
+def test_selected_category_filters_every_panel(snapshot):
+    """Test that a delay cause narrows production, quality, the map and the financial losses"""
+    start_date, end_date = START.strftime('%Y-%m-%d'), END.strftime('%Y-%m-%d')
+    reached = snapshot.get_factory_selection({'category': 'customs'}, START, END)
+    delays = snapshot.get_delay_causes({}, start_date=START, end_date=END)
+
+    production = build_factory_operations(snapshot, None, start_date, end_date, selected_category='customs')
+    assert sorted(production['production']['data'][0]['customdata']) == reached.tolist()
+    assert 0 < len(reached) < len(snapshot.factories)
+    factory_map = build_factory_map(snapshot, start_date=start_date, end_date=end_date, selected_category='customs')
+    assert sum(map(sum, factory_map['map']['data'][0]['customdata'])) == len(reached)
+
+    # Losses are allocated by delay impact, so the causes split the losses of the days with delays
+    unfiltered = snapshot.get_financial_series(start_date=START, end_date=END)
+    overall = snapshot.cube['delays'].series({}, START, END)
+    with_delays = np.isin(unfiltered['date'], overall['date'][overall['count'] > 0])
+    split = sum(snapshot.get_financial_totals(start_date=START, end_date=END, filters={'category': category})[
+        'revenue_lost'] for category in delays['category'].tolist())
+    assert split == pytest.approx(unfiltered['revenue_lost'][with_delays].sum())
+    financial = build_financial(snapshot, 1.0, start_date, end_date, selected_category='customs')
+    customs = snapshot.get_financial_totals(start_date=START, end_date=END, filters={'category': 'customs'})
+    assert 0 < customs['revenue_lost'] < unfiltered['revenue_lost'].sum()
+    assert financial['summary_rows'][1]['value'] == f"${customs['revenue_lost']/1000000:.1f}M"
+
+def test_selection_matching_nothing_empties_the_charts(snapshot):
+    """Test that a cause and part reaching no factory in the range send empty figures rather than none"""
+    selection = {'category': 'customs', 'part': 'Tires'}
+    days = [datetime(2025, 3, 3) + timedelta(days=offset) for offset in range(60)]
+    day = next(day for day in days if not len(snapshot.get_factory_selection(selection, day, day + timedelta(days=1))))
+    date = day.strftime('%Y-%m-%d')
+
+    operations = build_factory_operations(snapshot, None, date, date, selected_part='Tires', selected_category='customs')
+    financial = build_financial(snapshot, 1.0, date, date, selected_category='customs', selected_part='Tires')
+    logistics = build_logistics(snapshot, None, date, date, selected_category='customs', selected_part='Tires')
+
+    figures = [operations['production'], operations['inventory'], financial['revenue'], financial['costs'],
+               logistics['delay_trend']]
+    for figure in figures:
+        assert figure['data'] == []
+        assert figure['layout']['annotations'][0]['text'] == 'No data for the selected range'
+        assert figure['layout']['title']['text'].endswith(f'{day:%b} {day.day}, {day.year}')
+    assert financial['summary_rows'][1]['value'] == '$0.0M'
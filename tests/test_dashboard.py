@@ -1,8 +1,10 @@
+import asyncio
 import pytest
 from nicegui.testing import User
-from nicegui import ui
+from nicegui import events, ui
 from app.data_generator import DataGenerator
 from app.models import Factory, FactoryStatus
+from app.session import sessions
 
 async def test_dashboard_loads(user: User) -> None:
     """Test that the main dashboard loads successfully"""
@@ -55,4 +57,158 @@ async def test_financial_section(user: User) -> None:
     
     # Check financial section
     await user.should_see('Financial Impact & Performance')
-    await user.should_see('Financial Summary')
\ No newline at end of file
+    await user.should_see('Financial Summary')
+
+async def test_factory_filter_refreshes_dependent_panels(user: User) -> None:
+    """Test that changing the factory filter only recomputes panels reading it"""
+    await user.open('/')
+    
+    factory_select = user.find(kind=ui.select, marker='factory-filter').elements.pop()
+    factory_select.set_value(1)
+    
+    await user.should_see('Last refresh: factory_operations', retries=20)
+    await user.should_not_see('financial')
+
+
+async def test_delay_multiplier_slider_is_debounced(user: User) -> None:
+    """Test that dragging the multiplier slider triggers a single refresh of its dependents"""
+    await user.open('/')
+    
+    slider = user.find(ui.slider).elements.pop()
+    for value in (1.5, 2.0, 2.5):
+        slider.set_value(value)
+    
+    await user.should_see('Last refresh: kpis', retries=20)
+    await user.should_see('financial')
+
+async def test_controls_show_restored_preferences(user: User) -> None:
+    """Test that the slider and date pickers start from the stored preferences on the next visit"""
+    await user.open('/')
+    assert user.client is not None
+    session = sessions[user.client]
+    session.flush()
+    session.storage.update({'delay_multiplier': 2.5, 'start_date': '2025-01-06', 'end_date': '2025-02-09'})
+    
+    await user.open('/')
+    assert user.find(ui.slider).elements.pop().value == 2.5
+    assert sorted(picker.value for picker in user.find(ui.date).elements) == ['2025-01-06', '2025-02-09']
+    await user.should_see('2.5x')
+
+async def test_collapsed_section_is_built_on_first_expand(user: User) -> None:
+    """Test that a section the user collapsed is only built once reopened"""
+    await user.open('/')
+    financial_section = next(e for e in user.find(ui.expansion).elements if e.text == 'Financial Impact & Performance')
+    financial_section.set_value(False)
+    
+    # The collapsed state is remembered for the next visit
+    await user.open('/')
+    await user.should_not_see('Financial Summary')
+    
+    financial_section = next(e for e in user.find(ui.expansion).elements if e.text == 'Financial Impact & Performance')
+    financial_section.set_value(True)
+    await user.should_see('Financial Summary', retries=20)
+
+async def test_panels_fill_in_after_skeleton(user: User) -> None:
+    """Test that KPI cards and tables are populated by the background panel tasks"""
+    await user.open('/')
+    
+    # Factory count card is filled in once the KPI task completes
+    await user.should_see('10', retries=20)
+    
+    summary_table = next(t for t in user.find(ui.table).elements if t.row_key == 'metric')
+    for _ in range(20):
+        if summary_table.rows:
+            break
+        await asyncio.sleep(0.1)
+    assert [row['metric'] for row in summary_table.rows][-1] == 'Net Impact'
+    assert 'loading' not in summary_table.props
+
+async def test_time_range_refreshes_time_series_panels(user: User) -> None:
+    """Test that changing the time range recomputes the panels that read it"""
+    await user.open('/')
+    
+    start_picker = user.find(ui.date).elements.pop()
+    start_picker.set_value('2026-01-01')
+    
+    await user.should_see('Last refresh: factory_operations', retries=20)
+    await user.should_not_see('kpis')
+
+def request_table_page(user: User, table: ui.table, **pagination) -> None:
+    """Emit the Quasar ``request`` event a browser sends when paging or sorting a server-side table"""
+    assert user.client is not None
+    with user.client:
+        for listener in table._event_listeners.values():  # pylint: disable=protected-access
+            if listener.type == 'request':
+                arguments = events.GenericEventArguments(sender=table, client=user.client,
+                                                         args={'pagination': {**table.pagination, **pagination}})
+                events.handle_event(listener.handler, arguments)
+
+async def wait_for_rows(table: ui.table, rows: int) -> None:
+    for _ in range(40):
+        if len(table.rows) == rows and 'loading' not in table.props:
+            return
+        await asyncio.sleep(0.05)
+
+async def test_assembly_table_is_paged_on_the_server(user: User) -> None:
+    """Test that the assembly line table only receives the requested page in the requested order"""
+    await user.open('/')
+    
+    table = next(t for t in user.find(ui.table).elements if t.row_key == 'id')
+    await wait_for_rows(table, 8)
+    total = table.pagination['rowsNumber']
+    assert total > 8 and len(table.rows) == 8
+    
+    request_table_page(user, table, page=2, rowsPerPage=8, sortBy='efficiency', descending=True)
+    for _ in range(40):
+        if table.pagination.get('page') == 2 and table.rows[0]['id'] != 1:
+            break
+        await asyncio.sleep(0.05)
+    efficiencies = [float(row['efficiency'].rstrip('%')) for row in table.rows]
+    assert efficiencies == sorted(efficiencies, reverse=True)
+    assert table.pagination['rowsNumber'] == total
+
+def click_chart(user: User, chart: ui.plotly, customdata) -> None:
+    """Emit the ``plotly_click`` event a browser sends when a point carrying ``customdata`` is clicked"""
+    assert user.client is not None
+    with user.client:
+        for listener in chart._event_listeners.values():  # pylint: disable=protected-access
+            if listener.type == 'plotly_click':
+                arguments = events.GenericEventArguments(sender=chart, client=user.client,
+                                                         args={'points': [{'customdata': customdata}]})
+                events.handle_event(listener.handler, arguments)
+
+def chart_titles(user: User) -> dict:
+    """Charts by title, without the date range some titles end with"""
+    titles = {}
+    for chart in user.find(ui.plotly).elements:
+        layout = chart.figure['layout'] if isinstance(chart.figure, dict) and 'layout' in chart.figure else {}
+        titles[(layout.get('title', {}).get('text') or '').split(',')[0]] = chart
+    return titles
+
+async def wait_until(condition) -> None:
+    for _ in range(40):
+        if condition():
+            return
+        await asyncio.sleep(0.05)
+
+async def test_chart_clicks_cross_filter_the_dashboard(user: User) -> None:
+    """Test that clicking a factory bar or a delay cause selects it and a second click clears it"""
+    await user.open('/')
+    await wait_until(lambda: {'Production by Factory', 'Most Common Delay Causes'} <= chart_titles(user).keys())
+    charts = chart_titles(user)
+    
+    factory_select = user.find(kind=ui.select, marker='factory-filter').elements.pop()
+    production = charts['Production by Factory']
+    click_chart(user, production, 3)
+    await wait_until(lambda: len(production.figure['data'][0]['customdata']) == 1 and factory_select.value == 3)
+    assert production.figure['data'][0]['customdata'] == [3]
+    assert factory_select.value == 3
+    
+    category_chip = user.find(kind=ui.chip, marker='selected_category').elements.pop()
+    click_chart(user, charts['Most Common Delay Causes'], 'customs')
+    await user.should_see('Delay cause: Customs', retries=20)
+    assert category_chip.value
+    
+    click_chart(user, charts['Most Common Delay Causes'], 'customs')
+    await wait_until(lambda: not category_chip.value)
+    assert not category_chip.value
@@ -1,5 +1,7 @@
 import pytest
-from app.data_generator import DataGenerator
+import numpy as np
+from datetime import datetime, timedelta
+from app.data_generator import DataGenerator, DataSnapshot, ScaleConfig, SnapshotService
 from app.models import Factory, FactoryStatus, AssemblyLine, DelayCategory
 
 def test_data_generator_initialization():
@@ -149,4 +151,130 @@ def test_bottleneck_data_generation():
     for record in bottleneck_data:
         assert 'category' in record
         assert 'incidents' in record
-        assert record['incidents'] >= 0
\ No newline at end of file
+        assert record['incidents'] >= 0
+
+def test_snapshot_service_reuses_snapshot_within_interval():
+    """Test that the snapshot service builds the dataset once per refresh interval"""
+    service = SnapshotService(refresh_interval=60.0)
+    first = service.get()
+    second = service.get()
+    
+    assert first is second
+    assert first.version == 1
+
+def test_snapshot_service_rebuilds_after_invalidate():
+    """Test that an invalidated snapshot is replaced by a newer version"""
+    service = SnapshotService(refresh_interval=60.0)
+    first = service.get()
+    service.invalidate()
+    second = service.get()
+    
+    assert second is not first
+    assert second.version == first.version + 1
+
+def test_snapshot_reads_are_stable():
+    """Test that repeated reads from one snapshot return the same data"""
+    snapshot = DataSnapshot(DataGenerator(), version=1)
+    
+    assert snapshot.get_production_data() == snapshot.get_production_data()
+    assert snapshot.get_bottleneck_data() == snapshot.get_bottleneck_data()
+    factory_id = snapshot.factories[0].id
+    assert all(r['factory_id'] == factory_id for r in snapshot.get_production_data(factory_id))
+    assert all(i.factory_id == factory_id for i in snapshot.get_inventory_data(factory_id))
+
+def test_snapshot_financial_data_scales_with_multiplier():
+    """Test that snapshot financial data is scaled by the delay multiplier"""
+    snapshot = DataSnapshot(DataGenerator(), version=1)
+    base = snapshot.get_financial_data(1.0)
+    doubled = snapshot.get_financial_data(2.0)
+    
+    assert len(base) == len(doubled)
+    for normal, high in zip(base, doubled):
+        assert high['revenue_lost'] == pytest.approx(normal['revenue_lost'] * 2.0)
+        assert high['date'] == normal['date']
+
+
+def test_production_data_date_range():
+    """Test that production data can be queried over arbitrary ranges of the history"""
+    data_gen = DataGenerator(history_days=120)
+    factory_id = data_gen.factories[0].id
+    start = data_gen.end_date - timedelta(days=90)
+    
+    records = data_gen.get_production_data(factory_id, start, data_gen.end_date)
+    
+    assert len(records) == 90
+    assert all(start <= r['date'] < data_gen.end_date for r in records)
+    assert len(data_gen.get_production_data(factory_id)) == 30
+
+def test_financial_and_delay_data_date_range():
+    """Test that financial and delay data honour an explicit range"""
+    data_gen = DataGenerator(history_days=60)
+    start = data_gen.end_date - timedelta(days=45)
+    end = data_gen.end_date - timedelta(days=40)
+    
+    assert len(data_gen.get_financial_data(1.0, start, end)) == 5
+    assert all(start <= r['date'] < end for r in data_gen.get_delay_data(start_date=start, end_date=end))
+
+def test_columnar_getters_match_record_api():
+    """Test that the DataFrame getters hold the same rows as the list-of-dict getters"""
+    data_gen = DataGenerator()
+
+    production = data_gen.get_production_frame(factory_id=3)
+    assert production.to_dict('records') == data_gen.get_production_data(factory_id=3)
+    assert production['date'].is_monotonic_increasing
+    assert str(production['date'].dtype).startswith('datetime64')
+
+    delays = data_gen.get_delay_frame()
+    assert len(delays) == len(data_gen.get_delay_data())
+    assert set(delays['category']) <= {category.value for category in DelayCategory}
+    assert delays['duration_hours'].between(1, 24).all()
+
+    financial = data_gen.get_financial_frame(2.0)
+    assert financial['revenue_lost'].tolist() == [r['revenue_lost'] for r in data_gen.get_financial_data(2.0)]
+    assert (financial['revenue_lost'] == 2 * data_gen.get_financial_frame()['revenue_lost']).all()
+
+def test_history_covers_every_factory_and_day():
+    """Test that the vectorized history has one production row per factory and day"""
+    data_gen = DataGenerator(history_days=90)
+
+    assert len(data_gen.production_store) == len(data_gen.factories) * 90
+    assert len(data_gen.financial_store) == 90
+    assert (data_gen.production_store.query()['cars_produced'] >= 0).all()
+
+def assert_same_columns(first, second):
+    assert first.keys() == second.keys()
+    for key in first:
+        assert np.array_equal(first[key], second[key])
+
+def test_seeded_generators_produce_identical_data():
+    """Test that the same seed and end date reproduce the same dataset"""
+    end = datetime(2026, 1, 1)
+    first = DataGenerator(seed=42, end_date=end)
+    second = DataGenerator(seed=42, end_date=end)
+
+    assert first.factories == second.factories
+    assert first.assembly_lines == second.assembly_lines
+    assert_same_columns(first.production_store.query(), second.production_store.query())
+    assert_same_columns(first.delay_store.query(), second.delay_store.query())
+    assert first.get_inventory_data() == second.get_inventory_data()
+    assert DataGenerator(seed=43, end_date=end).factories != first.factories
+
+def test_scale_mode_sizes_dataset():
+    """Test that the scale config controls factories, lines and delay volume"""
+    scale = ScaleConfig(factories=150, min_lines_per_factory=6, max_lines_per_factory=6, delay_rate=3.0)
+    data_gen = DataGenerator(history_days=30, seed=1, scale=scale)
+
+    assert len(data_gen.factories) == 150
+    assert len({f.name for f in data_gen.factories}) == 150
+    assert len(data_gen.assembly_lines) == 150 * 6
+    assert len(data_gen.production_store) == 150 * 30
+    assert 0.8 * 150 * 30 * 3 < len(data_gen.delay_store) < 1.2 * 150 * 30 * 3
+
+def test_parallel_shards_match_serial_generation():
+    """Test that generating shards in worker processes gives the same data"""
+    end = datetime(2026, 1, 1)
+    serial = DataGenerator(history_days=30, seed=7, end_date=end, scale=ScaleConfig(factories=130))
+    parallel = DataGenerator(history_days=30, seed=7, end_date=end, scale=ScaleConfig(factories=130, workers=2))
+
+    assert_same_columns(serial.production_store.query(), parallel.production_store.query())
+    assert_same_columns(serial.delay_store.query(), parallel.delay_store.query())
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import timedelta
+from app.data_generator import DataGenerator, DataSnapshot
+from app.downsampling import chart_points, downsample, lttb_indices, minmax_indices
+from app.financial import build_financial
+from app.logistics import build_logistics
+
+def random_walk(n, seed=0):
+    y = np.random.default_rng(seed).normal(size=n).cumsum()
+    y[n // 3] += 1000  # a single large spike
+    return np.arange(n, dtype=float), y
+
+def reference_lttb(x, y, points):
+    """Straightforward per-bucket LTTB to check the vectorized version against"""
+    edges = np.linspace(1, len(y) - 1, points - 1).astype(int)
+    selected, a = [0], 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 1 < points - 2:
+            cx, cy = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected.append(a)
+    return selected + [len(y) - 1]
+
+def test_lttb_matches_reference():
+    """Test that the vectorized LTTB picks the same points as the textbook algorithm"""
+    x, y = random_walk(1100)  # short enough to skip min/max preselection
+
+    assert lttb_indices(x, y, 300).tolist() == reference_lttb(x, y, 300)
+
+@pytest.mark.parametrize('n', [1000, 50000])
+def test_downsampling_keeps_spikes_and_bounds(n):
+    """Test that both methods return at most the target, in order, with endpoints and the spike"""
+    x, y = random_walk(n)
+
+    for rows in (lttb_indices(x, y, 200), minmax_indices(y, 200)):
+        assert len(rows) <= 200
+        assert np.all(np.diff(rows) > 0)
+        assert rows[0] == 0 and rows[-1] == n - 1
+        assert n // 3 in rows
+
+def test_minmax_keeps_every_bucket_extreme():
+    """Test that the global minimum and maximum always survive min/max bucketing"""
+    y = np.random.default_rng(1).normal(size=10001)
+
+    rows = minmax_indices(y, 50)
+
+    assert np.argmin(y) in rows and np.argmax(y) in rows
+
+def test_short_series_are_unchanged():
+    """Test that series within the target are returned whole"""
+    frame = pd.DataFrame({'date': pd.date_range('2024-01-01', periods=30), 'value': range(30)})
+
+    assert downsample(frame, 'date', 'value', 100) is frame
+    assert len(downsample(frame, 'date', 'value', 10)) == 10
+    with pytest.raises(ValueError):
+        downsample(frame, 'date', 'value', 10, method='average')
+
+def test_chart_points_follow_width():
+    """Test that widths are rounded up to shared steps"""
+    assert chart_points(650) == chart_points(790) == 800
+    assert chart_points(1201) == 1400
+    assert chart_points(0) == 200
+
+def test_panels_downsample_long_ranges():
+    """Test that time-series charts never carry more points than requested"""
+    snapshot = DataSnapshot(DataGenerator(history_days=1200), version=1)
+    start = (snapshot.end_date - timedelta(days=1100)).strftime('%Y-%m-%d')
+    end = snapshot.end_date.strftime('%Y-%m-%d')
+
+    revenue = build_financial(snapshot, start_date=start, end_date=end, max_points=300)['revenue']['data'][0]
+    delays = build_logistics(snapshot, start_date=start, end_date=end, max_points=300)['delay_trend']['data'][0]
+    full = build_financial(snapshot, start_date=start, end_date=end, max_points=5000)['revenue']['data'][0]
+
+    assert len(revenue['x']) == 300
+    assert len(delays['x']) <= 300
+    assert len(full['x']) > 1000
@@ -0,0 +1,89 @@
+import asyncio
+import time
+import pytest
+from app.data_generator import DataGenerator, DataSnapshot
+from app.executor import PanelExecutor
+from app.factory_operations import build_factory_operations, query_assembly_lines
+from app.financial import build_financial
+
+def square(value):
+    return value * value
+
+def describe(snapshot, label):
+    return label, snapshot.version, id(snapshot), snapshot.factory_registry['id'].flags.writeable
+
+async def test_thread_executor_runs_function():
+    """Test that the thread executor returns the function result"""
+    executor = PanelExecutor(kind='thread', max_concurrent=2)
+    try:
+        assert await executor.run(square, 7) == 49
+    finally:
+        executor.shutdown()
+
+async def test_process_executor_builds_panel_payload():
+    """Test that panel build functions can run in a process pool"""
+    executor = PanelExecutor(kind='process', max_workers=1)
+    snapshot = DataSnapshot(DataGenerator(), version=1)
+    try:
+        payload = await executor.run_panel(build_financial, snapshot, 1.5)
+    finally:
+        executor.shutdown()
+
+    assert payload['revenue']['layout']['title']['text'].startswith('Daily Lost Revenue Due to Delays, ')
+    assert [row['metric'] for row in payload['summary_rows']] == [
+        'Total Revenue', 'Lost Revenue', 'Total Delay Costs', 'Net Impact'
+    ]
+
+async def test_process_workers_attach_to_each_snapshot_version_once():
+    """Test that pool workers map the snapshot file once per version instead of unpickling it per refresh"""
+    executor = PanelExecutor(kind='process', max_workers=1)
+    generator = DataGenerator(seed=3)
+    try:
+        first = await asyncio.gather(*(executor.run_panel(describe, DataSnapshot(generator, 1), label)
+                                       for label in ('a', 'b')))
+        second = await executor.run_panel(describe, DataSnapshot(generator, 2), 'c')
+        assert executor._publisher is not None
+        published = list(executor._publisher.published)
+    finally:
+        executor.shutdown()
+
+    assert [result[:2] for result in first] == [('a', 1), ('b', 1)]
+    assert first[0][2] == first[1][2] != second[2]
+    assert not first[0][3]  # read-only arrays backed by the mapped file
+    assert published == ['snapshot-00000001.bin', 'snapshot-00000002.bin']
+
+async def test_executor_caps_concurrent_refreshes():
+    """Test that no more than max_concurrent computations run at once"""
+    executor = PanelExecutor(kind='thread', max_workers=8, max_concurrent=2)
+    running = 0
+    peak = 0
+
+    def tracked():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        time.sleep(0.02)
+        running -= 1
+
+    try:
+        await asyncio.gather(*(executor.run(tracked) for _ in range(6)))
+    finally:
+        executor.shutdown()
+
+    assert peak <= 2
+
+def test_unknown_executor_kind_is_rejected():
+    """Test that only thread and process executors are accepted"""
+    with pytest.raises(ValueError):
+        PanelExecutor(kind='gpu')
+
+def test_factory_operations_payload_respects_filter():
+    """Test that the factory operations payload only covers the selected factory"""
+    snapshot = DataSnapshot(DataGenerator(), version=1)
+    factory = snapshot.factories[0]
+    payload = build_factory_operations(snapshot, factory.id)
+    page = query_assembly_lines(snapshot, factory.id)
+
+    assert page['rows']
+    assert all(row['factory'] == factory.name for row in page['rows'])
+    assert list(payload['production']['data'][0]['x']) == [factory.name]
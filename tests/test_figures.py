@@ -0,0 +1,95 @@
+import numpy as np
+import plotly.graph_objects as go
+from nicegui import ui
+from nicegui.testing import User
+from app.figures import FigureUpdater, diff_figures, empty_figure, patch_script
+
+def bar_figure(y, title='Monthly Production by Factory'):
+    fig = go.Figure(go.Bar(x=['Detroit', 'Munich', 'Tokyo'][:len(y)], y=y, marker_color='#3B82F6'))
+    fig.update_layout(title=title, height=400)
+    return fig.to_plotly_json()
+
+def test_first_render_requires_full_figure():
+    """Test that there is nothing to diff against before the first render"""
+    assert diff_figures(None, bar_figure([1, 2, 3])) is None
+
+def test_identical_figures_produce_empty_patch():
+    """Test that an unchanged figure sends nothing"""
+    patch = diff_figures(bar_figure([1, 2, 3]), bar_figure([1, 2, 3]))
+
+    assert patch is not None
+    assert patch == {'extend': {}, 'restyle': {}, 'relayout': {}}
+    assert patch_script(1, patch) == ''
+
+def test_changed_values_become_restyle():
+    """Test that changed trace data is sent as a restyle of that trace only"""
+    patch = diff_figures(bar_figure([1, 2, 3]), bar_figure([1, 5, 3]))
+
+    assert patch is not None
+    assert list(patch['restyle']) == [0]
+    assert list(patch['restyle'][0]) == ['y']
+    assert patch['relayout'] == {}
+    assert 'Plotly.restyle(getHtmlElement(7), {"y": [[1, 5, 3]]}, [0]);' in patch_script(7, patch)
+
+def test_appended_points_become_extend_traces():
+    """Test that pure appends to the data arrays use extendTraces"""
+    old = go.Figure(go.Scatter(x=[1, 2], y=[10, 20])).to_plotly_json()
+    new = go.Figure(go.Scatter(x=[1, 2, 3], y=[10, 20, 30])).to_plotly_json()
+    patch = diff_figures(old, new)
+
+    assert patch is not None
+    assert patch['restyle'] == {}
+    assert np.array_equal(patch['extend'][0]['y'], [30])
+    assert 'Plotly.extendTraces' in patch_script(1, patch)
+
+def test_appended_points_in_typed_arrays_become_extend_traces():
+    """Test that appends are detected in numpy-encoded trace data too"""
+    old = go.Figure(go.Scatter(x=np.arange(3), y=np.array([1.0, 2.0, 3.0]))).to_plotly_json()
+    new = go.Figure(go.Scatter(x=np.arange(4), y=np.array([1.0, 2.0, 3.0, 4.0]))).to_plotly_json()
+    patch = diff_figures(old, new)
+
+    assert patch is not None
+    assert patch['restyle'] == {}
+    assert np.array_equal(patch['extend'][0]['x'], [3])
+    assert np.array_equal(patch['extend'][0]['y'], [4.0])
+
+def test_layout_change_becomes_relayout():
+    """Test that layout-only changes are sent as relayout"""
+    patch = diff_figures(bar_figure([1, 2, 3]), bar_figure([1, 2, 3], title='Weekly Production'))
+
+    assert patch is not None
+    assert patch['restyle'] == {}
+    assert patch['relayout'] == {'title.text': 'Weekly Production'}
+
+def test_structure_change_requires_full_figure():
+    """Test that adding a trace falls back to a full figure update"""
+    old = bar_figure([1, 2, 3])
+    new = go.Figure(old)
+    new.add_trace(go.Scatter(x=[1], y=[1]))
+
+    assert diff_figures(old, new.to_plotly_json()) is None
+
+def test_empty_figure_replaces_the_previous_one():
+    """Test that a chart emptied by its filters is redrawn with its title and a 'No data' note"""
+    empty = empty_figure('Production by Factory, Mar 3, 2025')
+
+    assert diff_figures(bar_figure([1, 2, 3]), empty) is None
+    assert empty['layout']['title']['text'] == 'Production by Factory, Mar 3, 2025'
+    assert empty['layout']['annotations'][0]['text'] == 'No data for the selected range'
+
+async def test_updater_patches_through_javascript(user: User) -> None:
+    """Test that a changed figure is sent as Plotly calls and kept as the chart's figure"""
+    updaters = []
+
+    @ui.page('/chart')
+    def page():
+        updaters.append(FigureUpdater(ui.plotly({})))
+
+    await user.open('/chart')
+    updater = updaters.pop()
+    # Plain figure dicts, as the panel builders send
+    updater.update({'data': [{'type': 'bar', 'y': [1, 2, 3]}], 'layout': {}})
+    updater.update({'data': [{'type': 'bar', 'y': [1, 5, 3]}], 'layout': {}})
+
+    assert (updater.full_updates, updater.patch_updates) == (1, 1)
+    assert updater.chart.figure == {'data': [{'type': 'bar', 'y': [1, 5, 3]}], 'layout': {}}
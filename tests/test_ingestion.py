@@ -0,0 +1,203 @@
+import asyncio
+import time
+import numpy as np
+import pytest
+from nicegui.testing import User
+from app.data_generator import DataGenerator, DataSnapshot, snapshot_service
+from app.factory_operations import query_assembly_lines
+from app.ingestion import (IngestionService, LineWindows, consume, format_events, line_windows, live_line_columns,
+                           parse_events, report_output, simulate, tail_file)
+from app.kpis import KPIEngine
+
+WINDOWS = {'short': 5, 'medium': 20, 'long': 60}
+
+def reference_sums(events, now, span, lines, started):
+    line_ids, timestamps, counts = (np.array(values) for values in zip(*events))
+    slots = np.floor(timestamps).astype(int)
+    counted = (slots > now - span) & (slots <= now) & (slots >= started)
+    return np.array([counts[(line_ids == line) & counted].sum() for line in lines])
+
+def filled_rates(windows, line_ids, window, now):
+    """Rates of a window that has filled, as a list"""
+    rates = windows.rates(np.array(list(line_ids)), window, now=now)
+    assert rates is not None
+    return rates.tolist()
+
+async def unused_lines():
+    raise AssertionError('Socket sources do not read the line registry')
+
+def test_rolling_windows_match_a_full_recount():
+    """Test the running window sums against recounting every event, with clock jumps, late and early events"""
+    rng = np.random.default_rng(4)
+    windows = LineWindows(WINDOWS)
+    events, now = [], 1000
+    windows.advance(now)
+    for step in range(300):
+        now += int(rng.choice([0, 1, 1, 2, 7, 30, 70]))
+        size = int(rng.integers(0, 4))
+        batch = list(zip(rng.integers(0, 6, size).tolist(), (now - rng.uniform(0, 80, size)).tolist(),
+                         rng.integers(1, 4, size).tolist()))
+        if batch:
+            windows.add(*(np.array(values) for values in zip(*batch)))
+        events += batch
+        if events and step % 10 == 0:
+            for name, span in WINDOWS.items():
+                rates = windows.rates(np.arange(6), name, now=now)
+                if now - 1000 + 1 < span:
+                    assert rates is None
+                    continue
+                assert rates is not None
+                assert rates * span / 3600 == pytest.approx(reference_sums(events, now, span, range(6), 1000))
+
+def test_rates_wait_for_a_full_window_and_skip_events_before_the_start():
+    """Test that a window has no rate until it has filled, early events are not counted, unknown lines read zero"""
+    windows = LineWindows(WINDOWS)
+    windows.advance(100)
+    windows.add(np.array([3, 3, 3]), np.array([99.0, 100.0, 109.5]), np.array([5, 2, 1]))
+
+    assert windows.rates(np.array([3]), 'long', now=109) is None
+    assert filled_rates(windows, [3], 'short', now=109) == [1 / 5 * 3600]
+    assert filled_rates(windows, [3, 7], 'long', now=159) == [3 / 60 * 3600, 0.0]
+    assert filled_rates(windows, [3], 'long', now=1000) == [0.0]
+    assert windows.events == 2
+
+def test_parse_events_skips_malformed_lines():
+    """Test the wire format round trip and that a bad line does not drop the rest of the batch"""
+    data = format_events(np.array([1, 2]), np.array([10.5, 11.25]), np.array([3, 4]))
+
+    line_ids, timestamps, counts = parse_events(data + b'garbage\n12.0 3 1\n')
+
+    assert line_ids.tolist() == [1, 2, 3]
+    assert timestamps.tolist() == [10.5, 11.25, 12.0]
+    assert counts.tolist() == [3, 4, 1]
+
+async def test_consume_joins_events_split_across_reads():
+    """Test that events cut in half by the transport are counted once"""
+    windows = LineWindows(WINDOWS)
+    reader = asyncio.StreamReader()
+    data = format_events(np.arange(50), np.full(50, 500.0), np.ones(50, dtype=int))
+    for start in range(0, len(data), 7):
+        reader.feed_data(data[start:start + 7])
+    reader.feed_eof()
+
+    await consume(reader, windows)
+
+    assert windows.events == 50
+    assert filled_rates(windows, range(50), 'short', now=504) == [1 / 5 * 3600] * 50
+
+async def test_file_and_socket_sources(tmp_path):
+    """Test tailing appended file data and reading events from a Unix socket"""
+    path = tmp_path / 'lines.log'
+    path.write_bytes(b'1.0 9 9\n')  # written before the tail starts, so not counted
+    windows = LineWindows(WINDOWS)
+    reader = asyncio.StreamReader()
+    tasks = [asyncio.create_task(tail_file(str(path), reader, interval=0.01)),
+             asyncio.create_task(consume(reader, windows))]
+    socket_windows = LineWindows(WINDOWS)
+    socket_path = str(tmp_path / 'lines.sock')
+    service = IngestionService(f'unix:{socket_path}', socket_windows)
+    tasks.append(asyncio.create_task(service.run(unused_lines)))
+    try:
+        await asyncio.sleep(0.05)
+        with path.open('ab') as file:
+            file.write(format_events(np.array([4]), np.array([2.0]), np.array([5])))
+        _, writer = await asyncio.open_unix_connection(socket_path)
+        # The service started its windows when it began listening, so only newer events count
+        now = time.time()
+        writer.write(format_events(np.array([6, 6, 6]), np.array([now - 3600, now, now]), np.array([9, 1, 2])))
+        await writer.drain()
+        writer.close()
+        for _ in range(100):
+            if windows.events and socket_windows.events:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    assert windows.events == 1 and filled_rates(windows, [4, 9], 'long', now=61) == [5 / 60 * 3600, 0.0]
+    assert socket_windows.events == 2 and socket_windows.sums[6].tolist() == [3, 3, 3]
+    with pytest.raises(ValueError):
+        await IngestionService('kafka:lines').run(unused_lines)
+
+async def test_simulator_emits_counts_around_each_line_rate():
+    """Test that the simulator feeds events for the lines of the current registry"""
+    snapshot = DataSnapshot(DataGenerator(seed=2), 1)
+    windows = LineWindows(WINDOWS)
+    reader = asyncio.StreamReader()
+
+    async def lines():
+        return snapshot.line_registry
+
+    tasks = [asyncio.create_task(simulate(reader, lines, interval=60, seed=1)),
+             asyncio.create_task(consume(reader, windows))]
+    await asyncio.sleep(0.05)
+    for task in tasks:
+        task.cancel()
+
+    assert 0 < windows.events <= len(snapshot.line_registry)
+    assert set(np.flatnonzero(windows.sums[:, 2]).tolist()) <= set(snapshot.line_registry['id'].tolist())
+
+def test_line_table_reads_live_rates():
+    """Test that live rates replace the static output rate and efficiency for display, filters and sorting"""
+    snapshot = DataSnapshot(DataGenerator(seed=2), 1)
+    lines = snapshot.line_registry
+    windows = LineWindows()
+    windows.advance(100)
+    # Every line produces its id in cars during one minute, after 15 minutes of uptime
+    windows.add(lines['id'], np.full(len(lines), 1000.0), lines['id'])
+    live = live_line_columns(lines, windows, now=1059)
+
+    result = query_assembly_lines(snapshot, rows_per_page=5, sort_by='rate_1m', descending=True, live=live)
+
+    top = lines['id'].max()
+    assert result['rows'][0]['id'] == top
+    assert result['rows'][0]['rate_1m'] == f'{top * 60} cars/hour'
+    assert result['rows'][0]['output_rate'] == f'{top * 4} cars/hour'  # one minute of the 15-minute window
+    expected = top * 4 / lines['target_rate'][lines.row_of(top)] * 100
+    assert result['rows'][0]['efficiency'] == f'{expected:.1f}%'
+    assert query_assembly_lines(snapshot)['rows'][0]['rate_1m'] == '—'
+
+def test_live_columns_appear_as_their_windows_fill():
+    """Test that the table gets no live figures until a window has filled, and the output rate with its window"""
+    lines = DataSnapshot(DataGenerator(seed=2), 1).line_registry
+    windows = LineWindows()
+    windows.advance(100)
+    windows.add(lines['id'], np.full(len(lines), 100.0), lines['target_rate'])
+
+    assert live_line_columns(lines, windows, now=120) is None
+    filling = live_line_columns(lines, windows, now=200)
+    assert filling is not None and set(filling) == {'rate_1m'}
+    live = live_line_columns(lines, windows, now=999)
+    assert live is not None and set(live) == {'rate_1m', 'rate_15m', 'output_rate', 'efficiency'}
+    assert live['efficiency'] == pytest.approx(np.full(len(lines), 400.0))
+
+def test_live_output_reaches_the_kpi_engine_per_factory():
+    """Test that output events carry each factory's live output, and efficiency follows them"""
+    snapshot = DataSnapshot(DataGenerator(seed=2), 1)
+    lines = snapshot.line_registry
+    engine = KPIEngine.from_data(snapshot.factory_registry, snapshot.kpi_delays())
+    windows = LineWindows()
+    windows.advance(100)
+    windows.add(lines['id'], np.full(len(lines), 1000.0), lines['target_rate'] / 4)
+
+    report_output(engine, lines, windows, now=100 + 899)
+
+    kpis = engine.read()
+    assert kpis.live_output == pytest.approx(lines['target_rate'].sum())
+    assert kpis.production_efficiency == pytest.approx(1.0)
+    factory_id = int(lines['factory_id'][0])
+    assert engine.outputs[factory_id][1] == lines['target_rate'][lines['factory_id'] == factory_id].sum()
+
+async def test_kpi_cards_show_live_output(user: User, monkeypatch) -> None:
+    """Test that the KPI cards report the streamed line output"""
+    monkeypatch.setattr(snapshot_service, 'kpis', KPIEngine())
+    snapshot_service.invalidate()
+    now = time.time()
+    line_windows.advance(now - 3600)
+    line_windows.add(np.array([1]), np.array([now]), np.array([1]))
+    report_output(snapshot_service.kpis, snapshot_service.get().line_registry)
+
+    await user.open('/')
+
+    await user.should_see('Live:', retries=20)
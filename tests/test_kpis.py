@@ -0,0 +1,92 @@
+import threading
+import numpy as np
+import pytest
+from app.data_generator import DataGenerator
+from app.kpis import KPIEngine
+
+def test_engine_matches_the_multiplier_model_at_its_baseline():
+    """Test that a freshly built engine reads the same KPIs as recomputing them from the registry"""
+    generator = DataGenerator(seed=5)
+    registry = generator.factory_registry
+
+    for multiplier in (0.5, 1.0, 2.5):
+        kpis = generator.get_kpi_data(multiplier)
+        assert kpis.total_cars_produced == int(registry['current_production'].sum()) * 30
+        assert kpis.total_factories == len(registry)
+        assert kpis.on_time_delivery_rate == max(0.7, 0.95 - (multiplier - 1.0) * 0.2)
+        assert kpis.lost_revenue == 15000000 * multiplier
+        assert kpis.production_efficiency == pytest.approx(registry['efficiency'].mean())
+
+def test_corrections_and_retractions_match_a_full_recount():
+    """Test running aggregates against recomputing them from the surviving reports"""
+    rng = np.random.default_rng(7)
+    engine = KPIEngine()
+    reports = {}
+    for _ in range(500):
+        factory_id = int(rng.integers(0, 20))
+        if rng.random() < 0.2:
+            engine.retract_factory(factory_id)
+            reports.pop(factory_id, None)
+        else:
+            report = (int(rng.integers(500, 1500)), float(rng.uniform(0.8, 0.95)), float(rng.uniform(1, 3)))
+            engine.report_factory(factory_id, *report[:2], weight=report[2])
+            reports[factory_id] = report
+
+    production, efficiency, weight = (np.array(values) for values in zip(*reports.values()))
+    kpis = engine.read()
+    assert kpis.total_factories == len(reports)
+    assert kpis.total_cars_produced == production.sum() * 30
+    assert kpis.production_efficiency == pytest.approx(np.average(efficiency, weights=weight))
+    assert sum(engine.statuses.values()) == len(reports)
+
+def test_sync_applies_a_new_dataset_as_events():
+    """Test that syncing a changed dataset reads like a fresh engine over it, keeping the live output"""
+    first, second = DataGenerator(seed=5), DataGenerator(seed=6)
+    engine = KPIEngine.from_data(first.factory_registry, first.kpi_delays())
+    engine.report_output(1, 900.0, 1000.0)
+    engine.report_output(2, 0.0, 0.0)
+
+    engine.sync(second.factory_registry, second.kpi_delays(), version=2)
+
+    fresh = KPIEngine.from_data(second.factory_registry, second.kpi_delays())
+    kpis = engine.read(1.5)
+    assert kpis.model_dump(exclude={'production_efficiency', 'live_output'}) == \
+        fresh.read(1.5).model_dump(exclude={'production_efficiency', 'live_output'})
+    assert engine.efficiency.value == pytest.approx(fresh.efficiency.value)
+    assert kpis.production_efficiency == pytest.approx(0.9) and kpis.live_output == pytest.approx(900.0)
+    assert sum(kpis.factory_statuses.values()) == len(second.factory_registry) and engine.version == 2
+
+def test_delay_and_status_events_move_the_delay_kpis():
+    """Test that delays above the baseline lower on-time delivery and raise lost revenue, and undo cleanly"""
+    engine = KPIEngine()
+    engine.report_factory(1, 1000, 0.9, 'running')
+    engine.add_delay(10.0, 1000000.0)
+    engine.set_baseline()
+    baseline = engine.read(1.1)
+
+    engine.add_delay(10.0, 1000000.0)
+    doubled = engine.read(1.1)
+    engine.correct_delay((10.0, 1000000.0), (5.0, 500000.0))
+    engine.retract_delay(5.0, 500000.0)
+    engine.set_status(1, 'maintenance')
+
+    assert doubled.lost_revenue == pytest.approx(2 * baseline.lost_revenue)
+    assert doubled.on_time_delivery_rate == pytest.approx(0.95 - (2 * 1.1 - 1.0) * 0.2)
+    assert engine.read(1.1) == baseline.model_copy(update={'factory_statuses': {'maintenance': 1}})
+    assert baseline.factory_statuses == {'running': 1}
+
+def test_delay_events_wait_for_the_engine_lock():
+    """Test that delay events are applied under the lock sync and read hold"""
+    engine = KPIEngine()
+
+    with engine._lock:
+        events = [threading.Thread(target=engine.add_delay, args=(2.0, 100.0)),
+                  threading.Thread(target=engine.correct_delay, args=((2.0, 100.0), (3.0, 50.0)))]
+        events[0].start()
+        events[0].join(0.05)
+        assert events[0].is_alive() and engine.delays == 0
+    events[0].join()
+    events[1].start()
+    events[1].join()
+
+    assert (engine.delays, engine.delay_hours, engine.delay_impact) == (1, 3.0, 50.0)
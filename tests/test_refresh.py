@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+from app.refresh import CoalescingUpdateQueue, RefreshScheduler
+
+def make_scheduler(calls):
+    scheduler = RefreshScheduler()
+    scheduler.register('kpis', lambda: calls.append('kpis'), inputs={'delay_multiplier'})
+    scheduler.register('factory_operations', lambda: calls.append('factory_operations'), inputs={'selected_factory'})
+    scheduler.register('financial', lambda: calls.append('financial'), inputs={'delay_multiplier', 'start_date', 'end_date'})
+    return scheduler
+
+async def test_notify_runs_only_dependent_panels():
+    """Test that a change recomputes only the panels reading that input"""
+    calls = []
+    scheduler = make_scheduler(calls)
+
+    await scheduler.notify('delay_multiplier')
+
+    assert calls == ['kpis', 'financial']
+
+async def test_notify_unknown_input_runs_nothing():
+    """Test that an input no panel reads triggers no recomputation"""
+    calls = []
+    scheduler = make_scheduler(calls)
+
+    assert await scheduler.notify('unused_input') == {}
+    assert calls == []
+
+async def test_refresh_all_runs_every_panel():
+    """Test that a full refresh recomputes every registered panel"""
+    calls = []
+    scheduler = make_scheduler(calls)
+
+    await scheduler.refresh_all()
+
+    assert sorted(calls) == ['factory_operations', 'financial', 'kpis']
+
+async def test_async_panels_refresh_concurrently():
+    """Test that coroutine panels are awaited and run side by side"""
+    scheduler = RefreshScheduler()
+
+    async def slow_panel():
+        await asyncio.sleep(0.05)
+
+    for name in ('a', 'b', 'c'):
+        scheduler.register(name, slow_panel, inputs={'selected_factory'})
+    start = asyncio.get_running_loop().time()
+    durations = await scheduler.notify('selected_factory')
+
+    assert set(durations) == {'a', 'b', 'c'}
+    assert asyncio.get_running_loop().time() - start < 0.12
+
+async def test_timings_are_recorded_per_panel():
+    """Test that per-panel timings accumulate across runs"""
+    calls = []
+    scheduler = make_scheduler(calls)
+
+    await scheduler.notify('selected_factory')
+    await scheduler.notify('selected_factory')
+
+    timing = scheduler.timings['factory_operations']
+    assert timing.calls == 2
+    assert timing.total >= timing.last >= 0
+    assert scheduler.timings['kpis'].calls == 0
+    assert list(scheduler.last_run) == ['factory_operations']
+    assert 'factory_operations' in scheduler.describe_last_run()
+
+async def test_queue_applies_only_latest_value_after_debounce():
+    """Test that a burst of submissions collapses into one update with the last value"""
+    applied = []
+    queue = CoalescingUpdateQueue(applied.append, debounce=0.05)
+
+    for step in range(25):
+        queue.submit(0.5 + step * 0.1)
+    await queue.flush()
+
+    assert applied == [pytest.approx(2.9)]
+    assert queue.submitted == 25
+    assert queue.applied == 1
+
+async def test_queue_replaces_pending_value_while_in_flight():
+    """Test that values submitted during a running update replace each other"""
+    applied = []
+
+    async def slow_update(value):
+        applied.append(value)
+        await asyncio.sleep(0.05)
+
+    queue = CoalescingUpdateQueue(slow_update, debounce=0)
+    queue.submit(1)
+    await asyncio.sleep(0.01)  # first update is now in flight
+    queue.submit(2)
+    queue.submit(3)
+    await queue.flush()
+
+    assert applied == [1, 3]
+
+async def test_queue_survives_failing_handler():
+    """Test that a failing update does not block later submissions"""
+    applied = []
+
+    def flaky_update(value):
+        if value == 'bad':
+            raise ValueError(value)
+        applied.append(value)
+
+    queue = CoalescingUpdateQueue(flaky_update, debounce=0)
+    queue.submit('bad')
+    await queue.flush()
+    queue.submit('good')
+    await queue.flush()
+
+    assert applied == ['good']
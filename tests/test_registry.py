@@ -0,0 +1,92 @@
+import numpy as np
+from app.data_generator import DataGenerator, ScaleConfig
+from app.models import FactoryStatus
+from app.registry import AssemblyLineRegistry, FactoryRegistry, region_of
+
+def test_id_lookup_is_vectorized():
+    """Test that ids map to rows singly and in bulk, with -1 for unknown ids"""
+    registry = DataGenerator(seed=3).factory_registry
+
+    assert int(registry.row_of(4)) == 3
+    assert registry.row_of([10, 1, 99, -5]).tolist() == [9, 0, -1, -1]
+    factory = registry.get(2)
+    assert factory is not None and factory.name == 'Munich Production'
+    assert registry.get(99) is None
+
+def test_factory_groupings_match_models():
+    """Test that status and region groupings agree with a scan over the models"""
+    data_gen = DataGenerator(seed=5, scale=ScaleConfig(factories=80))
+    registry = data_gen.factory_registry
+
+    for status in FactoryStatus:
+        expected = [f.id for f in data_gen.factories if f.status == status]
+        assert registry['id'][registry.select(status=status.value)].tolist() == expected
+    americas = registry.select(region='Americas')
+    assert (registry['longitude'][americas] < -30).all()
+    assert registry.select(factory_id=7, region='APAC').tolist() == []
+    assert registry.select(factory_id=3, region='APAC').tolist() == [2]
+
+def test_lines_join_factory_columns():
+    """Test that lines are grouped by factory and joined to factory names by row"""
+    data_gen = DataGenerator(seed=11)
+    lines = data_gen.line_registry
+
+    rows = lines.select(factory_id=3)
+
+    assert lines['factory_id'][rows].tolist() == [line.factory_id for line in data_gen.assembly_lines
+                                                  if line.factory_id == 3]
+    assert set(lines.factory_column('name', rows).tolist()) == {'Tokyo Manufacturing'}
+    assert len(lines.select()) == len(data_gen.assembly_lines)
+
+def test_registry_round_trips_models():
+    """Test that a registry built from models gives back equal models"""
+    data_gen = DataGenerator(seed=2)
+    factories = FactoryRegistry.from_models(data_gen.factories)
+    lines = AssemblyLineRegistry.from_models(data_gen.assembly_lines, factories)
+
+    assert factories.models() == data_gen.factories
+    assert lines.models(np.array([0, 2])) == [data_gen.assembly_lines[0], data_gen.assembly_lines[2]]
+
+def test_line_query_sorts_filters_and_pages():
+    """Test that a line query returns one page of the filtered, sorted rows and the full match count"""
+    lines = DataGenerator(seed=4, scale=ScaleConfig(factories=40)).line_registry
+    efficiency = lines['efficiency']
+    matching = np.flatnonzero((efficiency >= 80) & (efficiency < 95))
+
+    rows, total = lines.query(efficiency=(80, 95), sort_by='efficiency', descending=True, offset=5, limit=10)
+
+    assert total == len(matching)
+    assert len(rows) == 10
+    expected = matching[np.argsort(-efficiency[matching], kind='stable')]
+    assert efficiency[rows].tolist() == efficiency[expected[5:15]].tolist()
+
+def test_line_query_combines_factory_and_status():
+    """Test that factory and status filters intersect and unknown sort keys keep row order"""
+    lines = DataGenerator(seed=4, scale=ScaleConfig(factories=40)).line_registry
+    status = lines['status'][0]
+
+    rows, total = lines.query(factory_id=1, status=status)
+
+    assert total == len(rows)
+    assert rows.tolist() == sorted(rows.tolist())
+    assert set(rows.tolist()) == set(np.intersect1d(lines.select(1), lines.select(status=status)).tolist())
+    assert lines.query(factory_id=1, status=status, offset=total)[0].size == 0
+
+def test_line_query_matches_a_full_scan():
+    """Test that group-based filtering and sorting agree with a mask over every row, live columns included"""
+    lines = DataGenerator(seed=6, scale=ScaleConfig(factories=40)).line_registry
+    status = lines['status'][0]
+    live = {'rate_1m': np.random.default_rng(1).integers(0, 5, len(lines)).astype(np.float64)}
+    mask = (lines['factory_id'] == 2) & (lines['status'] == status) & (lines['efficiency'] >= 70)
+
+    for sort_by, values in (('efficiency', lines['efficiency']), ('line', lines['name']), ('rate_1m', live['rate_1m'])):
+        expected = np.argsort(values, kind='stable')
+        expected = expected[mask[expected]][::-1]
+        rows, total = lines.query(factory_id=2, status=status, efficiency=(70, 1000), sort_by=sort_by,
+                                  descending=True, live=live)
+        assert total == mask.sum()
+        assert rows.tolist() == expected.tolist()
+
+def test_region_of_longitude():
+    """Test the coarse region split"""
+    assert region_of(np.array([-83.0, 11.6, 139.7])).tolist() == ['Americas', 'EMEA', 'APAC']
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime
+from app.data_generator import DataGenerator, DataSnapshot
+from app.factory_operations import build_factory_operations
+from app.financial import build_financial
+from app.logistics import build_logistics
+from app.rollups import Rollup, RollupSet, bucket_numbers, bucket_starts
+
+START, END = datetime(2025, 3, 1), datetime(2025, 5, 17)
+
+@pytest.fixture(scope='module')
+def generator():
+    return DataGenerator(seed=11, history_days=200, end_date=datetime(2025, 7, 1))
+
+def test_bucket_numbering():
+    """Test that buckets start at the hour, day, Monday and first of the month"""
+    timestamp = np.datetime64('2025-05-15T13:45')  # a Thursday
+
+    starts = {resolution: bucket_starts(bucket_numbers([timestamp], resolution), resolution)[0]
+              for resolution in ('hour', 'day', 'week', 'month')}
+
+    assert starts == {
+        'hour': np.datetime64('2025-05-15T13:00'),
+        'day': np.datetime64('2025-05-15'),
+        'week': np.datetime64('2025-05-12'),
+        'month': np.datetime64('2025-05-01'),
+    }
+    with pytest.raises(ValueError):
+        Rollup('fortnight', ['value'])
+
+def test_totals_match_raw_groupby(generator):
+    """Test that prefix-sum totals equal summing the raw rows of the range"""
+    raw = pd.DataFrame(generator.production_store.query(START, END))
+    expected = raw.groupby('factory_id')['cars_produced'].sum()
+
+    totals = generator.get_production_totals(None, START, END)
+
+    assert totals['factory_id'].tolist() == expected.index.tolist()
+    assert totals['cars_produced'].tolist() == expected.tolist()
+    assert generator.get_production_totals(4, START, END)['cars_produced'].tolist() == [expected[4]]
+
+def test_chunked_adds_match_a_batch_build(generator):
+    """Test that adding records in chunks, including late ones, gives the same rollup"""
+    columns = generator.delay_store.query()
+    batch = RollupSet.from_columns(columns, 'category', ['financial_impact'])
+    chunked = RollupSet(['financial_impact'])
+    # Newest chunk first, so later chunks land before the origin and inside the history
+    for rows in reversed(np.array_split(np.arange(len(columns['date'])), 7)):
+        chunked.add(columns['date'][rows], columns['category'][rows],
+                        {'financial_impact': columns['financial_impact'][rows]})
+
+    for resolution in ('day', 'week', 'month'):
+        assert chunked.rollups[resolution].origin == batch.rollups[resolution].origin
+        for key in batch.keys:
+            expected = batch.series(START, END, key=key)
+            actual = chunked.series(START, END, key=key)
+            assert np.allclose(actual['financial_impact'], expected['financial_impact'])
+
+def test_series_picks_the_finest_resolution_that_fits(generator):
+    """Test that long ranges are served from coarser rollups"""
+    start, end = datetime(2025, 3, 3), datetime(2025, 5, 26)  # twelve whole weeks
+    daily = generator.get_delay_series(start_date=start, end_date=end, max_buckets=100)
+    weekly = generator.get_delay_series(start_date=start, end_date=end, max_buckets=20)
+    raw = generator.delay_store.query(start, end)
+
+    assert len(daily['date']) == 84
+    assert len(weekly['date']) == 12
+    assert daily['count'].sum() == weekly['count'].sum() == len(raw['date'])
+    assert np.isclose(weekly['financial_impact'].sum(), raw['financial_impact'].sum())
+    assert generator.delay_rollup.resolution_for(start, end, max_buckets=1) == 'month'
+
+def test_edge_buckets_are_clipped_to_the_range(generator):
+    """Test that weeks and months overlapping the range ends only sum the records inside it"""
+    start, end = datetime(2025, 3, 5), datetime(2025, 5, 21)  # Wednesdays
+    raw = pd.DataFrame(generator.delay_store.query(start, end))
+
+    for max_buckets in (20, 5):
+        series = generator.get_delay_series(start_date=start, end_date=end, max_buckets=max_buckets)
+        second = series['date'][1].item()
+
+        assert series['count'].sum() == len(raw)
+        assert np.isclose(series['financial_impact'].sum(), raw['financial_impact'].sum())
+        assert series['count'][0] == (raw['date'] < second).sum()
+
+def test_chart_titles_follow_the_range_and_resolution(generator):
+    """Test that range totals name their range and trends the resolution they are drawn at"""
+    snapshot = DataSnapshot(generator, 1)
+
+    production = build_factory_operations(snapshot, None, '2025-03-03', '2025-05-25')['production']
+    costs = build_financial(snapshot, 1.0, '2025-03-03', '2025-05-25')['costs']
+    daily = build_logistics(snapshot, None, '2025-03-03', '2025-05-25')['delay_trend']
+    weekly = build_logistics(snapshot, None, '2025-03-03', '2025-05-25', max_points=5)['delay_trend']
+    revenue = build_financial(snapshot, 1.0, '2025-03-03', '2025-05-25', max_points=5)['revenue']
+
+    assert production['layout']['title']['text'] == 'Production by Factory, Mar 3 – May 25, 2025'
+    assert costs['layout']['title']['text'] == 'Cost Breakdown by Category, Mar 3 – May 25, 2025'
+    assert daily['layout']['title']['text'] == 'Daily Delay Impact, Mar 3 – May 25, 2025'
+    assert weekly['layout']['title']['text'] == 'Weekly Delay Impact, Mar 3 – May 25, 2025'
+    assert revenue['layout']['title']['text'] == 'Weekly Lost Revenue Due to Delays, Mar 3 – May 25, 2025'
+
+def test_financial_totals_scale_with_the_multiplier(generator):
+    """Test that money totals scale with the delay multiplier while counts do not"""
+    base = generator.get_financial_totals(1.0, START, END)
+    doubled = generator.get_financial_totals(2.0, START, END)
+    raw = generator.get_financial_columns(1.0, START, END)
+
+    assert base['count'] == doubled['count'] == len(raw['date'])
+    assert np.isclose(base['cost_penalties'], raw['cost_penalties'].sum())
+    assert np.isclose(doubled['revenue_lost'], 2 * base['revenue_lost'])
@@ -0,0 +1,49 @@
+from nicegui.testing import User
+from app.session import PREFERENCES, Session, sessions
+
+class CountingStorage(dict):
+    """Stand-in for the persisted user storage that counts its writes"""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.writes = 0
+
+    def __setitem__(self, key, value):
+        self.writes += 1
+        super().__setitem__(key, value)
+
+    def update(self, *args, **kwargs):
+        self.writes += 1
+        super().update(*args, **kwargs)
+
+async def test_preference_writes_are_coalesced():
+    """Test that a burst of preference changes becomes one storage write and view state is never written"""
+    storage = CountingStorage({'delay_multiplier': 1.0, 'selected_factory': 3})
+    session = Session(storage, flush_seconds=0.05)
+
+    for step in range(20):
+        session['delay_multiplier'] = 1.0 + step / 10
+        session['kpi_data'] = {'total_cars': str(step)}
+        session['selected_category'] = 'weather'
+    session['start_date'] = '2025-01-01'
+    await session.writes.flush()
+
+    assert session.get('selected_factory') == 3
+    assert storage.writes == 1
+    assert storage == {'delay_multiplier': 2.9, 'selected_factory': 3, 'start_date': '2025-01-01'}
+
+    session['delay_multiplier'] = 2.9  # unchanged, nothing to write
+    await session.writes.flush()
+    assert storage.writes == 1
+
+async def test_dashboard_keeps_view_state_out_of_user_storage(user: User) -> None:
+    """Test that the page's callbacks live in its session and only preferences reach the persisted storage"""
+    await user.open('/')
+    await user.should_see('10', retries=20)
+
+    assert user.client is not None
+    session = sessions[user.client]
+    assert session.scheduler is not None and 'kpis' in session.scheduler.panel_names
+    assert 'kpi_data' not in session.values
+    session.flush()
+    assert set(session.storage) <= set(PREFERENCES)
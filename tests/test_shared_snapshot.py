@@ -0,0 +1,102 @@
+import asyncio
+import time
+import numpy as np
+from app.data_generator import DataGenerator, DataSnapshot, SnapshotService
+from app.ingestion import LineWindows
+from app.logistics import build_logistics
+from app.shared_snapshot import SnapshotPublisher, attach, follow, follow_lines, read_pointer, share_lines
+from app.workers import StickyProxy
+
+def test_attached_snapshot_maps_the_published_arrays(tmp_path):
+    """Test that a worker's snapshot answers like the producer's, with arrays backed by the mapped file"""
+    snapshot = DataSnapshot(DataGenerator(seed=6), 4)
+    name = SnapshotPublisher(str(tmp_path)).publish(snapshot)
+
+    attached = attach(str(tmp_path / name))
+
+    assert read_pointer(str(tmp_path)) == {'version': 4, 'file': name}
+    assert attached.version == 4
+    assert attached.get_kpi_data(1.5) == snapshot.get_kpi_data(1.5)
+    bars = [build_logistics(source, 2)['bottlenecks']['data'][0] for source in (attached, snapshot)]
+    assert bars[0]['x'] == bars[1]['x'] and bars[0]['customdata'] == bars[1]['customdata']
+    production = attached._generator.production_store.query()['cars_produced']
+    base = production
+    while isinstance(base, np.ndarray):
+        base = base.base
+    assert isinstance(base, memoryview) and not production.flags.writeable
+
+def test_publisher_keeps_only_the_newest_versions(tmp_path):
+    """Test that old snapshot files are removed as new versions are published"""
+    publisher = SnapshotPublisher(str(tmp_path), keep=2)
+    generator = DataGenerator(seed=6)
+
+    for version in range(1, 5):
+        publisher.publish(DataSnapshot(generator, version))
+
+    assert sorted(path.name for path in tmp_path.glob('snapshot-*')) == ['snapshot-00000003.bin',
+                                                                         'snapshot-00000004.bin']
+
+async def test_workers_follow_published_versions(tmp_path):
+    """Test that a worker's service serves each published version without building its own"""
+    service = SnapshotService(generator_factory=None)
+    publisher = SnapshotPublisher(str(tmp_path))
+    generator = DataGenerator(seed=6)
+    publisher.publish(DataSnapshot(generator, 1))
+    task = asyncio.create_task(follow(str(tmp_path), service, interval=0.01))
+    try:
+        await asyncio.sleep(0.1)
+        assert (await asyncio.to_thread(service.get)).version == 1
+        publisher.publish(DataSnapshot(generator, 2))
+        await asyncio.sleep(0.1)
+        assert service.get().version == 2
+    finally:
+        task.cancel()
+
+async def test_workers_mirror_the_producers_line_windows(tmp_path):
+    """Test that a worker reads the rates of the producer's windows without ingesting any event"""
+    producer, worker = LineWindows({'short': 5}), LineWindows({'short': 5})
+    now = time.time()
+    producer.advance(now - 10)
+    producer.add(np.array([2]), np.array([now]), np.array([3]))
+    tasks = [asyncio.create_task(share_lines(str(tmp_path), producer, interval=0.01)),
+             asyncio.create_task(follow_lines(str(tmp_path), worker, interval=0.01))]
+    try:
+        await asyncio.sleep(0.1)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    assert worker.events == producer.events == 1
+    rates = worker.rates(np.array([1, 2]), 'short', now=now)
+    assert rates is not None and rates.tolist() == [0.0, 3 / 5 * 3600]
+
+async def test_proxy_pins_browsers_to_workers():
+    """Test that new browsers are spread over the workers and then stay on the one their cookie names"""
+    async def worker(index, reader, writer):
+        await reader.readuntil(b'\r\n\r\n')
+        writer.write(f'HTTP/1.1 200 OK\r\nContent-Length: 1\r\nConnection: close\r\n\r\n{index}'.encode())
+        await writer.drain()
+        writer.close()
+
+    servers = [await asyncio.start_server(lambda r, w, i=i: worker(i, r, w), '127.0.0.1', 0) for i in range(2)]
+    proxy = StickyProxy([server.sockets[0].getsockname()[1] for server in servers])
+    front = await asyncio.start_server(proxy.handle, '127.0.0.1', 0)
+    port = front.sockets[0].getsockname()[1]
+
+    async def get(cookie=''):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET / HTTP/1.1\r\nHost: test\r\n{cookie}\r\n'.encode())
+        response = await reader.read()
+        writer.close()
+        return response
+
+    try:
+        first, second = await get(), await get()
+        pinned = await get('Cookie: session=abc; app_worker=1\r\n')
+    finally:
+        for server in [front, *servers]:
+            server.close()
+
+    assert b'Set-Cookie: app_worker=0;' in first and first.endswith(b'0')
+    assert b'Set-Cookie: app_worker=1;' in second and second.endswith(b'1')
+    assert b'Set-Cookie' not in pinned and pinned.endswith(b'1')
@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from nicegui.testing import User
+from app.broadcast import broadcast_hub
+from app.data_generator import DataGenerator
+from app.telemetry import GETTER_SECONDS, PAGE_BUILD_SECONDS, PANEL_UPDATE_SECONDS, Histogram, Telemetry, telemetry
+
+@pytest.fixture
+def enabled():
+    telemetry.reset()
+    telemetry.enabled = True
+    broadcast_hub.clear()  # so panel payloads are built rather than served from the cache
+    yield telemetry
+    telemetry.enabled = False
+    telemetry.reset()
+
+def test_histogram_renders_cumulative_buckets():
+    """Test the Prometheus text exposition of a labelled histogram"""
+    histogram = Histogram('panel_seconds', 'Panel time', ['panel'], buckets=(0.1, 1.0))
+    histogram.observe(0.05, 'kpis')
+    histogram.observe(0.5, 'kpis')
+    histogram.observe(5.0, 'kpis')
+
+    lines = histogram.render()
+
+    assert lines[:2] == ['# HELP panel_seconds Panel time', '# TYPE panel_seconds histogram']
+    assert 'panel_seconds_bucket{panel="kpis",le="0.1"} 1' in lines
+    assert 'panel_seconds_bucket{panel="kpis",le="1"} 2' in lines
+    assert 'panel_seconds_bucket{panel="kpis",le="+Inf"} 3' in lines
+    assert 'panel_seconds_sum{panel="kpis"} 5.55' in lines
+    assert 'panel_seconds_count{panel="kpis"} 3' in lines
+
+def test_disabled_telemetry_records_nothing():
+    """Test that instrumented code does not record while telemetry is off"""
+    local = Telemetry(enabled=False)
+    histogram = local.histogram('calls_seconds', 'Calls', ['function'])
+    timed = local.timed(histogram)(lambda: 42)
+
+    with local.span(histogram, 'block'):
+        pass
+
+    assert timed() == 42
+    assert local.render() == '# HELP calls_seconds Calls\n# TYPE calls_seconds histogram\n'
+
+def test_getters_are_timed(enabled):
+    """Test that DataGenerator getters record one observation per call, not one per getter they share code with"""
+    data_gen = DataGenerator()
+
+    data_gen.get_kpi_data()
+    data_gen.get_financial_data()
+    data_gen.get_financial_frame()
+
+    assert GETTER_SECONDS.count('get_kpi_data') == 1
+    assert GETTER_SECONDS.count('get_financial_data') == 1
+    assert GETTER_SECONDS.count('get_financial_frame') == 1
+    assert GETTER_SECONDS.count('get_financial_columns') == 0
+
+async def test_metrics_endpoint(user: User, enabled) -> None:
+    """Test that page builds and panel updates are exposed on /metrics"""
+    await user.open('/')
+    for _ in range(100):
+        if all(PANEL_UPDATE_SECONDS.count(panel) for panel in ('kpis', 'factory_operations', 'logistics', 'financial')):
+            break
+        await asyncio.sleep(0.05)
+
+    response = await user.http_client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert PAGE_BUILD_SECONDS.count() == 1
+    assert 'dashboard_page_build_seconds_count 1' in response.text
+    assert 'dashboard_panel_build_seconds_bucket{panel="financial",le="+Inf"}' in response.text
+    assert 'dashboard_figure_update_bytes_count{kind="full"}' in response.text
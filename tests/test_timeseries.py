@@ -0,0 +1,70 @@
+import pytest
+from datetime import datetime, timedelta
+from app.timeseries import TimeIndex, TimeSeriesStore, range_title, records_to_columns, to_range
+
+BASE = datetime(2026, 1, 1, 12, 0)
+
+def make_records():
+    # Inserted out of order on purpose
+    return [
+        {'date': BASE + timedelta(days=day), 'factory_id': 1 + day % 2, 'value': day}
+        for day in (5, 1, 3, 0, 4, 2)
+    ]
+
+def test_time_index_sorts_records():
+    """Test that records are kept in timestamp order"""
+    index = TimeIndex(records_to_columns(make_records()))
+
+    assert index.columns['value'].tolist() == [0, 1, 2, 3, 4, 5]
+
+def test_time_index_slice_is_half_open():
+    """Test that slices include the start and exclude the end timestamp"""
+    index = TimeIndex(records_to_columns(make_records()))
+
+    columns = index.slice(BASE + timedelta(days=1), BASE + timedelta(days=4))
+
+    assert columns['value'].tolist() == [1, 2, 3]
+    assert len(index.slice(BASE + timedelta(days=10))['value']) == 0
+    assert len(index.slice(BASE + timedelta(days=4), BASE + timedelta(days=1))['value']) == 0
+
+def test_store_queries_partitions():
+    """Test that per-factory queries only return that factory's records"""
+    store = TimeSeriesStore.from_records(make_records())
+
+    assert store.query(partition=1)['value'].tolist() == [0, 2, 4]
+    assert store.query(BASE + timedelta(days=2), partition=2)['value'].tolist() == [3, 5]
+    assert store.records(partition=99) == []
+    assert len(store) == 6
+
+def test_store_columns_are_read_only_views():
+    """Test that query results cannot modify the shared columns"""
+    store = TimeSeriesStore.from_records(make_records())
+
+    with pytest.raises(ValueError):
+        store.query()['value'][0] = 42
+
+def test_records_round_trip_to_python_values():
+    """Test that the row-dict view returns plain datetimes and ints"""
+    records = TimeSeriesStore.from_records(make_records()).records(partition=2)
+
+    assert records[0] == {'date': BASE + timedelta(days=1), 'factory_id': 2, 'value': 1}
+    assert type(records[0]['date']) is datetime and type(records[0]['value']) is int
+
+def test_to_range_makes_end_date_inclusive():
+    """Test that the control's inclusive end date covers the whole day"""
+    start, end = to_range('2026-01-01', '2026-01-03')
+
+    assert start == datetime(2026, 1, 1)
+    assert end == datetime(2026, 1, 4)
+    assert to_range(None, None) == (None, None)
+
+def test_range_title_names_the_inclusive_days():
+    """Test that chart titles name the first and last day of a half-open range"""
+    def title(start_date, end_date):
+        start, end = to_range(start_date, end_date)
+        assert start is not None and end is not None
+        return range_title(start, end)
+
+    assert title('2025-03-03', '2025-04-21') == 'Mar 3 – Apr 21, 2025'
+    assert title('2024-12-30', '2025-01-02') == 'Dec 30, 2024 – Jan 2, 2025'
+    assert title('2025-03-03', '2025-03-03') == 'Mar 3, 2025'
@@ -0,0 +1,59 @@
+import importlib
+import subprocess
+import sys
+from nicegui.testing import User
+from app.warmup import ImportTimer, WarmUp, warm_up
+
+def test_import_timer_reports_nested_modules(tmp_path, monkeypatch):
+    """Test self and cumulative times of a module and the module it imports, indented by depth"""
+    package = tmp_path / 'timed_pkg'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    (package / 'outer.py').write_text('import time\nfrom timed_pkg import inner\ntime.sleep(0.02)\n')
+    (package / 'inner.py').write_text('import time\ntime.sleep(0.03)\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    timer = ImportTimer('timed_pkg.')
+    timer.install()
+    try:
+        importlib.import_module('timed_pkg.outer')
+    finally:
+        sys.meta_path.remove(timer)
+
+    (depth_inner, self_inner, _, inner), (depth_outer, self_outer, cumulative, outer) = timer.entries
+    assert (inner, depth_inner, outer, depth_outer) == ('timed_pkg.inner', 1, 'timed_pkg.outer', 0)
+    assert self_inner >= 0.03 and 0.02 <= self_outer < cumulative
+    assert '|   timed_pkg.inner' in timer.render()
+
+def test_startup_does_not_import_heavy_libraries():
+    """Test that the server can start answering before pandas and the panel modules are loaded"""
+    code = ('import sys, app.startup, app.workers; '
+            'print(sorted(m for m in ("pandas", "numpy", "app.data_generator", "app.logistics") if m in sys.modules))')
+
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == '[]'
+
+async def test_readiness_follows_the_warm_up(user: User) -> None:
+    """Test that /ready answers 200 once the warm-up built the snapshot and figures, and /startup reports it"""
+    await user.open('/')
+    await warm_up.wait()
+
+    ready = await user.http_client.get('/ready')
+    report = await user.http_client.get('/startup')
+
+    assert ready.status_code == 200
+    assert 'warm-up: snapshot' in report.text and 'warm-up: figures' in report.text
+
+async def test_failed_phase_is_recorded_and_ends_the_warm_up():
+    """Test that an error in a phase is reported instead of leaving pages waiting for a warm-up that died"""
+    failing = WarmUp(modules=('json',))
+
+    def start_services():
+        raise OSError('address in use')
+
+    await failing.run(start_services)
+    await failing.wait()
+
+    assert failing.errors == [('services', 'OSError: address in use')]
+    assert [phase for phase, _ in failing.phases] == ['imports']
+    assert 'warm-up: services failed: OSError: address in use' in failing.render()